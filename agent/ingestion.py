@@ -0,0 +1,26 @@
+from workflows.base_service import CxOneFlowAbstractWorkflowService
+from workflows.messaging import IngestedEventMessage
+from orchestration.base import AbstractOrchestrator
+from orchestration import OrchestrationDispatch
+import aio_pika
+
+class IngestionAgent(CxOneFlowAbstractWorkflowService):
+    """Performs orchestration for webhook events queued by the webhook endpoint."""
+
+    def __init__(self):
+        pass
+
+    async def __call__(self, msg : aio_pika.abc.AbstractIncomingMessage):
+        event_msg = await self._safe_deserialize_body(msg, IngestedEventMessage)
+
+        try:
+            IngestionAgent.log().debug(f"Orchestrating ingested event {event_msg.correlation_id} for {event_msg.moniker}")
+
+            # The signature is validated again by the dispatcher since the queue content is not signed.
+            IngestionAgent.log().debug(await OrchestrationDispatch.execute(
+                AbstractOrchestrator.from_qualified_name(event_msg.orchestrator, event_msg.event_context)))
+            await msg.ack()
+        except BaseException as ex:
+            self.log().exception(ex)
+            # The queue's delivery limit dead-letters an event that repeatedly fails.
+            await msg.nack(requeue=True)
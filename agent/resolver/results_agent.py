@@ -5,7 +5,7 @@ from api_utils.auth_factories import EventContext
 from orchestration.base import AbstractOrchestrator
 from orchestration import OrchestrationDispatch
 from workflows import ScanStates
-import aio_pika, gzip, importlib
+import aio_pika, gzip
 from typing import List
 
 class ResolverResultsAgent(CxOneFlowAbstractWorkflowService):
@@ -14,12 +14,6 @@ class ResolverResultsAgent(CxOneFlowAbstractWorkflowService):
         self.__services = services
 
 
-    @staticmethod
-    def __orchestrator_factory(orchestrator_name : str, context : EventContext) -> AbstractOrchestrator:
-        class_name = orchestrator_name.split(".")[-1:].pop()
-        module = importlib.import_module(".".join(orchestrator_name.split(".")[:-1]))
-        return getattr(module, class_name)(context)
-    
     async def __call__(self, msg : aio_pika.abc.AbstractIncomingMessage):
         result_msg = await self._safe_deserialize_body(msg, DelegatedScanResultMessage)
         try:
@@ -38,7 +32,7 @@ class ResolverResultsAgent(CxOneFlowAbstractWorkflowService):
 
                 if result_msg.scan_id is not None:
                     ResolverResultsAgent.log().info(await OrchestrationDispatch.dispatch_delegated_scan_workflow (
-                        ResolverResultsAgent.__orchestrator_factory(result_msg.details.orchestrator, result_msg.details.event_context), result_msg.scan_id))
+                        AbstractOrchestrator.from_qualified_name(result_msg.details.orchestrator, result_msg.details.event_context), result_msg.scan_id))
            
             await msg.ack()
         except BaseException as ex:
@@ -7,6 +7,7 @@ from workflows.messaging import (
 )
 from workflows import ScanStates
 from scm_services import SCMService
+from scm_services.clone_cache import CloneCache
 from cxone_service import CxOneService
 from orchestration import AbstractOrchestrator
 from typing import Tuple
@@ -25,11 +26,13 @@ class ResolverRunnerAgent(CxOneFlowAbstractWorkflowService):
         public_key: bytearray,
         resolver_runner: ResolverRunner,
         amqp_args: Tuple,
+        clone_cache: CloneCache = None,
     ):
         super().__init__(*amqp_args)
         self.__tag = tag
         self.__public_key = public_key
         self.__resolver_runner = resolver_runner
+        self.__clone_cache = clone_cache
 
     @property
     def tag(self) -> str:
@@ -111,17 +114,16 @@ class ResolverRunnerAgent(CxOneFlowAbstractWorkflowService):
                                                     f" From: [{scan_msg.moniker}] Workflow: [{str(scan_msg.workflow)}]" + 
                                                     f" Clone: [{scan_msg.details.clone_url}@{scan_msg.details.commit_hash}] CorId: [{scan_msg.correlation_id}]")
 
-                    async with await scm_service.cloner.clone(
+                    async with await scm_service.cloner.checkout(
                         scan_msg.details.clone_url,
+                        scan_msg.details.commit_hash,
                         scan_msg.details.event_context,
                         False,
                         runner.clone_path.rstrip("/") + "/",
                         False,
+                        self.__clone_cache,
                     ) as clone_worker:
                         cloned_repo_loc = Path(await clone_worker.loc())
-                        await scm_service.cloner.reset_head(
-                            cloned_repo_loc, scan_msg.details.commit_hash
-                        )
 
                         resolver_exec_result = await runner.execute_resolver(project_config.name, scan_msg.details.file_filters)
 
@@ -141,7 +143,8 @@ class ResolverRunnerAgent(CxOneFlowAbstractWorkflowService):
                         inspector, _ = await AbstractOrchestrator.exec_local_scan(
                             cloned_repo_loc, cxone_service, 
                             f"{scan_msg.details.clone_url}|{scan_msg.details.scan_branch}|{scan_msg.details.commit_hash}|CorId:{scan_msg.correlation_id}",
-                            scan_msg.details.scan_branch, project_config, scan_msg.details.scan_tags | {"resolver" : "success" if return_code == 0 else "failure"})
+                            scan_msg.details.scan_branch, project_config, scan_msg.details.scan_tags | {"resolver" : "success" if return_code == 0 else "failure"},
+                            [".cxsca-results.json", ".cxsca-container-results.json"])
 
                         result_msg = DelegatedScanResultMessage.factory(
                             moniker=scan_msg.moniker,
@@ -1,10 +1,13 @@
 from _agent import __agent__
 from requests import Response
-from requests import request
 from typing import Dict, Union, Any
+from urllib.parse import urlparse
 import logging, sys, asyncio
 from api_utils import AuthFactory
 from api_utils.auth_factories import EventContext
+from api_utils.transport import PooledTransport
+from api_utils.rate_governor import RateGovernor
+from api_utils.conditional_cache import ConditionalRequestCache
 from . import form_url
 
 class SCMAuthException(Exception):
@@ -19,7 +22,9 @@ class APISession:
     def log(clazz):
         return logging.getLogger(clazz.__name__)
 
-    def __init__(self, api_endpoint : str, auth : AuthFactory, timeout : int = 60, retries : int = 3, proxies : Dict = None, ssl_verify : Union[bool, str] = True):
+    def __init__(self, api_endpoint : str, auth : AuthFactory, timeout : int = 60, retries : int = 3, proxies : Dict = None, ssl_verify : Union[bool, str] = True,
+                 pool_size : int = PooledTransport.DEFAULT_POOL_SIZE, governor : RateGovernor = None,
+                 conditional_cache : ConditionalRequestCache = None):
 
         self.__headers = { "User-Agent" : __agent__ }
         
@@ -30,6 +35,9 @@ class APISession:
         self.__verify = ssl_verify
         self.__proxies = proxies
         self.__auth_factory = auth
+        self.__transport = PooledTransport(urlparse(api_endpoint).netloc, pool_size)
+        self.__governor = governor if governor is not None else RateGovernor(urlparse(api_endpoint).netloc)
+        self.__conditional_cache = conditional_cache
     
     @staticmethod
     def form_api_endpoint(base_endpoint : str, suffix : str):
@@ -43,6 +51,8 @@ class APISession:
         return self.__api_endpoint
 
     def __concat_path_to_endpoint(self, path :str):
+        if len(urlparse(path).scheme) > 0:
+            return path
         return self.api_endpoint.rstrip("/") + "/" + path.lstrip("/")
 
     async def exec(self, event_context : EventContext, method : str, path : str, query : Dict = None, 
@@ -58,18 +68,40 @@ class APISession:
 
         prepStr = f"[{method} {url}]"
 
+        cache_key = ConditionalRequestCache.make_key(url, query) \
+            if self.__conditional_cache is not None and method.upper() == "GET" else None
+        conditional = cache_key is not None
+
         for tryCount in range(0, self.__retries):
             
+            request_headers = dict(headers)
+            if conditional:
+                request_headers.update(self.__conditional_cache.conditional_headers(cache_key))
+
             APISession.log().debug(f"Executing: {prepStr} #{tryCount}")
-            response = await asyncio.to_thread(request, method=method, url=url, params=query,
-                data=body, headers=headers, auth=await self.__auth_factory.get_auth(event_context, tryCount > 0), 
+            await self.__governor.acquire()
+            response = await self.__transport.request(method=method, url=url, params=query,
+                data=body, headers=request_headers, auth=await self.__auth_factory.get_auth(event_context, tryCount > 0), 
                 timeout=self.__timeout, proxies=self.__proxies, verify=self.__verify)
             
+            self.__governor.observe(response.headers)
+
+            if cache_key is not None:
+                resolved = self.__conditional_cache.resolve(cache_key, response)
+                if resolved is None:
+                    APISession.log().debug(f"{prepStr} : Cached response no longer available, retrying without validators.")
+                    conditional = False
+                    continue
+                response = resolved
+
             logStr = f"{response.status_code}: {response.reason} {prepStr}"
             APISession.log().debug(f"Response #{tryCount}: {logStr} : {response.text}")
 
             if not response.ok:
-                if response.status_code in [401, 403]:
+                if RateGovernor.is_rate_limited(response.status_code, response.headers) or response.status_code >= 500:
+                    APISession.log().warning(f"{logStr} : Attempt {tryCount}, backing off.")
+                    await asyncio.sleep(self.__governor.backoff(tryCount, response.status_code))
+                elif response.status_code in [401, 403]:
                     APISession.log().error(f"{prepStr} : Raising authorization exception, not retrying.")
                     raise SCMAuthException(logStr)
                 else:
@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+from cxoneflow_metrics import MetricsRegistry
+
+
+class ConditionalRequestCache:
+    """A bounded LRU cache of GET response bodies with the ETag and Last-Modified validators the server sent.
+
+    Cached requests are sent with If-None-Match and If-Modified-Since so the server can respond with
+    304 Not Modified, in which case the cached body is returned in place of the empty 304 response.
+    """
+
+    METRIC_HITS = "conditional_cache.hits"
+    METRIC_MISSES = "conditional_cache.misses"
+
+    DEFAULT_MAX_ENTRIES = 1000
+
+    def __init__(self, host : str, max_entries : int=DEFAULT_MAX_ENTRIES):
+        self.__host = host
+        self.__max_entries = max_entries
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __getstate__(self):
+        # Cached responses are local to the process that received them.
+        state = dict(self.__dict__)
+        state['_ConditionalRequestCache__lock'] = None
+        state['_ConditionalRequestCache__entries'] = OrderedDict()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__lock = threading.Lock()
+
+    @property
+    def max_entries(self) -> int:
+        return self.__max_entries
+
+    @staticmethod
+    def hit_ratio(host : str) -> float:
+        return MetricsRegistry.ratio(ConditionalRequestCache.METRIC_HITS, ConditionalRequestCache.METRIC_MISSES, host=host)
+
+    @staticmethod
+    def make_key(url : str, query : Dict) -> Hashable:
+        return (url, tuple(sorted((str(k), str(v)) for k, v in query.items())) if query is not None else ())
+
+    def conditional_headers(self, key : Hashable) -> Dict[str, str]:
+        with self.__lock:
+            entry = self.__entries.get(key, None)
+
+        if entry is None:
+            return {}
+
+        headers = {}
+        if entry.headers.get("ETag", None) is not None:
+            headers["If-None-Match"] = entry.headers["ETag"]
+        if entry.headers.get("Last-Modified", None) is not None:
+            headers["If-Modified-Since"] = entry.headers["Last-Modified"]
+        return headers
+
+    def __store(self, key : Hashable, response : Response):
+        with self.__lock:
+            self.__entries[key] = response
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+
+    def __cached_response(self, key : Hashable, not_modified : Response) -> Response:
+        with self.__lock:
+            entry = self.__entries.get(key, None)
+            if entry is not None:
+                self.__entries.move_to_end(key)
+
+        if entry is None:
+            return None
+
+        # The headers of the 304 are current, so rate limit and validator values are taken from it.
+        response = Response()
+        response.status_code = entry.status_code
+        response.reason = entry.reason
+        response.url = not_modified.url
+        response.encoding = entry.encoding
+        response.request = not_modified.request
+        response.headers = CaseInsensitiveDict(entry.headers)
+        response.headers.update(not_modified.headers)
+        response._content = entry.content
+        return response
+
+    def resolve(self, key : Hashable, response : Response) -> Response:
+        """Returns the response to give to the caller, storing cacheable responses and replacing a 304 with the cached response.
+
+        None is returned for a 304 if the cached response was evicted after the request was sent.
+        """
+        if response.status_code == 304:
+            cached = self.__cached_response(key, response)
+            if cached is not None:
+                MetricsRegistry.increment(ConditionalRequestCache.METRIC_HITS, host=self.__host)
+            return cached
+
+        MetricsRegistry.increment(ConditionalRequestCache.METRIC_MISSES, host=self.__host)
+
+        if response.status_code == 200 and (response.headers.get("ETag", None) is not None
+                                            or response.headers.get("Last-Modified", None) is not None):
+            stored = Response()
+            stored.status_code = response.status_code
+            stored.reason = response.reason
+            stored.encoding = response.encoding
+            stored.headers = CaseInsensitiveDict(response.headers)
+            stored._content = response.content
+            self.__store(key, stored)
+
+        return response
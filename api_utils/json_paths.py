@@ -0,0 +1,188 @@
+import re
+from typing import Any, Callable, List
+
+
+class JsonPathMatch:
+    __slots__ = ("value",)
+
+    def __init__(self, value : Any):
+        self.value = value
+
+    def __repr__(self):
+        return f"JsonPathMatch({self.value!r})"
+
+
+class CompiledJsonPath:
+    """A JSONPath expression compiled to plain dict and list traversal.
+
+    Supports the subset of JSONPath used for webhook payloads: child fields, quoted or bracketed field
+    names, field unions such as [a,b], the [*] and * wildcards and the .. descendant operator.  Matching
+    follows jsonpath_ng, including its treatment of [*] applied to a dictionary or scalar as a single
+    element list.  Expressions using other syntax are evaluated with jsonpath_ng.
+
+    find() returns objects with a value attribute so it can be used in place of a jsonpath_ng expression.
+    """
+
+    __id = re.compile(r"[a-zA-Z_@][a-zA-Z0-9_@\-]*")
+    __bracket_field = re.compile(r"\s*(?:'([^']*)'|\"([^\"]*)\"|([a-zA-Z_@][a-zA-Z0-9_@\-]*))\s*")
+
+    def __init__(self, path : str):
+        self.__path = path
+
+        try:
+            steps = CompiledJsonPath.__compile(path)
+            self.__fallback = None
+        except ValueError:
+            from jsonpath_ng import parse
+            steps = None
+            self.__fallback = parse(path)
+
+        if steps is not None and len([s for s in steps if not isinstance(s, str)]) == 0:
+            self.__evaluate = CompiledJsonPath.__field_chain(tuple(steps))
+        elif steps is not None:
+            self.__evaluate = CompiledJsonPath.__step_chain([CompiledJsonPath.__as_step(s) for s in steps])
+        else:
+            self.__evaluate = None
+
+    @property
+    def path(self) -> str:
+        return self.__path
+
+    def __repr__(self):
+        return f"CompiledJsonPath({self.__path!r})"
+
+    @staticmethod
+    def __field(names : tuple) -> Callable[[Any], List]:
+        if len(names) == 1:
+            name = names[0]
+            return lambda v: [v[name]] if isinstance(v, dict) and name in v else []
+        return lambda v: [v[n] for n in names if n in v] if isinstance(v, dict) else []
+
+    @staticmethod
+    def __all_fields(v : Any) -> List:
+        return list(v.values()) if isinstance(v, dict) else []
+
+    @staticmethod
+    def __all_elements(v : Any) -> List:
+        if not v:
+            return []
+        if isinstance(v, list):
+            return v
+        if isinstance(v, (dict, int, str)):
+            return [v]
+        return []
+
+    @staticmethod
+    def __descendants(step : Callable[[Any], List]) -> Callable[[Any], List]:
+        def find(v : Any) -> List:
+            found = list(step(v))
+            if isinstance(v, list):
+                for element in v:
+                    found.extend(find(element))
+            elif isinstance(v, dict):
+                for element in v.values():
+                    found.extend(find(element))
+            return found
+        return find
+
+    @staticmethod
+    def __as_step(step) -> Callable[[Any], List]:
+        if isinstance(step, str):
+            return CompiledJsonPath.__field((step,))
+        return step
+
+    @staticmethod
+    def __field_chain(names : tuple) -> Callable[[Any], List]:
+        def find(v : Any) -> List:
+            for name in names:
+                if not isinstance(v, dict) or name not in v:
+                    return []
+                v = v[name]
+            return [v]
+        return find
+
+    @staticmethod
+    def __step_chain(steps : List[Callable[[Any], List]]) -> Callable[[Any], List]:
+        def find(v : Any) -> List:
+            current = [v]
+            for step in steps:
+                current = [found for value in current for found in step(value)]
+                if len(current) == 0:
+                    break
+            return current
+        return find
+
+    @staticmethod
+    def __parse_bracket(path : str, pos : int):
+        end = path.find("]", pos)
+        if end < 0:
+            raise ValueError(path)
+
+        content = path[pos + 1:end]
+        if content.strip() == "*":
+            return CompiledJsonPath.__all_elements, end + 1
+
+        names = []
+        for part in content.split(","):
+            m = CompiledJsonPath.__bracket_field.fullmatch(part)
+            if m is None:
+                raise ValueError(path)
+            names.append(next(x for x in m.groups() if x is not None))
+
+        if len(names) == 1:
+            return names[0], end + 1
+        return CompiledJsonPath.__field(tuple(names)), end + 1
+
+    @staticmethod
+    def __parse_child(path : str, pos : int):
+        if pos < len(path) and path[pos] == "[":
+            return CompiledJsonPath.__parse_bracket(path, pos)
+        if pos < len(path) and path[pos] == "*":
+            return CompiledJsonPath.__all_fields, pos + 1
+
+        m = CompiledJsonPath.__id.match(path, pos)
+        if m is None:
+            raise ValueError(path)
+        return m.group(0), m.end()
+
+    @staticmethod
+    def __compile(path : str) -> list:
+        """Returns a list of steps; a str step is a single field name.  Raises ValueError for unsupported syntax."""
+        path = path.strip()
+        if not path.startswith("$"):
+            raise ValueError(path)
+
+        steps = []
+        pos = 1
+        while pos < len(path):
+            if path.startswith("..", pos):
+                step, pos = CompiledJsonPath.__parse_child(path, pos + 2)
+                steps.append(CompiledJsonPath.__descendants(CompiledJsonPath.__as_step(step)))
+            elif path[pos] == ".":
+                step, pos = CompiledJsonPath.__parse_child(path, pos + 1)
+                steps.append(step)
+            elif path[pos] == "[":
+                step, pos = CompiledJsonPath.__parse_bracket(path, pos)
+                steps.append(step)
+            else:
+                raise ValueError(path)
+
+        return steps
+
+    def values(self, data : Any) -> List:
+        if self.__fallback is not None:
+            return [m.value for m in self.__fallback.find(data)]
+        return self.__evaluate(data)
+
+    def find(self, data : Any) -> List:
+        if self.__fallback is not None:
+            return self.__fallback.find(data)
+        return [JsonPathMatch(v) for v in self.__evaluate(data)]
+
+    def first(self, data : Any, default : Any=None) -> Any:
+        found = self.values(data)
+        return found[0] if len(found) > 0 else default
+
+
+def compile_path(path : str) -> CompiledJsonPath:
+    return CompiledJsonPath(path)
@@ -1,10 +1,39 @@
+import asyncio
+from collections import deque
 from typing import Callable, Awaitable, List, Any, Dict
+from urllib.parse import urlparse, parse_qs
 from requests import Response
 
 
-async def async_api_page_generator(coro : Awaitable[Response], 
-                                   data_extractor : Callable[[Response], List], kwargs_gen : Callable[[int], Dict]) -> Any:
-    
+DEFAULT_PREFETCH_WINDOW = 4
+
+
+def link_header_page_count(response : Response) -> int:
+    """Returns the page number in the rel="last" URL of the Link header, or None if it is not found."""
+    last = response.links.get("last", None) if response is not None else None
+    if last is None:
+        return None
+
+    page = parse_qs(urlparse(last.get("url", "")).query).get("page", None)
+    try:
+        return int(page[0]) if page is not None else None
+    except ValueError:
+        return None
+
+
+def total_pages_header_count(response : Response) -> int:
+    """Returns the value of the X-Total-Pages header, or None if it is not found."""
+    try:
+        return int(response.headers["X-Total-Pages"]) if response is not None and "X-Total-Pages" in response.headers else None
+    except ValueError:
+        return None
+
+
+async def async_api_page_generator(coro : Awaitable[Response],
+                                   data_extractor : Callable[[Response], List], kwargs_gen : Callable[[int], Dict],
+                                   page_count_extractor : Callable[[Response], int] = None,
+                                   prefetch_window : int = DEFAULT_PREFETCH_WINDOW) -> Any:
+
     """_summary_
 
     A generator for paging API calls.
@@ -20,22 +49,50 @@ async def async_api_page_generator(coro : Awaitable[Response],
         kwargs_gen - A method that returns a list used as kwargs when executing coro.  A single int
         parameter is passed to indicate the current offset count.
 
+        page_count_extractor - An optional callable that is given the response for the first page and returns
+        the total number of pages, or None if it is not known.  When the count is known, the pages at offsets
+        1 through count-1 are requested concurrently, with at most prefetch_window requests outstanding.
+
+        prefetch_window - The maximum number of page requests outstanding when prefetching.
+
     Yields:
-        Any: An extracted object as returned by data_extractor callable.
+        Any: An extracted object as returned by data_extractor callable, in the order returned by the API.
+
+    Page requests that are outstanding when the generator is closed are cancelled.  Callers that stop
+    iterating early should close the generator (e.g. with contextlib.aclosing) so this happens promptly.
     """
+    response = await coro(**(kwargs_gen(0)))
+    buf, last_page = data_extractor(response) or (None, True)
+
+    page_count = page_count_extractor(response) \
+        if page_count_extractor is not None and not last_page and buf is not None and len(buf) > 0 else None
+
     offset = 0
-    buf = []
-    last_page = False
-
-    while True:
-        if len(buf) == 0 and not last_page:
-            buf, last_page = data_extractor(await coro(**(kwargs_gen(offset))))
-            
-            if buf is None or len(buf) == 0:
-                return
-            offset = offset + 1
-        elif len(buf) == 0 and last_page:
-            return
+    next_offset = 1
+    pending = deque()
 
-        yield buf.pop()
+    try:
+        while buf is not None and len(buf) > 0:
+            if page_count is not None:
+                while len(pending) < prefetch_window and next_offset < page_count:
+                    pending.append(asyncio.ensure_future(coro(**(kwargs_gen(next_offset)))))
+                    next_offset = next_offset + 1
+
+            for element in buf:
+                yield element
+
+            offset = offset + 1
+            if last_page or (page_count is not None and offset >= page_count):
+                return
 
+            if page_count is None:
+                buf, last_page = data_extractor(await coro(**(kwargs_gen(offset)))) or (None, True)
+            else:
+                buf, last_page = data_extractor(await pending.popleft()) or (None, True)
+    finally:
+        for task in pending:
+            if task.done():
+                if not task.cancelled():
+                    task.exception()
+            else:
+                task.cancel()
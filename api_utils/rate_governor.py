@@ -0,0 +1,160 @@
+import asyncio, random, threading, time, logging
+from email.utils import parsedate_to_datetime
+from typing import Mapping
+from cxoneflow_metrics import MetricsRegistry
+
+
+class RateGovernor:
+    """Schedules the API calls made to an SCM through a token bucket.
+
+    The bucket rate is the configured rate, lowered when the rate limit headers of responses show the remaining request
+    budget would otherwise run out before it resets.  Calls wait until the reset time when the budget is exhausted, and
+    until the time given by Retry-After when a response includes it.  Without a configured rate, calls are only
+    delayed by the response headers.
+    """
+
+    METRIC_THROTTLED = "rate_governor.throttled"
+    METRIC_THROTTLED_SECONDS = "rate_governor.throttled_seconds"
+    METRIC_BACKOFFS = "rate_governor.backoffs"
+
+    DEFAULT_BURST = 10
+
+    # The budget is paced over the time to reset once less than this fraction of the limit remains.
+    __low_water = 0.2
+    __low_water_without_limit = 100
+    __backoff_base_seconds = 1
+    __backoff_max_seconds = 60
+    __epoch_threshold = 1_000_000_000
+
+    @classmethod
+    def log(clazz) -> logging.Logger:
+        return logging.getLogger(clazz.__name__)
+
+    def __init__(self, host : str, requests_per_second : float=None, burst : int=DEFAULT_BURST):
+        self.__host = host
+        self.__rate = requests_per_second
+        self.__burst = burst
+        self.__lock = threading.Lock()
+        self.__tokens = float(burst)
+        self.__last = time.monotonic()
+        self.__learned_rate = None
+        self.__blocked_until = 0.0
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_RateGovernor__lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__lock = threading.Lock()
+        self.__last = time.monotonic()
+        self.__blocked_until = 0.0
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.__rate
+
+    @property
+    def burst(self) -> int:
+        return self.__burst
+
+    def __effective_rate(self) -> float:
+        rates = [r for r in [self.__rate, self.__learned_rate] if r is not None]
+        return min(rates) if len(rates) > 0 else None
+
+    def _reserve(self) -> float:
+        """Takes a token and returns the number of seconds to wait before the call can be made."""
+        with self.__lock:
+            now = time.monotonic()
+            rate = self.__effective_rate()
+            wait = 0.0
+
+            if rate is not None:
+                # A negative token count is the number of calls already waiting for a token.
+                self.__tokens = min(float(self.__burst), self.__tokens + ((now - self.__last) * rate)) - 1
+                if self.__tokens < 0:
+                    wait = -self.__tokens / rate
+
+            self.__last = now
+            return max(wait, self.__blocked_until - now)
+
+    async def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            MetricsRegistry.increment(RateGovernor.METRIC_THROTTLED, host=self.__host)
+            MetricsRegistry.increment(RateGovernor.METRIC_THROTTLED_SECONDS, wait, host=self.__host)
+            RateGovernor.log().debug(f"Delaying API call to {self.__host} for {wait:.2f} seconds")
+            await asyncio.sleep(wait)
+
+    @staticmethod
+    def __header_number(headers : Mapping[str, str], *names) -> float:
+        for name in names:
+            value = headers.get(name, None)
+            if value is not None:
+                try:
+                    return float(value)
+                except ValueError:
+                    pass
+        return None
+
+    @staticmethod
+    def __retry_after(headers : Mapping[str, str]) -> float:
+        value = headers.get("Retry-After", None)
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def __seconds_to_reset(headers : Mapping[str, str]) -> float:
+        reset = RateGovernor.__header_number(headers, "X-RateLimit-Reset", "RateLimit-Reset")
+        if reset is None:
+            return None
+
+        # Some SCMs send the reset time as epoch seconds, others as the seconds remaining.
+        return max(0.0, reset - time.time()) if reset > RateGovernor.__epoch_threshold else reset
+
+    def observe(self, headers : Mapping[str, str]):
+        """Updates the schedule from the rate limit headers of a response."""
+        retry_after = RateGovernor.__retry_after(headers)
+        remaining = RateGovernor.__header_number(headers, "X-RateLimit-Remaining", "RateLimit-Remaining")
+        limit = RateGovernor.__header_number(headers, "X-RateLimit-Limit", "RateLimit-Limit")
+        reset_in = RateGovernor.__seconds_to_reset(headers) if remaining is not None else None
+
+        with self.__lock:
+            now = time.monotonic()
+
+            if retry_after is not None:
+                self.__blocked_until = max(self.__blocked_until, now + retry_after)
+
+            if remaining is None or reset_in is None:
+                return
+
+            if remaining <= 0:
+                self.__blocked_until = max(self.__blocked_until, now + reset_in)
+                self.__learned_rate = None
+            elif remaining < (limit * RateGovernor.__low_water if limit is not None else RateGovernor.__low_water_without_limit):
+                self.__learned_rate = remaining / max(reset_in, 1.0)
+            else:
+                self.__learned_rate = None
+
+        if remaining <= 0:
+            RateGovernor.log().warning(f"API rate limit for {self.__host} exhausted, calls are paused for {reset_in:.0f} seconds")
+
+    @staticmethod
+    def is_rate_limited(status_code : int, headers : Mapping[str, str]) -> bool:
+        # GitHub responds with 403 rather than 429 when a rate limit is exceeded.
+        return status_code == 429 or (status_code == 403 and 
+            (headers.get("Retry-After", None) is not None or RateGovernor.__header_number(headers, "X-RateLimit-Remaining") == 0))
+
+    def backoff(self, attempt : int, status_code : int) -> float:
+        """Returns a delay with full jitter before retrying a call that was rate limited or failed with a server error."""
+        MetricsRegistry.increment(RateGovernor.METRIC_BACKOFFS, host=self.__host, status=str(status_code))
+        return random.uniform(0, min(RateGovernor.__backoff_max_seconds, RateGovernor.__backoff_base_seconds * (2 ** attempt)))
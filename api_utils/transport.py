@@ -0,0 +1,100 @@
+import asyncio, functools, threading
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import DefaultCookiePolicy
+from requests import Session, Response
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool, poolmanager
+from cxoneflow_metrics import MetricsRegistry
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        MetricsRegistry.increment(PooledTransport.METRIC_CONNECTIONS_OPENED, host=self.host)
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        MetricsRegistry.increment(PooledTransport.METRIC_CONNECTIONS_OPENED, host=self.host)
+        return super()._new_conn()
+
+
+class _CountingAdapter(HTTPAdapter):
+    __pool_classes = {"http" : _CountingHTTPConnectionPool, "https" : _CountingHTTPSConnectionPool}
+
+    @staticmethod
+    def __count(manager):
+        # SOCKS proxy managers use their own pool classes and are not counted.
+        if manager.pool_classes_by_scheme is poolmanager.pool_classes_by_scheme:
+            manager.pool_classes_by_scheme = _CountingAdapter.__pool_classes
+        return manager
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        _CountingAdapter.__count(self.poolmanager)
+
+    def proxy_manager_for(self, *args, **kwargs):
+        return _CountingAdapter.__count(super().proxy_manager_for(*args, **kwargs))
+
+
+class PooledTransport:
+    """Sends the HTTP requests for an API endpoint over a pool of keep-alive connections.
+
+    The blocking requests run on an executor with one thread per pooled connection rather than the default executor.
+    Cookies are not retained between requests so each request is sent the same way as a standalone request.
+    """
+
+    METRIC_REQUESTS = "http_transport.requests"
+    METRIC_CONNECTIONS_OPENED = "http_transport.connections_opened"
+
+    DEFAULT_POOL_SIZE = 10
+
+    def __init__(self, host : str, pool_size : int=DEFAULT_POOL_SIZE):
+        self.__host = host
+        self.__pool_size = pool_size
+        self.__lock = threading.Lock()
+        self.__session = None
+        self.__executor = None
+
+    def __getstate__(self):
+        # The session and executor are created again when used after unpickling.
+        state = dict(self.__dict__)
+        state['_PooledTransport__lock'] = None
+        state['_PooledTransport__session'] = None
+        state['_PooledTransport__executor'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__lock = threading.Lock()
+
+    @property
+    def pool_size(self) -> int:
+        return self.__pool_size
+
+    @staticmethod
+    def reuse_ratio(host : str) -> float:
+        """The fraction of requests to the host that were sent on a connection that was already open."""
+        requests = MetricsRegistry.counter(PooledTransport.METRIC_REQUESTS, host=host)
+        opened = MetricsRegistry.counter(PooledTransport.METRIC_CONNECTIONS_OPENED, host=host)
+        return 0.0 if requests == 0 else max(0.0, 1 - (opened / requests))
+
+    def __open(self):
+        with self.__lock:
+            if self.__session is None:
+                session = Session()
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                adapter = _CountingAdapter(pool_maxsize=self.__pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+
+                self.__executor = ThreadPoolExecutor(max_workers=self.__pool_size, thread_name_prefix=f"http-{self.__host}")
+                self.__session = session
+
+            return self.__session, self.__executor
+
+    async def request(self, **kwargs) -> Response:
+        """Sends a request with the same keyword arguments as requests.Session.request."""
+        session, executor = self.__open()
+        MetricsRegistry.increment(PooledTransport.METRIC_REQUESTS, host=self.__host)
+        return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(session.request, **kwargs))
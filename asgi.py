@@ -0,0 +1,182 @@
+"""
+This is an ASGI entrypoint for receiving webhook payloads and dispatching them to the proper
+orchestrator.  It exposes the same routes as the Flask entrypoint in wsgi.py but runs requests
+and background orchestration on a single event loop so no thread handoff is needed.  Code here should be
+limited to receive and delegating the logic to the proper orchestrator.
+"""
+from _agent import __agent__
+from orchestration.endpoint import EndpointHandlers, EndpointResponse as Response
+
+import json, logging, os, asyncio, mimetypes
+from pathlib import Path
+from typing import Dict, Tuple
+from config import ConfigurationException, get_config_path
+from config.server import CxOneFlowConfig
+from task_management import TaskManager
+from cxoneflow_metrics import MetricsRegistry
+import cxoneflow_logging as cof_logging
+
+cof_logging.bootstrap()
+
+__app_name__ = __agent__
+
+__log = logging.getLogger(__app_name__)
+
+try:
+    CxOneFlowConfig.bootstrap(get_config_path())
+except ConfigurationException as ce:
+    __log.exception(ce)
+    raise
+
+__artifacts_root = (Path(__file__).parent / "artifacts").resolve()
+
+
+class Request:
+    def __init__(self, method : str, path : str, headers : Dict[str, str], body : bytes):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+    @property
+    def json(self):
+        return json.loads(self.body) if len(self.body) > 0 else None
+
+
+def __normalize_headers(raw_headers) -> Dict[str, str]:
+    # Header names are presented the same way as Flask so orchestrators see the same keys.
+    headers = {}
+    for k, v in raw_headers:
+        key = k.decode("latin-1").replace("_", "-").title()
+        value = v.decode("latin-1")
+        headers[key] = f"{headers[key]}, {value}" if key in headers else value
+    return headers
+
+
+async def __read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+async def __send_response(send, response : Response):
+    headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in response.headers.items()]
+    headers.append((b"content-length", str(len(response.body)).encode("latin-1")))
+    await send({"type" : "http.response.start", "status" : response.status, "headers" : headers})
+    await send({"type" : "http.response.body", "body" : response.body})
+
+
+async def ping(request : Request) -> Response:
+    if request.method != "GET" and "ENABLE_DUMP" in os.environ.keys():
+        __log.debug("ping webhook: headers: [%s] body: [%s]", request.headers, request.body)
+
+    return Response("pong", status=200)
+
+
+async def metrics(request : Request) -> Response:
+    return await EndpointHandlers.metrics()
+
+
+def __shared(handler):
+    async def handle(request : Request) -> Response:
+        return await handler(request.headers, request.body)
+    return handle
+
+
+def __read_artifact(path : Path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def artifacts(request : Request, path : str) -> Response:
+    __log.debug(f"Fetching artifact at {path}")
+    artifact = (__artifacts_root / path).resolve()
+
+    if not artifact.is_relative_to(__artifacts_root) or not artifact.is_file():
+        return Response(status=404)
+
+    content_type, _ = mimetypes.guess_type(artifact.name)
+    return Response(await asyncio.to_thread(__read_artifact, artifact), status=200,
+                    content_type=content_type if content_type is not None else "application/octet-stream",
+                    headers={"Access-Control-Allow-Origin" : "*"})
+
+
+__routes = {
+    ("GET", "/ping") : ping,
+    ("POST", "/ping") : ping,
+    ("GET", "/metrics") : metrics,
+    ("POST", "/bbdc") : __shared(EndpointHandlers.bbdc_webhook),
+    ("POST", "/bbdc/kickoff") : __shared(EndpointHandlers.bbdc_kickoff),
+    ("POST", "/gh") : __shared(EndpointHandlers.github_webhook),
+    ("POST", "/gh/kickoff") : __shared(EndpointHandlers.github_kickoff),
+    ("POST", "/adoe") : __shared(EndpointHandlers.adoe_webhook),
+    ("POST", "/adoe/kickoff") : __shared(EndpointHandlers.adoe_kickoff),
+    ("POST", "/gl") : __shared(EndpointHandlers.gitlab_webhook),
+    ("POST", "/gl/kickoff") : __shared(EndpointHandlers.gitlab_kickoff),
+}
+
+__artifacts_prefix = "/artifacts/"
+
+
+def __route(method : str, path : str) -> Tuple[object, tuple]:
+    handler = __routes.get((method, path), None)
+    if handler is not None:
+        return handler, ()
+
+    if method in ["GET", "HEAD"] and path.startswith(__artifacts_prefix) and len(path) > len(__artifacts_prefix):
+        return artifacts, (path[len(__artifacts_prefix):],)
+
+    if len([x for x in __routes.keys() if x[1] == path]) > 0 or path.startswith(__artifacts_prefix):
+        return None, 405
+
+    return None, 404
+
+
+async def __lifespan(receive, send):
+    metrics_logger = None
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            TaskManager.attach()
+            if CxOneFlowConfig.metrics_log_interval() is not None:
+                metrics_logger = asyncio.create_task(MetricsRegistry.log_periodically(CxOneFlowConfig.metrics_log_interval()))
+            await send({"type" : "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if metrics_logger is not None:
+                metrics_logger.cancel()
+            await TaskManager.drain()
+            await send({"type" : "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await __lifespan(receive, send)
+
+    if scope["type"] != "http":
+        return
+
+    if TaskManager.loop() is None:
+        TaskManager.attach()
+
+    handler, args = __route(scope["method"], scope["path"])
+    if handler is None:
+        response = Response(status=args)
+    else:
+        request = Request(scope["method"], scope["path"], __normalize_headers(scope["headers"]), await __read_body(receive))
+        try:
+            response = await handler(request, *args)
+        except Exception as ex:
+            __log.exception(ex)
+            response = Response(status=500)
+
+    if scope["method"] == "HEAD":
+        response.body = b""
+
+    await __send_response(send, response)
@@ -5,6 +5,7 @@ import os, logging, cxone_api as cx, yaml
 from multiprocessing import cpu_count
 from pathlib import Path
 from cxoneflow_logging import SecretRegistry
+from scm_services.clone_cache import CloneCache
 
 def get_workers_count():
     if "CXONEFLOW_WORKERS" not in os.environ.keys():
@@ -185,6 +186,25 @@ class CommonConfig:
             return CommonConfig._default_amqp_url, None, None, True
         
 
+    _default_clone_cache_max_size_gb = 20
+
+    @staticmethod
+    def _load_clone_cache(config_path, config_dict) -> Union[CloneCache, None]:
+        if config_dict is None:
+            return None
+        
+        max_size_gb = CommonConfig._get_value_for_key_or_default("max-size-gb", config_dict, CommonConfig._default_clone_cache_max_size_gb)
+
+        try:
+            max_size_bytes = int(float(max_size_gb) * 1024 * 1024 * 1024)
+        except ValueError:
+            raise ConfigurationException.invalid_value(f"{config_path}/max-size-gb")
+
+        if max_size_bytes <= 0:
+            raise ConfigurationException.invalid_value(f"{config_path}/max-size-gb")
+
+        return CloneCache(CommonConfig._get_value_for_key_or_fail(config_path, "path", config_dict), max_size_bytes)
+
     @staticmethod
     def _cxone_client_factory(config_path, **kwargs):
 
@@ -70,7 +70,9 @@ class ResolverConfig(CommonConfig):
             agent_tag,
             bytes(CommonConfig._get_secret_from_value_of_key_or_fail(config_path, "public-key", config_dict), 'UTF-8'),
             ResolverConfig.__resolver_runner_factory(config_path, config_dict), 
-            CommonConfig._load_amqp_settings(config_path, **config_dict))
+            CommonConfig._load_amqp_settings(config_path, **config_dict),
+            CommonConfig._load_clone_cache(f"{config_path}/clone-cache", 
+                CommonConfig._get_value_for_key_or_default("clone-cache", config_dict, None)))
 
     @staticmethod
     def bootstrap(config_file_path = "./resolver_config.yaml"):
@@ -3,20 +3,28 @@ from _agent import __agent__
 from pathlib import Path
 from config import ConfigurationException, RouteNotFoundException, CommonConfig
 import re, uuid, sys, dataclasses_json
+from urllib.parse import urlparse
 from dataclasses import make_dataclass, asdict
 from importlib import import_module
 from scm_services import SCMService, ADOEService, BBDCService, GHService, GLService
-from scm_services.cloner import Cloner
+from scm_services.cloner import Cloner, CloneStrategy
+from scm_services.protected_branch_cache import ProtectedBranchCache
 from api_utils import auth_basic, auth_bearer
 from api_utils.apisession import APISession
+from api_utils.transport import PooledTransport
+from api_utils.rate_governor import RateGovernor
+from api_utils.conditional_cache import ConditionalRequestCache
 from api_utils.auth_factories import AuthFactory, GithubAppAuthFactory
 from cxone_service import CxOneService
 from cxone_service.grouping import GroupingService
+from cxone_service.project_catalog import ProjectCatalog
+from cxone_service.project_config_cache import ProjectConfigCache
 from password_strength import PasswordPolicy
 from workflows.pr_feedback_service import PRFeedbackService
 from workflows.push_feedback_service import PushFeedbackService
 from workflows.scan_polling_service import ScanPollingService
 from workflows.resolver_scan_service import ResolverScanService
+from workflows.ingestion_service import IngestionService
 from workflows.pull_request import PullRequestWorkflow
 from workflows.push import PushWorkflow
 from workflows.base_service import CxOneFlowAbstractWorkflowService
@@ -26,12 +34,15 @@ from workflows.resolver_workflow import (
 )
 from workflows import ResultSeverity, ResultStates
 from services import CxOneFlowServices
-from typing import List, Dict, Union, Tuple
+from typing import List, Dict, Union, Tuple, Any
 from cxone_api import CxOneClient
 from kickoff_services import DummyKickoffService, KickoffService
 from naming_services import ProjectNamingService
 from cxone_sarif import get_sarif_v210_log_for_scan
 from cxone_sarif.opts import DEFAULT as SARIF_DEFAULT_OPTS, ReportOpts
+from task_management import TaskManager
+from task_management.delivery_dedup import DeliveryDedup
+from config.server.route_index import RouteIndex
 
 
 class CxOneFlowConfig(CommonConfig):
@@ -41,6 +52,9 @@ class CxOneFlowConfig(CommonConfig):
     DEFAULT_POLL_BACKOFF_SCALAR = 2
     DEFAULT_SCAN_TIMEOUT_HOURS = 48
 
+    __default_in_memory_payload_max_mb = 64
+    __default_compression_level = 9
+
     __shared_secret_policy = PasswordPolicy.from_names(
         length=20, uppercase=3, numbers=3, special=2
     )
@@ -74,9 +88,9 @@ class CxOneFlowConfig(CommonConfig):
             it_list = [clone_urls]
 
         for url in it_list:
-            for entry in CxOneFlowConfig.__ordered_scm_services_config[scm_config_key]:
-                if entry.matcher.match(url):
-                    return entry
+            entry = CxOneFlowConfig.__route_indexes[scm_config_key].match(url)
+            if entry is not None:
+                return entry
 
         CxOneFlowConfig.log().error(f"No route matched for {clone_urls}")
         raise RouteNotFoundException(clone_urls)
@@ -85,6 +99,18 @@ class CxOneFlowConfig(CommonConfig):
     def get_base_url():
         return CxOneFlowConfig.__server_base_url
 
+    @staticmethod
+    def get_delivery_dedup() -> DeliveryDedup:
+        return CxOneFlowConfig.__delivery_dedup
+
+    @staticmethod
+    def ingestion_enabled() -> bool:
+        return CxOneFlowConfig.__ingestion_enabled
+
+    @staticmethod
+    def metrics_log_interval() -> int:
+        return CxOneFlowConfig.__metrics_log_interval
+
     @staticmethod
     def bootstrap(config_file_path="./config.yaml"):
 
@@ -108,6 +134,31 @@ class CxOneFlowConfig(CommonConfig):
             if CxOneFlowConfig.__script_root is not None:
                 sys.path.append(CxOneFlowConfig.__script_root)
 
+            CxOneFlowConfig.__delivery_dedup = CxOneFlowConfig.__setup_delivery_dedup("/delivery-dedup",
+                CxOneFlowConfig._get_value_for_key_or_default("delivery-dedup", raw_yaml, {}))
+
+            CxOneFlowConfig.__protected_branch_cache = CxOneFlowConfig.__setup_protected_branch_cache("/protected-branch-cache",
+                CxOneFlowConfig._get_value_for_key_or_default("protected-branch-cache", raw_yaml, {}))
+
+            CxOneFlowConfig.__project_catalog_settings = CxOneFlowConfig.__setup_project_catalog("/project-catalog",
+                CxOneFlowConfig._get_value_for_key_or_default("project-catalog", raw_yaml, {}))
+
+            CxOneFlowConfig.__project_config_cache_settings = CxOneFlowConfig.__setup_project_config_cache("/project-config-cache",
+                CxOneFlowConfig._get_value_for_key_or_default("project-config-cache", raw_yaml, {}))
+
+            CxOneFlowConfig.__setup_background_tasks("/background-tasks",
+                CxOneFlowConfig._get_value_for_key_or_default("background-tasks", raw_yaml, {}))
+
+            ingestion_dict = CxOneFlowConfig._get_value_for_key_or_default("ingestion", raw_yaml, {})
+            CxOneFlowConfig.__ingestion_enabled = bool(CxOneFlowConfig._get_value_for_key_or_default("enabled", ingestion_dict, False))
+            CxOneFlowConfig.__ingestion_max_concurrent = CxOneFlowConfig.__positive_int("/ingestion/max-concurrent",
+                CxOneFlowConfig._get_value_for_key_or_default("max-concurrent", ingestion_dict, IngestionService.DEFAULT_MAX_CONCURRENT))
+
+            metrics_interval = CxOneFlowConfig._get_value_for_key_or_default("log-interval-seconds",
+                CxOneFlowConfig._get_value_for_key_or_default("metrics", raw_yaml, {}), None)
+            CxOneFlowConfig.__metrics_log_interval = CxOneFlowConfig.__positive_int("/metrics/log-interval-seconds",
+                metrics_interval) if metrics_interval is not None else None
+
             if len(raw_yaml.keys() - CxOneFlowConfig.__cloner_factories.keys()) == len(
                 raw_yaml.keys()
             ):
@@ -125,6 +176,7 @@ class CxOneFlowConfig(CommonConfig):
                             CxOneFlowConfig.__cloner_factories[scm],
                             CxOneFlowConfig.__api_auth_factories[scm],
                             CxOneFlowConfig.__scm_factories[scm],
+                            CxOneFlowConfig.__conditional_cache_defaults[scm],
                             repo_config_dict,
                             f"/{scm}[{index}]",
                         )
@@ -151,6 +203,9 @@ class CxOneFlowConfig(CommonConfig):
                             )
 
                         index += 1
+
+            CxOneFlowConfig.__route_indexes = {scm : RouteIndex([(entry.matcher, entry) for entry in entries])
+                                               for scm, entries in CxOneFlowConfig.__ordered_scm_services_config.items()}
         except Exception as ex:
             CxOneFlowConfig.log().exception(ex)
             raise
@@ -436,7 +491,113 @@ class CxOneFlowConfig(CommonConfig):
             )
 
     __ordered_scm_services_config = {}
+    __route_indexes = {}
     __scm_services_config_by_service_moniker = {}
+    __delivery_dedup = DeliveryDedup()
+    __protected_branch_cache = None
+    __project_catalog_settings = None
+    __project_config_cache_settings = None
+    __ingestion_enabled = False
+    __ingestion_max_concurrent = IngestionService.DEFAULT_MAX_CONCURRENT
+    __metrics_log_interval = None
+
+    @staticmethod
+    def __ingestion_service_factory(config_path, moniker, **kwargs) -> IngestionService:
+        return IngestionService(moniker, CxOneFlowConfig.__ingestion_enabled, CxOneFlowConfig.__ingestion_max_concurrent,
+                                *CxOneFlowConfig._load_amqp_settings(config_path, **kwargs))
+
+    @staticmethod
+    def __positive_int(config_path : str, value : Any) -> int:
+        if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+            raise ConfigurationException.invalid_value(config_path)
+        return value
+
+    @staticmethod
+    def __positive_number(config_path : str, value : Any) -> float:
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or value <= 0:
+            raise ConfigurationException.invalid_value(config_path)
+        return value
+
+    @staticmethod
+    def __setup_background_tasks(config_path : str, config_dict : Dict):
+        TaskManager.configure(
+            CxOneFlowConfig.__positive_int(f"{config_path}/max-in-flight",
+                CxOneFlowConfig._get_value_for_key_or_default("max-in-flight", config_dict, TaskManager.DEFAULT_MAX_IN_FLIGHT)),
+            CxOneFlowConfig.__positive_int(f"{config_path}/max-queued",
+                CxOneFlowConfig._get_value_for_key_or_default("max-queued", config_dict, TaskManager.DEFAULT_MAX_QUEUED)))
+
+    @staticmethod
+    def __setup_delivery_dedup(config_path : str, config_dict : Dict) -> DeliveryDedup:
+        return DeliveryDedup(
+            CxOneFlowConfig.__positive_int(f"{config_path}/ttl-seconds",
+                CxOneFlowConfig._get_value_for_key_or_default("ttl-seconds", config_dict, DeliveryDedup.DEFAULT_TTL_SECONDS)),
+            CxOneFlowConfig.__positive_int(f"{config_path}/max-entries",
+                CxOneFlowConfig._get_value_for_key_or_default("max-entries", config_dict, DeliveryDedup.DEFAULT_MAX_ENTRIES)),
+            CxOneFlowConfig._get_value_for_key_or_default("shared-path", config_dict, None))
+
+    @staticmethod
+    def __setup_protected_branch_cache(config_path : str, config_dict : Dict) -> ProtectedBranchCache:
+        if not bool(CxOneFlowConfig._get_value_for_key_or_default("enabled", config_dict, False)):
+            return None
+
+        return ProtectedBranchCache(
+            CxOneFlowConfig.__positive_int(f"{config_path}/ttl-seconds",
+                CxOneFlowConfig._get_value_for_key_or_default("ttl-seconds", config_dict, ProtectedBranchCache.DEFAULT_TTL_SECONDS)),
+            CxOneFlowConfig.__positive_int(f"{config_path}/max-entries",
+                CxOneFlowConfig._get_value_for_key_or_default("max-entries", config_dict, ProtectedBranchCache.DEFAULT_MAX_ENTRIES)),
+            bool(CxOneFlowConfig._get_value_for_key_or_default("background-refresh", config_dict, False)))
+
+    @staticmethod
+    def __setup_project_catalog(config_path : str, config_dict : Dict) -> Tuple:
+        if not bool(CxOneFlowConfig._get_value_for_key_or_default("enabled", config_dict, False)):
+            return None
+
+        return (CxOneFlowConfig.__positive_int(f"{config_path}/ttl-seconds",
+                    CxOneFlowConfig._get_value_for_key_or_default("ttl-seconds", config_dict, ProjectCatalog.DEFAULT_TTL_SECONDS)),
+                CxOneFlowConfig.__positive_int(f"{config_path}/max-entries",
+                    CxOneFlowConfig._get_value_for_key_or_default("max-entries", config_dict, ProjectCatalog.DEFAULT_MAX_ENTRIES)),
+                bool(CxOneFlowConfig._get_value_for_key_or_default("preload", config_dict, False)))
+
+    @staticmethod
+    def __project_catalog() -> ProjectCatalog:
+        # Each service has a catalog since each service may connect to a different tenant.
+        if CxOneFlowConfig.__project_catalog_settings is None:
+            return None
+        return ProjectCatalog(*CxOneFlowConfig.__project_catalog_settings)
+
+    @staticmethod
+    def __setup_project_config_cache(config_path : str, config_dict : Dict) -> Tuple:
+        if not bool(CxOneFlowConfig._get_value_for_key_or_default("enabled", config_dict, False)):
+            return None
+
+        return (CxOneFlowConfig.__positive_int(f"{config_path}/ttl-seconds",
+                    CxOneFlowConfig._get_value_for_key_or_default("ttl-seconds", config_dict, ProjectConfigCache.DEFAULT_TTL_SECONDS)),
+                CxOneFlowConfig.__positive_int(f"{config_path}/max-entries",
+                    CxOneFlowConfig._get_value_for_key_or_default("max-entries", config_dict, ProjectConfigCache.DEFAULT_MAX_ENTRIES)))
+
+    @staticmethod
+    def __project_config_cache() -> ProjectConfigCache:
+        if CxOneFlowConfig.__project_config_cache_settings is None:
+            return None
+        return ProjectConfigCache(*CxOneFlowConfig.__project_config_cache_settings)
+
+    @staticmethod
+    def __setup_rate_governor(config_path : str, api_url : str, config_dict : Dict) -> RateGovernor:
+        rate = CxOneFlowConfig._get_value_for_key_or_default("requests-per-second", config_dict, None)
+
+        return RateGovernor(urlparse(api_url).netloc,
+            CxOneFlowConfig.__positive_number(f"{config_path}/requests-per-second", rate) if rate is not None else None,
+            CxOneFlowConfig.__positive_int(f"{config_path}/burst",
+                CxOneFlowConfig._get_value_for_key_or_default("burst", config_dict, RateGovernor.DEFAULT_BURST)))
+
+    @staticmethod
+    def __setup_conditional_cache(config_path : str, api_url : str, config_dict : Dict, default_enabled : bool) -> ConditionalRequestCache:
+        if not bool(CxOneFlowConfig._get_value_for_key_or_default("enabled", config_dict, default_enabled)):
+            return None
+
+        return ConditionalRequestCache(urlparse(api_url).netloc,
+            CxOneFlowConfig.__positive_int(f"{config_path}/max-entries",
+                CxOneFlowConfig._get_value_for_key_or_default("max-entries", config_dict, ConditionalRequestCache.DEFAULT_MAX_ENTRIES)))
 
     @staticmethod
     def __scm_api_auth_factory(
@@ -492,6 +653,27 @@ class CxOneFlowConfig(CommonConfig):
             CxOneFlowConfig._get_secret_from_value_of_key_or_fail(config_path, "ssh-public-key", config_dict),
             moniker, max_scans)
 
+    @staticmethod
+    def __compression_level(config_path : str, level : Any) -> int:
+        if not isinstance(level, int) or isinstance(level, bool) or level < 0 or level > 9:
+            raise ConfigurationException.invalid_value(config_path)
+        return level
+
+    @staticmethod
+    def __megabytes_to_bytes(config_path : str, size_mb : Any) -> int:
+        if size_mb is None:
+            return None
+
+        try:
+            size_bytes = int(float(size_mb) * 1024 * 1024)
+        except ValueError:
+            raise ConfigurationException.invalid_value(config_path)
+
+        if size_bytes < 0:
+            raise ConfigurationException.invalid_value(config_path)
+
+        return size_bytes
+
     @staticmethod
     def __setup_naming(config_path :str, config_dict : Dict) -> Tuple[ProjectNamingService.CORO_SPEC, bool]:
         if config_dict is None:
@@ -529,7 +711,7 @@ class CxOneFlowConfig(CommonConfig):
 
     @staticmethod
     def __setup_scm(
-        cloner_factory, api_auth_factory, scm_class, config_dict, config_path
+        cloner_factory, api_auth_factory, scm_class, conditional_cache_default, config_dict, config_path
     ) -> CxOneFlowServices:
         repo_matcher = re.compile(
             CxOneFlowConfig._get_value_for_key_or_fail(
@@ -615,7 +797,20 @@ class CxOneFlowConfig(CommonConfig):
             ),
             naming_update_flag,
             group_update_flag,
-            grouping_service
+            grouping_service,
+            CxOneFlowConfig.__megabytes_to_bytes(f"{config_path}/scan-config/max-file-size-mb",
+                CxOneFlowConfig._get_value_for_key_or_default("max-file-size-mb", scan_config_dict, None)),
+            CxOneFlowConfig._get_value_for_key_or_default("excluded-file-extensions", scan_config_dict, None),
+            CxOneFlowConfig.__megabytes_to_bytes(f"{config_path}/scan-config/in-memory-payload-max-mb",
+                CxOneFlowConfig._get_value_for_key_or_default("in-memory-payload-max-mb", scan_config_dict, 
+                                                              CxOneFlowConfig.__default_in_memory_payload_max_mb)),
+            CxOneFlowConfig.__compression_level(f"{config_path}/scan-config/compression-level",
+                CxOneFlowConfig._get_value_for_key_or_default("compression-level", scan_config_dict, 
+                                                              CxOneFlowConfig.__default_compression_level)),
+            bool(CxOneFlowConfig._get_value_for_key_or_default("reuse-identical-scans", scan_config_dict, False)),
+            bool(CxOneFlowConfig._get_value_for_key_or_default("cancel-superseded-scans", scan_config_dict, True)),
+            CxOneFlowConfig.__project_catalog(),
+            CxOneFlowConfig.__project_config_cache(),
         )
 
         connection_config_dict = CxOneFlowConfig._get_value_for_key_or_fail(
@@ -671,6 +866,14 @@ class CxOneFlowConfig(CommonConfig):
                 "proxies", connection_config_dict, None
             ),
             ssl_verify,
+            CxOneFlowConfig.__positive_int(f"{config_path}/connection/connection-pool-size",
+                CxOneFlowConfig._get_value_for_key_or_default("connection-pool-size", connection_config_dict, 
+                                                              PooledTransport.DEFAULT_POOL_SIZE)),
+            CxOneFlowConfig.__setup_rate_governor(f"{config_path}/connection/rate-limit", api_url,
+                CxOneFlowConfig._get_value_for_key_or_default("rate-limit", connection_config_dict, {})),
+            CxOneFlowConfig.__setup_conditional_cache(f"{config_path}/connection/conditional-requests", api_url,
+                CxOneFlowConfig._get_value_for_key_or_default("conditional-requests", connection_config_dict, {}),
+                conditional_cache_default),
         )
 
         scm_shared_secret = CxOneFlowConfig._get_secret_from_value_of_key_or_fail(
@@ -692,19 +895,45 @@ class CxOneFlowConfig(CommonConfig):
             clone_auth_dict = api_auth_dict
             clone_config_path = f"{config_path}/connection/api-auth"
 
+        cloner = CxOneFlowConfig.__cloner_factory(
+            api_session,
+            cloner_factory,
+            clone_auth_dict,
+            clone_config_path,
+            ssl_no_verify_git,
+        )
+
+        cloner.clone_cache = CxOneFlowConfig._load_clone_cache(f"{config_path}/connection/clone-cache",
+            CxOneFlowConfig._get_value_for_key_or_default("clone-cache", connection_config_dict, None))
+
+        try:
+            cloner.clone_strategy = CloneStrategy(CxOneFlowConfig._get_value_for_key_or_default(
+                "clone-strategy", connection_config_dict, CloneStrategy.FULL.value))
+        except ValueError:
+            raise ConfigurationException.invalid_value(f"{config_path}/connection/clone-strategy")
+
+        max_concurrent_clones = CxOneFlowConfig._get_value_for_key_or_default("max-concurrent-clones", connection_config_dict, None)
+        cloner.max_concurrent_per_host = CxOneFlowConfig.__positive_int(f"{config_path}/connection/max-concurrent-clones",
+            max_concurrent_clones) if max_concurrent_clones is not None else None
+
+        clone_timeout = CxOneFlowConfig._get_value_for_key_or_default("clone-timeout-seconds", connection_config_dict, None)
+        cloner.git_timeout_seconds = CxOneFlowConfig.__positive_number(f"{config_path}/connection/clone-timeout-seconds",
+            clone_timeout) if clone_timeout is not None else None
+        cloner.sparse_checkout_enabled = bool(CxOneFlowConfig._get_value_for_key_or_default("sparse-checkout", connection_config_dict, False))
+
+        if cloner.clone_cache is not None and cloner.clone_strategy != CloneStrategy.FULL:
+            CxOneFlowConfig.log().warning(f"{config_path}/connection/clone-strategy is ignored when clone-cache is configured.")
+
         scm_service = scm_class(
             display_url,
             service_moniker,
             api_session,
             scm_shared_secret,
-            CxOneFlowConfig.__cloner_factory(
-                api_session,
-                cloner_factory,
-                clone_auth_dict,
-                clone_config_path,
-                ssl_no_verify_git,
-            ),
+            cloner,
         )
+        scm_service.protected_branch_cache = CxOneFlowConfig.__protected_branch_cache
+        if isinstance(scm_service, GHService):
+            scm_service.graphql_enabled = bool(CxOneFlowConfig._get_value_for_key_or_default("graphql", connection_config_dict, False))
 
         return CxOneFlowServices(
             repo_matcher,
@@ -717,7 +946,9 @@ class CxOneFlowConfig(CommonConfig):
             CxOneFlowConfig.__kickoff_service_factory(cxone_client,
                 CxOneFlowConfig._get_value_for_key_or_default("kickoff", config_dict, None), 
                 f"{config_path}/kickoff", service_moniker),
-            ProjectNamingService(naming_coro, scm_service)
+            ProjectNamingService(naming_coro, scm_service),
+            CxOneFlowConfig.__ingestion_service_factory(f"{config_path}/feedback", service_moniker,
+                **(CxOneFlowConfig._get_value_for_key_or_default("feedback", config_dict, {})))
         )
 
     @staticmethod
@@ -1000,3 +1231,11 @@ class CxOneFlowConfig(CommonConfig):
         "gh": GHService,
         "gl": GLService,
     }
+
+    # GitHub does not count 304 responses against the rate limit.
+    __conditional_cache_defaults = {
+        "bbdc": False,
+        "adoe": False,
+        "gh": True,
+        "gl": False,
+    }
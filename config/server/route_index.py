@@ -0,0 +1,147 @@
+import re, logging
+from collections import OrderedDict, Counter
+from threading import Lock
+from typing import Any, List, Tuple
+
+
+class RouteIndex:
+    """Finds the first route, in configuration order, with a pattern that matches a URL.
+
+    Each pattern is indexed by a literal it requires the URL to contain, preferring literals that are
+    shared by the fewest patterns.  A lookup only evaluates the patterns whose literal appears in the
+    URL; patterns without a usable literal are always evaluated.  Lookups are kept in an LRU cache.
+    """
+
+    DEFAULT_CACHE_SIZE = 4096
+
+    __escaped_literals = set("\\.^$*+?{}[]()|/-:@#&~%=!,;'\"<> ")
+
+    # Escapes longer than two characters (hex, unicode, named, octal) and backreferences.
+    __unhandled_escapes = set("xuUN0123456789")
+
+    @classmethod
+    def log(clazz) -> logging.Logger:
+        return logging.getLogger(clazz.__name__)
+
+    def __init__(self, routes : List[Tuple[re.Pattern, Any]], cache_size : int=DEFAULT_CACHE_SIZE):
+        self.__cache_size = cache_size
+        self.__cache = OrderedDict()
+        self.__lock = Lock()
+        literals = [RouteIndex.required_literals(pattern) for pattern, _ in routes]
+        shared = Counter([literal for found in literals for literal in set(found)])
+
+        self.__routes = [(pattern, min(found, key=lambda x: (shared[x], -len(x))) if len(found) > 0 else None,
+                          bool(pattern.flags & re.IGNORECASE), value) for (pattern, value), found in zip(routes, literals)]
+
+        RouteIndex.log().debug(f"Indexed {len(self.__routes)} routes, " +
+                               f"{len([x for x in self.__routes if x[1] is not None])} with a required literal.")
+
+    @staticmethod
+    def __skip_class(pattern : str, pos : int) -> int:
+        pos += 1
+        if pos < len(pattern) and pattern[pos] == "^":
+            pos += 1
+        if pos < len(pattern) and pattern[pos] == "]":
+            pos += 1
+        while pos < len(pattern) and pattern[pos] != "]":
+            pos += 2 if pattern[pos] == "\\" else 1
+        return pos + 1
+
+    @staticmethod
+    def __literal_runs(pattern : str) -> List[str]:
+        """Runs of ASCII literal characters that any match must contain, or an empty list if unknown."""
+        runs = []
+        run = []
+        depth = 0
+        pos = 0
+
+        def end_run():
+            if len(run) > 0:
+                runs.append("".join(run))
+                run.clear()
+
+        while pos < len(pattern):
+            c = pattern[pos]
+
+            if c == "\\" and pos + 1 < len(pattern):
+                escaped = pattern[pos + 1]
+                if escaped in RouteIndex.__unhandled_escapes:
+                    return []
+                elif depth == 0 and escaped in RouteIndex.__escaped_literals:
+                    run.append(escaped)
+                else:
+                    end_run()
+                pos += 2
+            elif c == "[":
+                end_run()
+                pos = RouteIndex.__skip_class(pattern, pos)
+            elif c == "(":
+                end_run()
+                depth += 1
+                pos += 1
+            elif c == ")":
+                depth -= 1
+                pos += 1
+            elif c == "|":
+                if depth == 0:
+                    # Nothing is required of every alternative.
+                    return []
+                pos += 1
+            elif c in "*?{":
+                # The previous element may not be present.
+                if len(run) > 0:
+                    run.pop()
+                end_run()
+                if c == "{":
+                    close = pattern.find("}", pos)
+                    pos = close + 1 if close > pos else pos + 1
+                else:
+                    pos += 1
+            elif c in "+.^$" or depth > 0 or not c.isascii():
+                end_run()
+                pos += 1
+            else:
+                run.append(c)
+                pos += 1
+
+        end_run()
+        return runs
+
+    @staticmethod
+    def required_literals(pattern : re.Pattern) -> List[str]:
+        """Literals a URL must contain to match the pattern, lower case if the pattern ignores case."""
+        if pattern.flags & re.VERBOSE:
+            return []
+
+        runs = RouteIndex.__literal_runs(pattern.pattern)
+        return [x.lower() for x in runs] if pattern.flags & re.IGNORECASE else runs
+
+    def __find(self, url : str) -> Any:
+        # Case-insensitive matching of some non-ASCII characters can match ASCII literals, so those
+        # URLs are checked against every pattern.
+        lowered = url.lower() if url.isascii() else None
+
+        for pattern, literal, ignore_case, value in self.__routes:
+            if literal is not None and lowered is not None and literal not in (lowered if ignore_case else url):
+                continue
+
+            if pattern.match(url):
+                return value
+
+        return None
+
+    def match(self, url : str) -> Any:
+        """Returns the value of the first route matching the URL, or None if no route matches."""
+        with self.__lock:
+            if url in self.__cache:
+                self.__cache.move_to_end(url)
+                return self.__cache[url]
+
+        found = self.__find(url)
+
+        with self.__lock:
+            self.__cache[url] = found
+            while len(self.__cache) > self.__cache_size:
+                self.__cache.popitem(last=False)
+
+        return found
@@ -7,12 +7,15 @@ from cxone_api.low.reports import create_a_report, retrieve_report_status, downl
 from cxone_api.low.scans import retrieve_list_of_scans, update_scan_tags
 from cxone_api.util import page_generator
 from cxone_api import CxOneClient
-from typing import Dict, List
-from jsonpath_ng.ext import parser
+from typing import Dict, List, Tuple
 from api_utils.auth_factories import EventContext
-import logging, asyncio
-from datetime import datetime
+import logging, asyncio, hashlib, json, requests, copy
+from urllib.parse import urljoin
+from datetime import datetime, UTC
 from cxone_service.grouping import GroupingService
+from cxone_service.scan_index import ScanIndex
+from cxone_service.project_catalog import ProjectCatalog
+from cxone_service.project_config_cache import ProjectConfigCache
 
 class CxOneException(Exception):
     pass
@@ -24,11 +27,20 @@ class CxOneService:
     PR_TARGET_TAG = "pr-target"
     PR_STATUS_TAG = "pr-status"
     PR_STATE_TAG = "pr-state"
+    TREE_TAG = "tree"
+    SCAN_CONFIG_TAG = "scan-config"
+    SUPERSEDED_BY_TAG = "superseded-by"
+    REUSED_BY_TAG_PREFIX = "reused-by-"
+
+    REUSABLE_SCAN_STATUSES = ["Completed"]
+    SUPERSEDING_SCAN_STATUSES = ["Queued", "Running", "Completed", "Partial", "Failed"]
+    ACTIVE_SCAN_STATUSES = ["Queued", "Running"]
 
     UPDATABLE_SCANS_STATUSES = ["Completed", "Failed", "Partial"]
 
     __report_poll_delay_seconds = 30
     __report_generate_timeout_seconds = 600
+    __scan_index_max_entries = 4096
 
 
     @staticmethod
@@ -39,7 +51,10 @@ class CxOneService:
 
     def __init__(self, moniker : str, cxone_client : CxOneClient, default_engines : Dict,
                  default_scan_tags : Dict, default_project_tags : Dict, 
-                 rename_legacy_projects : bool, update_groups : bool, grouping_service : GroupingService):
+                 rename_legacy_projects : bool, update_groups : bool, grouping_service : GroupingService,
+                 max_file_size : int=None, excluded_file_extensions : List[str]=None, payload_memory_limit : int=None,
+                 compression_level : int=9, reuse_identical_scans : bool=False, cancel_superseded_scans : bool=True,
+                 project_catalog : ProjectCatalog=None, project_config_cache : ProjectConfigCache=None):
         self.__rename_legacy = rename_legacy_projects
         self.__client = cxone_client
         self.__moniker = moniker
@@ -48,7 +63,47 @@ class CxOneService:
         self.__default_engine_config = default_engines
         self.__update_groups = update_groups
         self.__group_service = grouping_service
+        self.__max_file_size = max_file_size
+        self.__excluded_file_extensions = excluded_file_extensions
+        self.__payload_memory_limit = payload_memory_limit
+        self.__compression_level = compression_level
+        self.__reuse_identical_scans = reuse_identical_scans
+        self.__cancel_superseded_scans = cancel_superseded_scans
+        self.__scan_index = ScanIndex(CxOneService.__scan_index_max_entries)
+        self.__project_catalog = project_catalog
+        self.__project_config_cache = project_config_cache
+
+    def __getstate__(self):
+        # The project catalog and configuration cache are local to the process that configured them.
+        state = dict(self.__dict__)
+        state['_CxOneService__project_catalog'] = None
+        state['_CxOneService__project_config_cache'] = None
+        return state
     
+    @property
+    def max_file_size(self) -> int:
+        return self.__max_file_size
+
+    @property
+    def excluded_file_extensions(self) -> List[str]:
+        return self.__excluded_file_extensions
+
+    @property
+    def payload_memory_limit(self) -> int:
+        return self.__payload_memory_limit
+
+    @property
+    def compression_level(self) -> int:
+        return self.__compression_level
+
+    @property
+    def reuse_identical_scans(self) -> bool:
+        return self.__reuse_identical_scans
+
+    @property
+    def cancel_superseded_scans(self) -> bool:
+        return self.__cancel_superseded_scans
+
     @property
     def moniker(self) -> str:
         return self.__moniker
@@ -119,31 +174,52 @@ class CxOneService:
     async def __resolve_group_memberships(self, existing_groups : List[str], clone_url : str) -> List[str]:
         return list(set(existing_groups + await self.__group_service.resolve_groups(clone_url)))
 
+    def __all_projects(self):
+        return page_generator(retrieve_list_of_projects, "projects", client=self.__client)
+
+    async def __find_projects(self, default_project_name : str, dynamic_project_name : str, use_catalog : bool) -> Tuple[List[dict], bool]:
+        if use_catalog:
+            # The dynamic name takes precedence, so the default project is only used after searching for both names.
+            cached = await self.__project_catalog.get(dynamic_project_name, self.__all_projects)
+            if cached is not None:
+                return [cached], True
+
+        projects = CxOneService.__get_json_or_fail (await retrieve_list_of_projects(self.__client, 
+            names=",".join([default_project_name, dynamic_project_name])))['projects']
+
+        if self.__project_catalog is not None and projects is not None:
+            self.__project_catalog.put_all(projects)
+
+        return (projects if projects is not None else []), False
+
     async def __create_or_retrieve_project(self, default_project_name : str, 
-                                           dynamic_project_name : str, clone_url : str) -> dict:
+                                           dynamic_project_name : str, clone_url : str, use_catalog : bool=True) -> dict:
         
-        projects_response = CxOneService.__get_json_or_fail (await retrieve_list_of_projects(self.__client, 
-            names=",".join([default_project_name, dynamic_project_name])))
+        projects, cached = await self.__find_projects(default_project_name, dynamic_project_name, 
+                                                      use_catalog and self.__project_catalog is not None)
 
-
-        if int(projects_response['filteredTotalCount']) == 0:
+        if len(projects) == 0:
             project_json = CxOneService.__get_json_or_fail (await create_a_project (self.__client, \
                 groups = await self.__group_service.resolve_groups(clone_url),
                 name=dynamic_project_name, origin=__agent__, 
                 tags=self.__default_project_tags | {"cxone-flow" : __version__, "service" : self.moniker}))
             project_id = project_json['id']
+
+            if self.__project_catalog is not None:
+                self.__project_catalog.put(project_json)
         else:
-            dynamic_search = parser.parse(f"$.projects[?(@.name=='{dynamic_project_name}')]").find(projects_response)
-            default_search = parser.parse(f"$.projects[?(@.name=='{default_project_name}')]").find(projects_response)
+            dynamic_search = [p for p in projects if p['name'] == dynamic_project_name]
+            default_search = [p for p in projects if p['name'] == default_project_name]
 
             do_name_update = False
             if len(dynamic_search) > 0:
-                project_json = dynamic_search.pop().value
+                project_json = dynamic_search.pop()
             else:
-                project_json = default_search.pop().value
+                project_json = default_search.pop()
                 do_name_update = self.__rename_legacy
 
             project_id = project_json['id']
+            orig_name = project_json['name']
             new_tags = {k:self.__default_project_tags[k] \
                                     for k in self.__default_project_tags.keys() if k not in project_json['tags'].keys()}
             
@@ -175,6 +251,11 @@ class CxOneService:
                     project_json['groups'] = new_list
                     exec_update = True
 
+            if exec_update and cached:
+                # The update is computed again from the current project definition so changes made elsewhere are kept.
+                self.__project_catalog.discard(orig_name)
+                return await self.__create_or_retrieve_project(default_project_name, dynamic_project_name, clone_url, False)
+
             if exec_update:
                 retried = False
 
@@ -195,18 +276,35 @@ class CxOneService:
                     else:
                         retried = True
 
+                if self.__project_catalog is not None:
+                    self.__project_catalog.discard(orig_name)
+                    if update_response.ok:
+                        self.__project_catalog.put(project_json)
+
                 CxOneService.__succeed_or_throw(update_response)
+            elif self.__project_catalog is not None:
+                self.__project_catalog.update_skipped()
             
         return project_json
 
-    async def __get_engine_config_for_scan(self, project_config : ProjectRepoConfig, commit_branch : str) -> dict:
+    async def __project_config_value(self, key : tuple, loader):
+        if self.__project_config_cache is None:
+            return await loader()
+        return await self.__project_config_cache.get(key, loader)
+
+    async def get_scan_filter_config(self, project_config : ProjectRepoConfig) -> ScanFilterConfig:
+        """Returns the scan filter configuration of the project.  The returned configuration may be shared and must not be modified."""
+        return await self.__project_config_value(("filters", project_config.id), 
+                                                 lambda: ScanFilterConfig.from_repo_config(self.__client, project_config))
+
+    async def __load_engine_config_for_scan(self, project_config : ProjectRepoConfig, commit_branch : str) -> dict:
         enabled_scanners = await project_config.get_enabled_scanners(commit_branch)
         return_engine_config = dict(self.__default_engine_config)
 
         for missing_engine in [engine for engine in enabled_scanners if engine not in return_engine_config.keys()]:
             return_engine_config[missing_engine] = {}
 
-        scan__filter_cfg = await ScanFilterConfig.from_repo_config(self.__client, project_config)
+        scan__filter_cfg = await self.get_scan_filter_config(project_config)
         return_engine_config = scan__filter_cfg.compute_filters_with_defaults(return_engine_config)
 
         if len(return_engine_config) == 0:
@@ -214,6 +312,123 @@ class CxOneService:
         
         return return_engine_config
 
+    async def __get_engine_config_for_scan(self, project_config : ProjectRepoConfig, commit_branch : str) -> dict:
+        return copy.deepcopy(await self.__project_config_value(("engines", project_config.id, commit_branch),
+                                                               lambda: self.__load_engine_config_for_scan(project_config, commit_branch)))
+
+    async def get_engine_config(self, project_config : ProjectRepoConfig, commit_branch : str) -> dict:
+        """Returns the engine configuration for a scan of the branch, resolved once and shared by the steps of the scan."""
+        return await self.__get_engine_config_for_scan(project_config, commit_branch)
+
+    @staticmethod
+    def file_filters(engine_config : dict) -> Dict[str, str]:
+        """Returns the file filter for each engine in the engine configuration, None if an engine has no filter."""
+        filters = {}
+        for engine, cfg in engine_config.items():
+            filter_value = cfg.get("filter", None) if isinstance(cfg, dict) else None
+            filters[engine] = filter_value if isinstance(filter_value, str) and len(filter_value.strip()) > 0 else None
+
+        return filters
+
+    @staticmethod
+    def scan_config_digest(engine_config : dict) -> str:
+        """A digest of the engine configuration for a scan; scans of the same tree are only equivalent if this matches."""
+        return hashlib.sha256(json.dumps(engine_config, sort_keys=True, default=str).encode("UTF-8")).hexdigest()[:16]
+
+    def record_scan_for_tree(self, project_config : ProjectRepoConfig, tree_hash : str, config_digest : str, scan_id : str):
+        self.__scan_index.put((project_config.id, tree_hash, config_digest), scan_id)
+
+    async def find_scan_for_tree(self, project_config : ProjectRepoConfig, tree_hash : str, config_digest : str) -> ScanInspector:
+        """Finds a scan in the project for the same tree and engine configuration that has not failed."""
+        key = (project_config.id, tree_hash, config_digest)
+
+        scan_id = self.__scan_index.get(key)
+        if scan_id is not None:
+            inspector = await self.load_scan_inspector(scan_id)
+            if inspector is not None and not inspector.failed:
+                return inspector
+            self.__scan_index.discard(key)
+
+        async for scan in page_generator(retrieve_list_of_scans, "scans", client=self.__client, statuses=CxOneService.REUSABLE_SCAN_STATUSES,
+                                    project_names=project_config.name, tags_keys=CxOneService.TREE_TAG, tags_values=tree_hash):
+            if scan['tags'].get(CxOneService.SCAN_CONFIG_TAG, None) == config_digest:
+                self.__scan_index.put(key, scan['id'])
+                return await self.load_scan_inspector(scan['id'])
+
+        return None
+
+    async def tag_reused_scan(self, inspector : ScanInspector, scan_tags : dict):
+        """Records an event using an existing scan in a reused-by-<commit> tag.
+
+        The scan's commit, PR and workflow tags describe the event that submitted it and are not changed.  The tag value
+        is the PR id for pull-request events, otherwise the event's workflow.
+        """
+        commit = scan_tags.get(CxOneService.COMMIT_TAG, None)
+        if commit is None:
+            return
+
+        tags = dict(inspector.json.get('tags', None) or {})
+        reuse_key = f"{CxOneService.REUSED_BY_TAG_PREFIX}{commit}"
+        reuse_value = f"pr-{scan_tags[CxOneService.PR_ID_TAG]}" if CxOneService.PR_ID_TAG in scan_tags.keys() \
+            else str(scan_tags.get("workflow", None))
+
+        if tags.get(reuse_key, None) == reuse_value and CxOneService.SUPERSEDED_BY_TAG not in tags.keys():
+            return
+
+        tags[reuse_key] = reuse_value
+        tags.pop(CxOneService.SUPERSEDED_BY_TAG, None)
+
+        update_response = await update_scan_tags(self.__client, inspector.scan_id, {"tags" : tags})
+        if not update_response.ok:
+            CxOneService.log().warning(f"Unable to tag reused scan id {inspector.scan_id}: " + 
+                                       f"Response was {update_response.status_code}:{update_response.text}")
+
+    async def supersede_active_scans(self, project_id : str, scan_id : str, created_before : datetime, 
+                                     tag_key : str, tag_value : str, branch : str=None) -> List[str]:
+        """Marks queued or running scans of this service created before the given time with the same tag value as superseded
+        by the scan, and cancels them if configured to do so.
+
+        Polling for a marked scan stops without posting feedback.  Returns the ids of the marked scans.
+        """
+        query = {"project_id" : project_id, "tags_keys" : tag_key, "tags_values" : tag_value, 
+                 "statuses" : CxOneService.ACTIVE_SCAN_STATUSES}
+        if branch is not None:
+            query["branch"] = branch
+
+        superseded = []
+        async for scan in page_generator(retrieve_list_of_scans, "scans", client=self.__client, **query):
+            created = datetime.fromisoformat(scan['createdAt'])
+            if created.tzinfo is None:
+                created = created.replace(tzinfo=UTC)
+            if scan['id'] == scan_id or created >= created_before or str(scan['tags'].get(tag_key, None)) != str(tag_value) \
+                or scan['tags'].get("service", None) != self.moniker:
+                continue
+
+            update_response = await update_scan_tags(self.__client, scan['id'], 
+                                                     {"tags" : dict(scan['tags']) | {CxOneService.SUPERSEDED_BY_TAG : scan_id}})
+            if update_response.ok:
+                superseded.append(scan['id'])
+            else:
+                CxOneService.log().warning(f"Unable to mark scan id {scan['id']} as superseded by scan id {scan_id}: " + 
+                                           f"Response was {update_response.status_code}:{update_response.text}")
+                continue
+
+            if self.__cancel_superseded_scans:
+                await self.__cancel_scan(scan['id'])
+
+        return superseded
+
+    async def __cancel_scan(self, scan_id : str):
+        # PATCH /scans/{id} is issued directly since the pinned client version does not provide a wrapper for it.
+        cancel_response = await self.__client.exec_request(requests.patch, urljoin(self.__client.api_endpoint, f"scans/{scan_id}"),
+                                                            json={"status" : "Canceled"})
+        if cancel_response.ok:
+            CxOneService.log().info(f"Cancelled superseded scan id {scan_id}")
+        else:
+            # The scan may have finished since it was found.
+            CxOneService.log().warning(f"Unable to cancel superseded scan id {scan_id}: " + 
+                                       f"Response was {cancel_response.status_code}:{cancel_response.text}")
+
     async def load_project_config_by_id(self, project_id : str) -> ProjectRepoConfig:
         return await ProjectRepoConfig.from_project_id(self.__client, project_id)
     
@@ -221,8 +436,10 @@ class CxOneService:
         return await ProjectRepoConfig.from_project_json(self.__client, 
             await self.__create_or_retrieve_project(default_project_name, dynamic_project_name, clone_url))
 
-    async def execute_scan(self, zip_path : str, project_config : ProjectRepoConfig, commit_branch : str, scan_tags : dict ={}):
-        engine_config = await self.__get_engine_config_for_scan(project_config, commit_branch)
+    async def execute_scan(self, zip_path : str, project_config : ProjectRepoConfig, commit_branch : str, scan_tags : dict ={},
+                           engine_config : dict=None):
+        if engine_config is None:
+            engine_config = await self.__get_engine_config_for_scan(project_config, commit_branch)
 
         return CxOneService.__get_json_or_fail(await ScanInvoker.scan_get_response(self.__client, 
                 project_config, commit_branch, engine_config, scan_tags | self.__default_scan_tags, zip_path))
@@ -238,6 +455,25 @@ class CxOneService:
 
         return found_scans
     
+    async def find_newer_scan(self, project_id : str, scan_id : str, created_after : datetime, 
+                              tag_key : str, tag_value : str, branch : str=None) -> str:
+        """Returns the id of the newest scan in the project created after the given time with the same tag value, or None."""
+        query = {"project_id" : project_id, "tags_keys" : tag_key, "tags_values" : tag_value, 
+                 "statuses" : CxOneService.SUPERSEDING_SCAN_STATUSES, "sort" : "-created_at"}
+        if branch is not None:
+            query["branch"] = branch
+
+        async for scan in page_generator(retrieve_list_of_scans, "scans", client=self.__client, **query):
+            created = datetime.fromisoformat(scan['createdAt'])
+            if created.tzinfo is None:
+                created = created.replace(tzinfo=UTC)
+            if created <= created_after:
+                break
+            if scan['id'] != scan_id and str(scan['tags'].get(tag_key, None)) == str(tag_value):
+                return scan['id']
+
+        return None
+
     async def load_scan_inspector(self, scanid : str) -> ScanInspector:
         return await ScanLoader.load(self.__client, scanid)
     
@@ -0,0 +1,121 @@
+import asyncio, copy, logging, time
+from collections import OrderedDict
+from threading import Lock
+from typing import AsyncIterator, Callable, List
+from cxoneflow_metrics import MetricsRegistry
+
+
+class ProjectCatalog:
+    """A bounded, TTL-expiring cache of CxOne project definitions by project name.
+
+    Entries are written through when projects are created or updated by this process.  With preload enabled,
+    all projects in the tenant are loaded the first time the catalog is used.  Changes made to
+    projects outside of this process are not seen until the entry expires.
+    """
+
+    METRIC_HITS = "project_catalog.hits"
+    METRIC_MISSES = "project_catalog.misses"
+    METRIC_UPDATES_SKIPPED = "project_catalog.updates_skipped"
+
+    DEFAULT_TTL_SECONDS = 600
+    DEFAULT_MAX_ENTRIES = 10000
+
+    @classmethod
+    def log(clazz) -> logging.Logger:
+        return logging.getLogger(clazz.__name__)
+
+    def __init__(self, ttl_seconds : int=DEFAULT_TTL_SECONDS, max_entries : int=DEFAULT_MAX_ENTRIES, preload : bool=False):
+        self.__ttl = ttl_seconds
+        self.__max_entries = max_entries
+        self.__preload = preload
+        self.__entries = OrderedDict()
+        self.__preloads = {}
+        self.__preloaded = False
+        self.__lock = Lock()
+
+    @property
+    def ttl_seconds(self) -> int:
+        return self.__ttl
+
+    @property
+    def max_entries(self) -> int:
+        return self.__max_entries
+
+    @property
+    def preload(self) -> bool:
+        return self.__preload
+
+    def __put(self, project_json : dict, loaded : float):
+        self.__entries[project_json['name']] = (copy.deepcopy(project_json), loaded)
+        self.__entries.move_to_end(project_json['name'])
+        while len(self.__entries) > self.__max_entries:
+            self.__entries.popitem(last=False)
+
+    async def __load_all(self, project_source : Callable[[], AsyncIterator[dict]]):
+        count = 0
+        async for project_json in project_source():
+            with self.__lock:
+                self.__put(project_json, time.monotonic())
+            count += 1
+
+        self.__preloaded = True
+        ProjectCatalog.log().info(f"Preloaded {count} projects")
+
+    async def __ensure_preloaded(self, project_source : Callable[[], AsyncIterator[dict]]):
+        if self.__preloaded:
+            return
+
+        loop = asyncio.get_running_loop()
+
+        with self.__lock:
+            task = self.__preloads.get(loop, None)
+            if task is None:
+                task = loop.create_task(self.__load_all(project_source))
+                self.__preloads = {l:t for l, t in self.__preloads.items() if not l.is_closed()} | {loop : task}
+
+        try:
+            await asyncio.shield(task)
+        except Exception as ex:
+            # The catalog still works without the preload; lookups fall back to searching by name.
+            ProjectCatalog.log().warning(f"Project preload failed: {ex}")
+
+    async def get(self, name : str, project_source : Callable[[], AsyncIterator[dict]]=None) -> dict:
+        """Returns a copy of the cached project definition for the name, or None if it is not cached or has expired.
+
+        If preload is enabled, the project_source is used to load all projects the first time the catalog is used.
+        """
+        if self.__preload and project_source is not None:
+            await self.__ensure_preloaded(project_source)
+
+        with self.__lock:
+            entry = self.__entries.get(name, None)
+            if entry is not None and time.monotonic() - entry[1] >= self.__ttl:
+                del self.__entries[name]
+                entry = None
+
+            if entry is not None:
+                self.__entries.move_to_end(name)
+
+        if entry is None:
+            MetricsRegistry.increment(ProjectCatalog.METRIC_MISSES)
+            return None
+
+        MetricsRegistry.increment(ProjectCatalog.METRIC_HITS)
+        return copy.deepcopy(entry[0])
+
+    def put(self, project_json : dict):
+        with self.__lock:
+            self.__put(project_json, time.monotonic())
+
+    def put_all(self, projects : List[dict]):
+        now = time.monotonic()
+        with self.__lock:
+            for project_json in projects:
+                self.__put(project_json, now)
+
+    def discard(self, name : str):
+        with self.__lock:
+            self.__entries.pop(name, None)
+
+    def update_skipped(self):
+        MetricsRegistry.increment(ProjectCatalog.METRIC_UPDATES_SKIPPED)
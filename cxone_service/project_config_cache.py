@@ -0,0 +1,95 @@
+import asyncio, time, logging
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Awaitable, Callable, Hashable
+from cxoneflow_metrics import MetricsRegistry
+
+
+class ProjectConfigCache:
+    """A bounded, TTL-expiring cache of configuration resolved from CxOne project settings.
+
+    Concurrent misses for the same key on the same event loop share a single load.  Changes to the project
+    settings are not seen until the entry expires.
+    """
+
+    METRIC_HITS = "project_config_cache.hits"
+    METRIC_MISSES = "project_config_cache.misses"
+
+    DEFAULT_TTL_SECONDS = 30
+    DEFAULT_MAX_ENTRIES = 1000
+
+    @classmethod
+    def log(clazz) -> logging.Logger:
+        return logging.getLogger(clazz.__name__)
+
+    def __init__(self, ttl_seconds : int=DEFAULT_TTL_SECONDS, max_entries : int=DEFAULT_MAX_ENTRIES):
+        self.__ttl = ttl_seconds
+        self.__max_entries = max_entries
+        self.__entries = OrderedDict()
+        self.__loads = {}
+        self.__lock = Lock()
+
+    @property
+    def ttl_seconds(self) -> int:
+        return self.__ttl
+
+    @property
+    def max_entries(self) -> int:
+        return self.__max_entries
+
+    @staticmethod
+    def hit_ratio() -> float:
+        return MetricsRegistry.ratio(ProjectConfigCache.METRIC_HITS, ProjectConfigCache.METRIC_MISSES)
+
+    async def __load(self, key : Hashable, loader : Callable[[], Awaitable[Any]]) -> Any:
+        task = asyncio.current_task()
+        try:
+            value = await loader()
+        except BaseException:
+            with self.__lock:
+                if self.__loads.get(key, None) is task:
+                    del self.__loads[key]
+            raise
+
+        with self.__lock:
+            if self.__loads.get(key, None) is task:
+                del self.__loads[key]
+            self.__entries[key] = (value, time.monotonic())
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+
+        return value
+
+    def __start_load(self, key : Hashable, loader : Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        loop = asyncio.get_running_loop()
+
+        with self.__lock:
+            task = self.__loads.get(key, None)
+            if task is not None and not task.done() and task.get_loop() is loop:
+                return task
+
+            task = loop.create_task(self.__load(key, loader))
+            self.__loads[key] = task
+            return task
+
+    async def get(self, key : Hashable, loader : Callable[[], Awaitable[Any]]) -> Any:
+        """Returns the cached value for the key, calling the loader if the entry is missing or expired.
+
+        The cached value is shared, so callers must not modify it.
+        """
+        with self.__lock:
+            entry = self.__entries.get(key, None)
+            if entry is not None and time.monotonic() - entry[1] < self.__ttl:
+                self.__entries.move_to_end(key)
+            else:
+                entry = None
+
+        if entry is not None:
+            MetricsRegistry.increment(ProjectConfigCache.METRIC_HITS)
+            return entry[0]
+
+        MetricsRegistry.increment(ProjectConfigCache.METRIC_MISSES)
+
+        # Shielded so one requester's cancellation does not cancel a load other requesters are waiting on.
+        return await asyncio.shield(self.__start_load(key, loader))
@@ -0,0 +1,28 @@
+from collections import OrderedDict
+from typing import Hashable
+
+
+class ScanIndex:
+    """A bounded LRU index of scan ids by content key for scans submitted by this process."""
+
+    def __init__(self, max_entries : int):
+        self.__max_entries = max_entries
+        self.__index = OrderedDict()
+
+    def get(self, key : Hashable) -> str:
+        scan_id = self.__index.get(key, None)
+        if scan_id is not None:
+            self.__index.move_to_end(key)
+        return scan_id
+
+    def put(self, key : Hashable, scan_id : str):
+        self.__index[key] = scan_id
+        self.__index.move_to_end(key)
+        while len(self.__index) > self.__max_entries:
+            self.__index.popitem(last=False)
+
+    def discard(self, key : Hashable):
+        self.__index.pop(key, None)
+
+    def __len__(self):
+        return len(self.__index)
@@ -0,0 +1,83 @@
+import logging, asyncio, json
+from threading import Lock
+from typing import Callable, Dict, Union
+
+class MetricsRegistry:
+    __lock = Lock()
+    __counters = {}
+    __gauges = {}
+    __collectors = []
+
+    @staticmethod
+    def log():
+        return logging.getLogger("MetricsRegistry")
+
+    @staticmethod
+    def __key(name : str, labels : Dict[str, str]) -> str:
+        if labels is None or len(labels) == 0:
+            return name
+        return f"{name}{{{",".join([f"{k}={labels[k]}" for k in sorted(labels.keys())])}}}"
+
+    @staticmethod
+    def increment(name : str, value : Union[int, float]=1, **labels) -> None:
+        key = MetricsRegistry.__key(name, labels)
+        with MetricsRegistry.__lock:
+            MetricsRegistry.__counters[key] = MetricsRegistry.__counters.get(key, 0) + value
+
+    @staticmethod
+    def set_gauge(name : str, value : Union[int, float], **labels) -> None:
+        key = MetricsRegistry.__key(name, labels)
+        with MetricsRegistry.__lock:
+            MetricsRegistry.__gauges[key] = value
+
+    @staticmethod
+    def counter(name : str, **labels) -> Union[int, float]:
+        with MetricsRegistry.__lock:
+            return MetricsRegistry.__counters.get(MetricsRegistry.__key(name, labels), 0)
+
+    @staticmethod
+    def gauge(name : str, **labels) -> Union[int, float, None]:
+        with MetricsRegistry.__lock:
+            return MetricsRegistry.__gauges.get(MetricsRegistry.__key(name, labels), None)
+
+    @staticmethod
+    def ratio(hit_name : str, miss_name : str, **labels) -> float:
+        hits = MetricsRegistry.counter(hit_name, **labels)
+        total = hits + MetricsRegistry.counter(miss_name, **labels)
+        return 0.0 if total == 0 else hits / total
+
+    @staticmethod
+    def add_collector(collector : Callable[[], None]) -> None:
+        """Adds a callable that sets gauges computed when the metrics are read."""
+        with MetricsRegistry.__lock:
+            if collector not in MetricsRegistry.__collectors:
+                MetricsRegistry.__collectors.append(collector)
+
+    @staticmethod
+    def __collect() -> None:
+        with MetricsRegistry.__lock:
+            collectors = list(MetricsRegistry.__collectors)
+
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as ex:
+                MetricsRegistry.log().exception(ex)
+
+    @staticmethod
+    def snapshot() -> Dict[str, Dict]:
+        MetricsRegistry.__collect()
+        with MetricsRegistry.__lock:
+            return {"counters" : dict(MetricsRegistry.__counters), "gauges" : dict(MetricsRegistry.__gauges)}
+
+    @staticmethod
+    async def log_periodically(interval_seconds : int) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            MetricsRegistry.log().info(f"Metrics: {json.dumps(MetricsRegistry.snapshot(), sort_keys=True)}")
+
+    @staticmethod
+    def reset() -> None:
+        with MetricsRegistry.__lock:
+            MetricsRegistry.__counters.clear()
+            MetricsRegistry.__gauges.clear()
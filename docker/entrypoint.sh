@@ -29,4 +29,9 @@ python3 workflow_agent.py | tee -a /var/log/cxoneflow/workflow.log 2>&1 &
 echo Launching Nginx...
 sudo nginx
 
-gunicorn --bind=127.0.0.1:5000 --name=CxOneFlow wsgi:app
+if [ "$CXONEFLOW_ASGI" = "true" ]; then
+    uvicorn --host=127.0.0.1 --port=5000 --workers=$(python3 -c "from config import get_workers_count; print(get_workers_count())") \
+        --timeout-graceful-shutdown=600 --log-level=$(echo ${LOG_LEVEL:-INFO} | tr '[:upper:]' '[:lower:]') asgi:app
+else
+    gunicorn --bind=127.0.0.1:5000 --name=CxOneFlow wsgi:app
+fi
@@ -4,8 +4,9 @@ from .kickoff import KickoffOrchestrator
 import logging
 from config import RouteNotFoundException
 from config.server import CxOneFlowConfig
-from typing import List, Dict, Tuple, Union
+from typing import List, Dict, Tuple, Union, Type
 from cxoneflow_kickoff_api import KickoffResponseMsg
+from cxoneflow_metrics import MetricsRegistry
 
 
 class OrchestrationDispatch:
@@ -16,6 +17,35 @@ class OrchestrationDispatch:
         return logging.getLogger("OrchestrationDispatch")
     
     
+    METRIC_REJECTED = "orchestration.webhooks_rejected"
+
+    @staticmethod
+    def admit(orchestrator_class : Type[AbstractOrchestrator], headers : Dict, raw_event_payload : bytes) -> bool:
+        """Checks a webhook request before the payload is parsed.
+
+        Returns False if the event type is not handled by the orchestrator.  Raises NotAuthorizedException
+        if the payload signature does not match the shared secret of any service configured for the SCM.
+        The signature is checked again against the routed service when the event is orchestrated.
+        """
+        if not orchestrator_class.handles_event(headers):
+            OrchestrationDispatch.log().debug(f"Unhandled event type ignored for SCM [{orchestrator_class.CONFIG_KEY}]")
+            MetricsRegistry.increment(OrchestrationDispatch.METRIC_REJECTED, scm=orchestrator_class.CONFIG_KEY, reason="unhandled")
+            return False
+
+        try:
+            secrets = set([service.shared_secret for service in CxOneFlowConfig.retrieve_scm_services(orchestrator_class.CONFIG_KEY)])
+        except KeyError:
+            OrchestrationDispatch.log().error(f"No configured services for SCM: {orchestrator_class.CONFIG_KEY}")
+            secrets = set()
+
+        for secret in secrets:
+            if orchestrator_class.signature_valid(headers, raw_event_payload, secret):
+                return True
+
+        OrchestrationDispatch.log().warning(f"Payload signature validation failed for SCM [{orchestrator_class.CONFIG_KEY}], webhook payload rejected.")
+        MetricsRegistry.increment(OrchestrationDispatch.METRIC_REJECTED, scm=orchestrator_class.CONFIG_KEY, reason="signature")
+        raise OrchestrationDispatch.NotAuthorizedException()
+
     @staticmethod
     async def execute(orchestrator : AbstractOrchestrator):
 
@@ -38,6 +68,31 @@ class OrchestrationDispatch:
         except RouteNotFoundException as ex:
             OrchestrationDispatch.log().warning(f"Event [{orchestrator.event_name}] not handled for SCM [{orchestrator.config_key}]")
 
+    @staticmethod
+    async def ingest(orchestrator : AbstractOrchestrator) -> bool:
+        """Validates the payload signature and queues the event for orchestration by the workflow agent.
+
+        Returns False if the event could not be queued.
+        """
+        if orchestrator.is_diagnostic:
+            return True
+
+        try:
+            services = CxOneFlowConfig.retrieve_services_by_route(orchestrator.route_urls, orchestrator.config_key)
+            if services is None:
+                OrchestrationDispatch.log().error(f"No configured services for SCM: {orchestrator.config_key}")
+                return True
+
+            if not await orchestrator.is_signature_valid(services.scm.shared_secret):
+                OrchestrationDispatch.log().warning(f"Payload signature validation failed, webhook payload rejected.")
+                raise OrchestrationDispatch.NotAuthorizedException()
+
+            return await services.ingest.publish(orchestrator.config_key, orchestrator.qualified_name,
+                                                 orchestrator.event_context, orchestrator.delivery_id)
+        except RouteNotFoundException as ex:
+            OrchestrationDispatch.log().warning(f"Event [{orchestrator.event_name}] not handled for SCM [{orchestrator.config_key}]")
+            return True
+
     @staticmethod
     async def dispatch_delegated_scan_workflow(orchestrator : AbstractOrchestrator, scan_id : str):
         try:
@@ -1,7 +1,7 @@
 from orchestration.base import AbstractOrchestrator
 from orchestration.naming.adoe import AzureDevOpsProjectNaming
 import base64, urllib, urllib.parse, re
-from jsonpath_ng import parse
+from api_utils.json_paths import compile_path
 from cxone_api.util import CloneUrlParser
 from scm_services import SCMService
 from pathlib import Path
@@ -14,57 +14,62 @@ from typing import List, Dict
 class AzureDevOpsEnterpriseOrchestrator(AbstractOrchestrator):
 
     __diag_id = "f844ec47-a9db-4511-8281-8b63f4eaf94e"
-    __diagid_query = parse("$.resourceContainers.account.id")
-    __remoteurl_query = parse("$.resource.repository.remoteUrl")
-    __repo_project_key_query = parse("$.resource.repository.project.name")
-    __repo_slug_query = parse("$.resource.repository.name")
-    __repo_id_query = parse("$.resource.repository.id")
-    __payload_type_query = parse("$.eventType")
-    __repository_id_query = parse("$.resource.repository.id")
-    __collection_url_query = parse("$.resourceContainers.collection.baseUrl")
-
-    __policy_scope_query = parse("$.value[*].settings.scope[*]")
-    __branch_names_query = parse("$.value[*].name")
+    __diagid_query = compile_path("$.resourceContainers.account.id")
+    __remoteurl_query = compile_path("$.resource.repository.remoteUrl")
+    __repo_project_key_query = compile_path("$.resource.repository.project.name")
+    __repo_slug_query = compile_path("$.resource.repository.name")
+    __repo_id_query = compile_path("$.resource.repository.id")
+    __payload_type_query = compile_path("$.eventType")
+    __repository_id_query = compile_path("$.resource.repository.id")
+    __collection_url_query = compile_path("$.resourceContainers.collection.baseUrl")
+
+    __policy_scope_query = compile_path("$.value[*].settings.scope[*]")
+    __branch_names_query = compile_path("$.value[*].name")
 
     
-    __push_default_branch_query = parse("$.resource.repository.defaultBranch")
-    __push_target_branch_query = parse("$.resource.refUpdates..name")
-    __push_target_hash_query = parse("$.resource.refUpdates..newObjectId")
+    __push_default_branch_query = compile_path("$.resource.repository.defaultBranch")
+    __push_target_branch_query = compile_path("$.resource.refUpdates..name")
+    __push_target_hash_query = compile_path("$.resource.refUpdates..newObjectId")
+    __push_old_hash_query = compile_path("$.resource.refUpdates..oldObjectId")
 
+    __no_hash = "0000000000000000000000000000000000000000"
 
-    __pr_draft_query = parse("$.resource.isDraft")
-    __pr_self_link_query = parse("$.resource._links.web.href")    
-    __pr_tohash_query = parse("$.resource.lastMergeTargetCommit[commitId]")
-    __pr_tobranch_query = parse("$.resource.targetRefName")
-    __pr_fromhash_query = parse("$.resource.lastMergeSourceCommit[commitId]")
-    __pr_frombranch_query = parse("$.resource.sourceRefName")
-    __pr_id_query = parse("$.resource.pullRequestId")
-    __pr_reviewer_status_query = parse("$.resource.reviewers[*].vote")
-    __pr_state_query = parse("$.resource.status")
 
+    __pr_draft_query = compile_path("$.resource.isDraft")
+    __pr_self_link_query = compile_path("$.resource._links.web.href")    
+    __pr_tohash_query = compile_path("$.resource.lastMergeTargetCommit[commitId]")
+    __pr_tobranch_query = compile_path("$.resource.targetRefName")
+    __pr_fromhash_query = compile_path("$.resource.lastMergeSourceCommit[commitId]")
+    __pr_frombranch_query = compile_path("$.resource.sourceRefName")
+    __pr_id_query = compile_path("$.resource.pullRequestId")
+    __pr_reviewer_status_query = compile_path("$.resource.reviewers[*].vote")
+    __pr_state_query = compile_path("$.resource.status")
 
-    @property
-    def config_key(self):
-        return "adoe"
+
+    CONFIG_KEY = "adoe"
 
     def __init__(self, event_context : EventContext):
         AbstractOrchestrator.__init__(self, event_context)
 
-        self.__isdiagnostic = AzureDevOpsEnterpriseOrchestrator.__diag_id in [x.value for x in list(AzureDevOpsEnterpriseOrchestrator.__diagid_query.find(self.event_context.message))]
+        self.__isdiagnostic = AzureDevOpsEnterpriseOrchestrator.__diag_id in AzureDevOpsEnterpriseOrchestrator.__diagid_query.values(self.event_context.message)
         if self.__isdiagnostic:
             return
 
-        self.__event = [x.value for x in list(self.__payload_type_query.find(self.event_context.message))][0]
-        self.__route_urls = [x.value for x in list(self.__remoteurl_query.find(self.event_context.message))]
+        self.__event = self.__payload_type_query.values(self.event_context.message)[0]
+        self.__route_urls = self.__remoteurl_query.values(self.event_context.message)
         self.__remote_url = self.__route_urls[0]
-        self.__default_branches = [AbstractOrchestrator.normalize_branch_name(x.value) for x in list(self.__push_default_branch_query.find(self.event_context.message))]
-        self.__repo_key = [x.value for x in list(self.__repo_project_key_query.find(self.event_context.message))][0]
-        self.__repo_slug = [x.value for x in list(self.__repo_slug_query.find(self.event_context.message))][0]
-        self.__collection_url = [x.value for x in list(self.__collection_url_query.find(self.event_context.message))][0]
+        self.__default_branches = [AbstractOrchestrator.normalize_branch_name(x) for x in self.__push_default_branch_query.values(self.event_context.message)]
+        self.__repo_key = self.__repo_project_key_query.values(self.event_context.message)[0]
+        self.__repo_slug = self.__repo_slug_query.values(self.event_context.message)[0]
+        self.__collection_url = self.__collection_url_query.values(self.event_context.message)[0]
         self.__collection = Path(urllib.parse.urlparse(self.__collection_url).path).name
-        self.__repo_id = self.__repo_id_query.find(self.event_context.message)[0].value
+        self.__repo_id = self.__repo_id_query.values(self.event_context.message)[0]
 
 
+    @property
+    def delivery_id(self) -> str:
+        return self.event_context.message.get('id', None)
+
     @property
     def event_name(self) -> str:
         return self.__event
@@ -117,8 +122,9 @@ class AzureDevOpsEnterpriseOrchestrator(AbstractOrchestrator):
     def _repo_slug(self):
         return self.__repo_slug
 
-    async def is_signature_valid(self, shared_secret):
-        auth = self.get_header_key_safe('Authorization')
+    @staticmethod
+    def signature_valid(headers : Dict, raw_event_payload : bytes, shared_secret : str) -> bool:
+        auth = headers.get('Authorization', None)
         if auth is None:
             AzureDevOpsEnterpriseOrchestrator.log().warning("Authorization header is missing in request, rejecting.")
             return False
@@ -182,8 +188,13 @@ class AzureDevOpsEnterpriseOrchestrator(AbstractOrchestrator):
 
         return list(set(branches))
 
+    @property
+    def __protected_branch_cache_key(self) -> tuple:
+        return (self.__collection, self.__repo_id)
+
     async def _get_protected_branches(self, scm_service : SCMService):
-        return self.__default_branches + await self.__get_protected_branches_from_policies(scm_service)
+        return self.__default_branches + await scm_service.cached_protected_branches(self.__protected_branch_cache_key,
+                                                                                     lambda: self.__get_protected_branches_from_policies(scm_service))
 
     async def _get_target_branch_and_hash(self):
         return self.__target_branch, self.__target_hash
@@ -196,12 +207,12 @@ class AzureDevOpsEnterpriseOrchestrator(AbstractOrchestrator):
         return AzureDevOpsProjectNaming.create_project_name(p.org, self._repo_project_key, self._repo_name)
 
     async def __is_pr_draft(self) -> bool:
-        return bool(AzureDevOpsEnterpriseOrchestrator.__pr_draft_query.find(self.event_context.message)[0].value)
+        return bool(AzureDevOpsEnterpriseOrchestrator.__pr_draft_query.values(self.event_context.message)[0])
 
     def __populate_common_push_data(self):
         self.__source_branch = self.__target_branch = AbstractOrchestrator.normalize_branch_name(
-            [x.value for x in list(self.__push_target_branch_query.find(self.event_context.message))][0])
-        self.__source_hash = self.__target_hash = [x.value for x in list(self.__push_target_hash_query.find(self.event_context.message))][0]
+            self.__push_target_branch_query.values(self.event_context.message)[0])
+        self.__source_hash = self.__target_hash = self.__push_target_hash_query.values(self.event_context.message)[0]
 
     async def _execute_delegated_push_scan_workflow(self, services : CxOneFlowServices, scan_id : str):
         self.__populate_common_push_data()
@@ -209,24 +220,30 @@ class AzureDevOpsEnterpriseOrchestrator(AbstractOrchestrator):
 
     async def _execute_push_scan_workflow(self, services : CxOneFlowServices, scan_tags : Dict[str, str]=None):
         self.__populate_common_push_data()
+
+        # A new branch may match a prefix branch policy.
+        if AzureDevOpsEnterpriseOrchestrator.__no_hash in self.__push_old_hash_query.values(self.event_context.message) + \
+            self.__push_target_hash_query.values(self.event_context.message):
+            services.scm.invalidate_protected_branches(self.__protected_branch_cache_key)
+
         return await AbstractOrchestrator._execute_push_scan_workflow(self, services, scan_tags)
 
     def __populate_common_pr_data(self):
-        self.__source_branch = AbstractOrchestrator.normalize_branch_name([x.value for x in list(self.__pr_frombranch_query.find(self.event_context.message))][0])
-        self.__target_branch = AbstractOrchestrator.normalize_branch_name([x.value for x in list(self.__pr_tobranch_query.find(self.event_context.message))][0])
-        self.__source_hash = [x.value for x in list(self.__pr_fromhash_query.find(self.event_context.message))][0]
-        self.__target_hash = [x.value for x in list(self.__pr_tohash_query.find(self.event_context.message))][0]
-        self.__pr_id = str([x.value for x in list(self.__pr_id_query.find(self.event_context.message))][0])
+        self.__source_branch = AbstractOrchestrator.normalize_branch_name(self.__pr_frombranch_query.values(self.event_context.message)[0])
+        self.__target_branch = AbstractOrchestrator.normalize_branch_name(self.__pr_tobranch_query.values(self.event_context.message)[0])
+        self.__source_hash = self.__pr_fromhash_query.values(self.event_context.message)[0]
+        self.__target_hash = self.__pr_tohash_query.values(self.event_context.message)[0]
+        self.__pr_id = str(self.__pr_id_query.values(self.event_context.message)[0])
 
-        statuses = list(set([AzureDevOpsEnterpriseOrchestrator.__pr_status_map[x.value] 
-                             for x in AzureDevOpsEnterpriseOrchestrator.__pr_reviewer_status_query.find(self.event_context.message)]))
+        statuses = list(set([AzureDevOpsEnterpriseOrchestrator.__pr_status_map[x] 
+                             for x in AzureDevOpsEnterpriseOrchestrator.__pr_reviewer_status_query.values(self.event_context.message)]))
 
         if not len(statuses) > 0:
             self.__pr_status = "NO_REVIEWERS"
         else:
             self.__pr_status = "/".join(statuses)
 
-        self.__pr_state = AzureDevOpsEnterpriseOrchestrator.__pr_state_query.find(self.event_context.message)[0].value
+        self.__pr_state = AzureDevOpsEnterpriseOrchestrator.__pr_state_query.values(self.event_context.message)[0]
 
     async def _execute_delegated_pr_scan_workflow(self, services : CxOneFlowServices, scan_id : str):
         self.__populate_common_pr_data()
@@ -234,7 +251,7 @@ class AzureDevOpsEnterpriseOrchestrator(AbstractOrchestrator):
 
     async def _execute_pr_scan_workflow(self, services : CxOneFlowServices, scan_tags : Dict[str, str]=None) -> ScanInspector:
         if await self.__is_pr_draft():
-            AzureDevOpsEnterpriseOrchestrator.log().info(f"Skipping draft PR {AzureDevOpsEnterpriseOrchestrator.__pr_self_link_query.find(self.event_context.message)[0].value}")
+            AzureDevOpsEnterpriseOrchestrator.log().info(f"Skipping draft PR {AzureDevOpsEnterpriseOrchestrator.__pr_self_link_query.values(self.event_context.message)[0]}")
             return
 
         self.__populate_common_pr_data()
@@ -261,7 +278,7 @@ class AzureDevOpsEnterpriseOrchestrator(AbstractOrchestrator):
     
     @property
     def __repository_id(self) -> str:
-        return [x.value for x in list(self.__repository_id_query.find(self.event_context.message))][0]
+        return self.__repository_id_query.values(self.event_context.message)[0]
 
 
     @property
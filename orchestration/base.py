@@ -1,19 +1,26 @@
-import zipfile, tempfile, logging, asyncio
-from pathlib import Path, PurePath
+import logging, asyncio, importlib
 from time import perf_counter_ns
+from datetime import datetime, UTC
 from _version import __version__
 from .exceptions import OrchestrationException
 from cxone_api.high.scans import ScanInspector
 from scm_services import SCMService
 from cxone_service import CxOneService
 from scm_services.cloner import Cloner, CloneWorker, CloneAuthException
+from scm_services.sparse import SparseCheckout
+from .file_selection import FileSelector
+from .payload_spool import PayloadSpool
+from .zip_writer import ParallelZipWriter
+from .supersession import Supersession
 from workflows.exceptions import WorkflowException
 from workflows.messaging import PRDetails, PushDetails
 from workflows import ScanWorkflow
 from api_utils.auth_factories import EventContext
 from enum import Enum
-from typing import Tuple, List, Dict, Any
+from typing import Tuple, List, Dict, Any, BinaryIO
 from services import CxOneFlowServices
+from task_management.singleflight import SingleFlight
+from task_management import TaskPriority
 from cxone_api.high.projects import ProjectRepoConfig
 
 
@@ -26,6 +33,13 @@ class AbstractOrchestrator:
         FAILED = "failed"
         COMPLETE = "complete"
 
+    class ScanPackage:
+        """The packaged code for a commit, or a previous scan of an identical tree that can be used instead."""
+        def __init__(self, spool : PayloadSpool, tree_hash : str, reusable_scan : ScanInspector=None):
+            self.spool = spool
+            self.tree_hash = tree_hash
+            self.reusable_scan = reusable_scan
+
 
     @staticmethod
     def normalize_branch_name(branch):
@@ -35,6 +49,14 @@ class AbstractOrchestrator:
     def log(clazz) -> logging.Logger:
         return logging.getLogger(clazz.__name__)
 
+    @staticmethod
+    def from_qualified_name(orchestrator_name : str, context : EventContext) -> "AbstractOrchestrator":
+        class_name = orchestrator_name.split(".")[-1:].pop()
+        module = importlib.import_module(".".join(orchestrator_name.split(".")[:-1]))
+        return getattr(module, class_name)(context)
+
+    __scan_packages = SingleFlight("scan-packages")
+
     def __init__(self, event_context : EventContext):
         self.__event_context = event_context
         self.__isdelegated = False
@@ -47,13 +69,21 @@ class AbstractOrchestrator:
     def delegated_scan(self, value):
         self.__isdelegated = value
 
+    CONFIG_KEY = None
+
     @property
     def config_key(self):
-        raise NotImplementedError("config_key")
+        if self.CONFIG_KEY is None:
+            raise NotImplementedError("config_key")
+        return self.CONFIG_KEY
 
     @property
     def event_context(self) -> EventContext:
         return self.__event_context
+
+    @property
+    def qualified_name(self) -> str:
+        return f"{self.__class__.__module__}.{self.__class__.__name__}"
     
     @property
     def event_name(self) -> str:
@@ -64,29 +94,36 @@ class AbstractOrchestrator:
     def route_urls(self) -> list:
         raise NotImplementedError("route_urls")
     
-    @staticmethod
-    def __get_path_dict(path : str, root : str = None) -> dict:
-        return_dict = {}
-
-        use_root = path if root is None else root
-
-        p = Path(path)
-
-        for entry in p.iterdir():
-            if entry.is_dir():
-                return_dict |= AbstractOrchestrator.__get_path_dict(entry, use_root)
-            elif entry.is_file():
-                return_dict[entry] = PurePath(entry).relative_to(use_root)
-            else:
-                AbstractOrchestrator.log().warning(f"File skipped: {str(entry)} (Symlink: {entry.is_symlink()})")
-        return return_dict
-    
     def get_header_key_safe(self, key):
         try:
             return self.event_context.headers[key]
         except:
             return None
 
+    def get_header_key_insensitive(self, key):
+        value = self.get_header_key_safe(key)
+        if value is not None:
+            return value
+
+        for k, v in self.event_context.headers.items():
+            if k.lower() == key.lower():
+                return v
+        return None
+
+    __pr_event_markers = ["pull", "merge_request", "pr:"]
+
+    @property
+    def task_priority(self) -> TaskPriority:
+        event = self.event_name if not self.is_diagnostic else None
+        if event is not None and len([x for x in AbstractOrchestrator.__pr_event_markers if x in event.lower()]) > 0:
+            return TaskPriority.PULL_REQUEST
+        return TaskPriority.PUSH
+
+    @property
+    def delivery_id(self) -> str:
+        """The SCM's identifier for this webhook delivery, repeated when the SCM redelivers the event."""
+        return None
+
     async def execute(self, services : CxOneFlowServices) -> Any:
         raise NotImplementedError("execute")
 
@@ -96,11 +133,10 @@ class AbstractOrchestrator:
 
 
     @staticmethod
-    def __zip_write_delegate(zip_entries : Dict, zipfile : zipfile.ZipFile):
+    def __zip_write_delegate(zip_entries : Dict, fileobj : BinaryIO, compress_level : int):
         try:
-            for entry_key in zip_entries.keys():
-                AbstractOrchestrator.log().debug(f"Writing file [{zip_entries[entry_key]}] @ {zipfile.fp.tell()}")
-                zipfile.write(entry_key, zip_entries[entry_key])
+            with ParallelZipWriter(fileobj, compress_level) as writer:
+                writer.write_entries(zip_entries)
         except ValueError as vex:
             AbstractOrchestrator.log().exception("ValueError exception indicating 'write to file that is closed'" +
                                                  " indicates the MQ is timing out waiting for message ACK.  You may need to increase the" + 
@@ -112,57 +148,143 @@ class AbstractOrchestrator:
 
 
     @staticmethod
-    async def exec_local_scan(code_path : str, cxone_service : CxOneService,
-                              scan_source_msg : str, source_branch : str, project_config : ProjectRepoConfig, 
-                              tags : dict) -> Tuple[ScanInspector, ScanAction]:
-
+    async def __package_code(code_path : str, scan_source_msg : str, selector : FileSelector, 
+                             cxone_service : CxOneService, preserve : List[str]=None) -> PayloadSpool:
         check = perf_counter_ns()
 
-        with tempfile.NamedTemporaryFile(suffix='.zip') as zip_file:
-            with zipfile.ZipFile(zip_file, mode="w", compression=zipfile.ZIP_DEFLATED, compresslevel=9) as upload_payload:
-                zip_entries = AbstractOrchestrator.__get_path_dict(code_path)
+        selection = await asyncio.to_thread(selector.select, code_path, preserve)
+        zip_entries = selection.entries
+
+        AbstractOrchestrator.log().info(f"[{scan_source_msg}] file selection: {selection}")
+
+        spool = PayloadSpool.create(selection.included_bytes, cxone_service.payload_memory_limit)
+        try:
+            await asyncio.to_thread(AbstractOrchestrator.__zip_write_delegate, zip_entries, spool.file, cxone_service.compression_level)
+            spool.seal()
+
+            AbstractOrchestrator.log().info(f"[{scan_source_msg}] zipped {len(zip_entries)} file in {perf_counter_ns() - check}ns" + 
+                                            f" (in memory: {spool.in_memory})")
+        except BaseException:
+            spool.discard()
+            raise
+
+        return spool
 
-                AbstractOrchestrator.log().debug(f"[{scan_source_msg}] zipping {len(zip_entries)} files for scan.")
+    @staticmethod
+    async def __discard_package(spool : PayloadSpool) -> None:
+        spool.discard()
 
-                await asyncio.to_thread(AbstractOrchestrator.__zip_write_delegate, zip_entries, upload_payload)
-                
-                AbstractOrchestrator.log().info(f"[{scan_source_msg}] zipped {len(zip_entries)} file in {perf_counter_ns() - check}ns")
+    @staticmethod
+    async def __discard_scan_package(package : ScanPackage) -> None:
+        if package.spool is not None:
+            await AbstractOrchestrator.__discard_package(package.spool)
 
-            scan_submit = await cxone_service.execute_scan(zip_file.name, project_config, source_branch, tags)
+    @staticmethod
+    async def __submit_scan(zip_path : str, cxone_service : CxOneService,
+                            scan_source_msg : str, source_branch : str, project_config : ProjectRepoConfig, 
+                            tags : dict, engine_config : dict) -> Tuple[ScanInspector, ScanAction]:
+        scan_submit = await cxone_service.execute_scan(zip_path, project_config, source_branch, tags, engine_config)
 
-            AbstractOrchestrator.log().debug(scan_submit)
-            AbstractOrchestrator.log().info(f"Scan id {scan_submit['id']} created for [{scan_source_msg}]")
+        AbstractOrchestrator.log().debug(scan_submit)
+        AbstractOrchestrator.log().info(f"Scan id {scan_submit['id']} created for [{scan_source_msg}]")
 
-            return ScanInspector(scan_submit), AbstractOrchestrator.ScanAction.EXECUTING
+        return ScanInspector(scan_submit), AbstractOrchestrator.ScanAction.EXECUTING
+
+    @staticmethod
+    async def exec_local_scan(code_path : str, cxone_service : CxOneService,
+                              scan_source_msg : str, source_branch : str, project_config : ProjectRepoConfig, 
+                              tags : dict, preserve : List[str]=None) -> Tuple[ScanInspector, ScanAction]:
+
+        engine_config = await cxone_service.get_engine_config(project_config, source_branch)
+        selector = FileSelector.from_filters(CxOneService.file_filters(engine_config),
+                                             cxone_service.max_file_size, cxone_service.excluded_file_extensions)
+
+        spool = await AbstractOrchestrator.__package_code(code_path, scan_source_msg, selector, cxone_service, preserve)
+        try:
+            return await AbstractOrchestrator.__submit_scan(spool.path, cxone_service, scan_source_msg, source_branch, project_config, 
+                                                            tags, engine_config)
+        finally:
+            await AbstractOrchestrator.__discard_package(spool)
 
     @staticmethod
     async def exec_clone_scan(cxone_service : CxOneService, scm_service : SCMService, 
         clone_url : str, source_hash : str, source_branch : str, 
         project_config : ProjectRepoConfig, tags : dict, 
         event_context : EventContext) -> Tuple[ScanInspector, ScanAction]:
-        check = perf_counter_ns()
-        
-        AbstractOrchestrator.log().debug("Starting clone...")
-        # Do 1 clone retry if there is an auth failure.
-        clone_auth_fails = 0
-        while clone_auth_fails <= 1:
-            try:
-                async with await scm_service.cloner.clone(clone_url, event_context, clone_auth_fails > 0) as clone_worker:
-                    code_path = await clone_worker.loc()
+        scan_source_msg = f"{clone_url}|{source_branch}|{source_hash}"
 
-                    await scm_service.cloner.reset_head(code_path, source_hash)
+        # Resolved once; the file selection, sparse checkout, reuse digest and scan submission all use it.
+        engine_config = await cxone_service.get_engine_config(project_config, source_branch)
+        engine_filters = CxOneService.file_filters(engine_config)
+        selector = FileSelector.from_filters(engine_filters, cxone_service.max_file_size, cxone_service.excluded_file_extensions)
 
-                    AbstractOrchestrator.log().info(f"{clone_url} cloned in {perf_counter_ns() - check}ns")
+        sparse = None
+        if scm_service.cloner.sparse_checkout_enabled:
+            sparse = SparseCheckout.from_filters(engine_filters)
+            AbstractOrchestrator.log().debug(f"Sparse checkout for {scan_source_msg}: {sparse}")
 
-                    return await AbstractOrchestrator.exec_local_scan(code_path, cxone_service, 
-                                                                      f"{clone_url}|{source_branch}|{source_hash}", 
-                                                                      source_branch, project_config, tags)
-            except CloneAuthException as cax:
-                if clone_auth_fails <= 1:
-                    clone_auth_fails += 1
-                    AbstractOrchestrator.log().exception(cax)
-                else:
-                    raise
+        config_digest = CxOneService.scan_config_digest(engine_config)
+
+        async def clone_and_package() -> AbstractOrchestrator.ScanPackage:
+            check = perf_counter_ns()
+
+            AbstractOrchestrator.log().debug("Starting clone...")
+            # Do 1 clone retry if there is an auth failure.
+            clone_auth_fails = 0
+            while clone_auth_fails <= 1:
+                try:
+                    async with await scm_service.cloner.checkout(clone_url, source_hash, event_context, clone_auth_fails > 0, 
+                                                                     sparse=sparse) as clone_worker:
+                        code_path = await clone_worker.loc()
+
+                        AbstractOrchestrator.log().info(f"{clone_url} cloned in {perf_counter_ns() - check}ns")
+
+                        tree_hash = await scm_service.cloner.tree_hash(code_path)
+
+                        if tree_hash is not None and cxone_service.reuse_identical_scans:
+                            reusable = await cxone_service.find_scan_for_tree(project_config, tree_hash, config_digest)
+                            if reusable is not None:
+                                return AbstractOrchestrator.ScanPackage(None, tree_hash, reusable)
+
+                        return AbstractOrchestrator.ScanPackage(
+                            await AbstractOrchestrator.__package_code(code_path, scan_source_msg, selector, cxone_service), tree_hash)
+                except CloneAuthException as cax:
+                    if clone_auth_fails <= 1:
+                        clone_auth_fails += 1
+                        AbstractOrchestrator.log().exception(cax)
+                    else:
+                        raise
+
+        # Concurrent scans of the same commit with the same engine configuration share one clone, file selection, zip and
+        # reuse decision; each still submits its own scan.
+        async with AbstractOrchestrator.__scan_packages.acquire((scm_service.moniker, clone_url, source_hash, 
+                                                                 sparse.key if sparse is not None else None, config_digest,
+                                                                 tuple(selector.exclude_globs)), 
+                                                                 clone_and_package, AbstractOrchestrator.__discard_scan_package) as package:
+            if package is None:
+                raise OrchestrationException(f"Clone failed for {scan_source_msg}")
+
+            if package.reusable_scan is not None:
+                AbstractOrchestrator.log().info(f"Scan id {package.reusable_scan.scan_id} of identical tree {package.tree_hash} " + 
+                                                f"used for [{scan_source_msg}]")
+                await cxone_service.tag_reused_scan(package.reusable_scan, tags)
+                return package.reusable_scan, AbstractOrchestrator.ScanAction.EXECUTING
+
+            if not Supersession.submitting():
+                AbstractOrchestrator.log().info(f"Scan not submitted for [{scan_source_msg}], superseded by a newer event.")
+                return None, AbstractOrchestrator.ScanAction.SKIPPED
+
+            tree_tags = {}
+            if package.tree_hash is not None:
+                tree_tags = {CxOneService.TREE_TAG : package.tree_hash, CxOneService.SCAN_CONFIG_TAG : config_digest}
+
+            inspector, action = await AbstractOrchestrator.__submit_scan(package.spool.path, cxone_service, scan_source_msg, 
+                                                                         source_branch, project_config, tags | tree_tags, engine_config)
+
+            if package.tree_hash is not None:
+                cxone_service.record_scan_for_tree(project_config, package.tree_hash, config_digest, inspector.scan_id)
+
+            return inspector, action
 
 
     
@@ -191,7 +313,7 @@ class AbstractOrchestrator:
                     if resolver_tag is not None:
                         if await services.resolver.request_resolver_scan(resolver_tag, project_config, services.scm, services.cxone, 
                                                                          clone_url, source_hash, source_branch, scan_tags, workflow, self.__event_context, 
-                                                                         f"{self.__class__.__module__}.{self.__class__.__name__}"):
+                                                                         self.qualified_name):
                             return None, AbstractOrchestrator.ScanAction.DELEGATED
                         else:
                             AbstractOrchestrator.log().warning(f"Delegated scan request failed for tag {resolver_tag} but proceeding with scanning.")
@@ -248,23 +370,40 @@ class AbstractOrchestrator:
         if scan_tags is not None:
             submitted_scan_tags.update(scan_tags)
 
-        inspector, action = await self.__orchestrate_scan(services, submitted_scan_tags, ScanWorkflow.PUSH)
-
-        if inspector is not None and action == AbstractOrchestrator.ScanAction.EXECUTING:
-            source_branch, commit_hash = await self._get_source_branch_and_hash()
-            clone_url = self._repo_clone_url(services.scm.cloner)
-            await services.push.start_sarif_feedback(inspector.project_id, inspector.scan_id,
-                                                        PushDetails.factory(clone_url=clone_url,
-                                                                            repo_project=self._repo_project_key,
-                                                                            repo_slug=self._repo_slug,
-                                                                            organization=self._repo_organization,
-                                                                            source_branch=source_branch,
-                                                                            event_context=self.event_context,
-                                                                            commit_hash=commit_hash))
+        source_branch, _ = await self._get_source_branch_and_hash()
+        started = datetime.now(UTC)
+        async with Supersession.latest((services.cxone.moniker, self._repo_clone_url(services.scm.cloner), 
+                                        str(ScanWorkflow.PUSH), source_branch)):
+            inspector, action = await self.__orchestrate_scan(services, submitted_scan_tags, ScanWorkflow.PUSH)
+
+            if inspector is not None and action == AbstractOrchestrator.ScanAction.EXECUTING:
+                await self.__supersede_active_scans(services, inspector, started, "workflow", str(ScanWorkflow.PUSH), source_branch)
+                source_branch, commit_hash = await self._get_source_branch_and_hash()
+                clone_url = self._repo_clone_url(services.scm.cloner)
+                await services.push.start_sarif_feedback(inspector.project_id, inspector.scan_id,
+                                                            PushDetails.factory(clone_url=clone_url,
+                                                                                repo_project=self._repo_project_key,
+                                                                                repo_slug=self._repo_slug,
+                                                                                organization=self._repo_organization,
+                                                                                source_branch=source_branch,
+                                                                                event_context=self.event_context,
+                                                                                commit_hash=commit_hash))
 
         return inspector, action
 
 
+    @staticmethod
+    async def __supersede_active_scans(services : CxOneFlowServices, inspector : ScanInspector, started : datetime,
+                                       tag_key : str, tag_value : str, branch : str=None):
+        # Only scans created before this event was orchestrated are older; the scan used may itself be an older, reused scan.
+        try:
+            superseded = await services.cxone.supersede_active_scans(inspector.project_id, inspector.scan_id, started, 
+                                                                     tag_key, tag_value, branch)
+            if len(superseded) > 0:
+                AbstractOrchestrator.log().info(f"Scan ids {superseded} superseded by scan id {inspector.scan_id}")
+        except Exception as ex:
+            AbstractOrchestrator.log().warning(f"Unable to mark scans superseded by scan id {inspector.scan_id}: {ex}")
+
     async def __start_pr_workflow(self, services : CxOneFlowServices, inspector : ScanInspector):
 
         source_branch, _ = await self._get_source_branch_and_hash()
@@ -302,13 +441,17 @@ class AbstractOrchestrator:
         if scan_tags is not None:
             submitted_scan_tags.update(scan_tags)
 
-        inspector, scan_action = await self.__orchestrate_scan(services, submitted_scan_tags, ScanWorkflow.PR)
-        if inspector is not None and scan_action == AbstractOrchestrator.ScanAction.EXECUTING:
-            await self.__start_pr_workflow(services, inspector)
-        elif scan_action is AbstractOrchestrator.ScanAction.DELEGATED:
-            AbstractOrchestrator.log().info(f"PR workflow delegated for PR {self._pr_id}.")
-        else:
-            AbstractOrchestrator.log().warning(f"No scan returned, PR workflow not started for PR {self._pr_id}.")
+        started = datetime.now(UTC)
+        async with Supersession.latest((services.cxone.moniker, self._repo_clone_url(services.scm.cloner), 
+                                        str(ScanWorkflow.PR), str(self._pr_id))):
+            inspector, scan_action = await self.__orchestrate_scan(services, submitted_scan_tags, ScanWorkflow.PR)
+            if inspector is not None and scan_action == AbstractOrchestrator.ScanAction.EXECUTING:
+                await self.__supersede_active_scans(services, inspector, started, CxOneService.PR_ID_TAG, str(self._pr_id))
+                await self.__start_pr_workflow(services, inspector)
+            elif scan_action is AbstractOrchestrator.ScanAction.DELEGATED:
+                AbstractOrchestrator.log().info(f"PR workflow delegated for PR {self._pr_id}.")
+            else:
+                AbstractOrchestrator.log().warning(f"No scan returned, PR workflow not started for PR {self._pr_id}.")
 
         return scan_action
 
@@ -333,8 +476,17 @@ class AbstractOrchestrator:
     async def _get_protected_branches(self, scm_service : SCMService) -> list:
         raise NotImplementedError("_get_protected_branches")
 
+    @staticmethod
+    def signature_valid(headers : Dict, raw_event_payload : bytes, shared_secret : str) -> bool:
+        raise NotImplementedError("signature_valid")
+
+    @classmethod
+    def handles_event(clazz, headers : Dict) -> bool:
+        """Checks the request headers, before the payload is parsed, for an event type that may be handled."""
+        return True
+
     async def is_signature_valid(self, shared_secret : str) -> bool:
-        raise NotImplementedError("is_signature_valid")
+        return self.signature_valid(self.event_context.headers, self.event_context.raw_event_payload, shared_secret)
     
     async def get_default_cxone_project_name(self) -> str:
         raise NotImplementedError("get_cxone_project_name")
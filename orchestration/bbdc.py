@@ -2,7 +2,7 @@ from orchestration.base import AbstractOrchestrator
 from orchestration.naming.bbdc import BitbucketProjectNaming
 from api_utils.auth_factories import EventContext
 from api_utils import signature
-from jsonpath_ng import parse
+from api_utils.json_paths import compile_path
 from .exceptions import OrchestrationException
 from scm_services import SCMService
 from cxone_api.high.scans import ScanInspector
@@ -10,33 +10,36 @@ from services import CxOneFlowServices
 from typing import List, Dict
 
 class BitBucketDataCenterOrchestrator(AbstractOrchestrator):
-
-    __push_route_urls_query = parse("$.repository.links.clone[*]")
-    __push_repo_project_key_query = parse("$.repository.project.key")
-    __push_repo_project_name_query = parse("$.repository.project.name")
-    __push_repo_slug_query = parse("$.repository.slug")
-    __push_repo_name_query = parse("$.repository.name")
-    __push_changes_extract_query = parse("$.changes[*]")
-    __push_change_types_query = parse("$.changes[*].type")
+    __diagnostic_event = "diagnostics:ping"
+
+    __push_route_urls_query = compile_path("$.repository.links.clone[*]")
+    __push_repo_project_key_query = compile_path("$.repository.project.key")
+    __push_repo_project_name_query = compile_path("$.repository.project.name")
+    __push_repo_slug_query = compile_path("$.repository.slug")
+    __push_repo_name_query = compile_path("$.repository.name")
+    __push_changes_extract_query = compile_path("$.changes[*]")
+    __push_change_types_query = compile_path("$.changes[*].type")
     __push_scannable_change_types = ['ADD', 'UPDATE']
-
-    __pr_route_urls_query = parse("$.pullRequest.fromRef.repository.links.clone[*]")
-    __pr_draft_query = parse("$.pullRequest.draft")
-    __pr_self_link_query = parse("$.pullRequest.links['self'][*]['href']")
-    __pr_toref_extract_query = parse("$.pullRequest.toRef")
-    __pr_fromref_extract_query = parse("$.pullRequest.fromRef")
-    __pr_repo_project_key_query = parse("$.pullRequest.toRef.repository.project.key")
-    __pr_repo_project_name_query = parse("$.pullRequest.toRef.repository.project.name")
-    __pr_repo_slug_query = parse("$.pullRequest.toRef.repository.slug")
-    __pr_repo_name_query = parse("$.pullRequest.toRef.repository.name")
-    __pr_id_query = parse("$.pullRequest.id")
-    __pr_reviewer_status_query = parse("$.pullRequest.reviewers[*].status")
-    __pr_state_query = parse("$.pullRequest.state")
-
-
-    @property
-    def config_key(self):
-        return "bbdc"
+    __push_branch_model_change_types = ['ADD', 'DELETE']
+
+    __repo_modified_route_urls_query = compile_path("$.new.links.clone[*]")
+    __repo_modified_repos_query = compile_path("$[old,new]")
+
+    __pr_route_urls_query = compile_path("$.pullRequest.fromRef.repository.links.clone[*]")
+    __pr_draft_query = compile_path("$.pullRequest.draft")
+    __pr_self_link_query = compile_path("$.pullRequest.links['self'][*]['href']")
+    __pr_toref_extract_query = compile_path("$.pullRequest.toRef")
+    __pr_fromref_extract_query = compile_path("$.pullRequest.fromRef")
+    __pr_repo_project_key_query = compile_path("$.pullRequest.toRef.repository.project.key")
+    __pr_repo_project_name_query = compile_path("$.pullRequest.toRef.repository.project.name")
+    __pr_repo_slug_query = compile_path("$.pullRequest.toRef.repository.slug")
+    __pr_repo_name_query = compile_path("$.pullRequest.toRef.repository.name")
+    __pr_id_query = compile_path("$.pullRequest.id")
+    __pr_reviewer_status_query = compile_path("$.pullRequest.reviewers[*].status")
+    __pr_state_query = compile_path("$.pullRequest.state")
+
+
+    CONFIG_KEY = "bbdc"
     
 
     def __init__(self, event_context : EventContext):
@@ -46,15 +49,20 @@ class BitBucketDataCenterOrchestrator(AbstractOrchestrator):
 
         self.__event = self.get_header_key_safe('X-Event-Key') 
 
-        if not self.__event is None and self.__event == "diagnostics:ping":
+        if not self.__event is None and self.__event == BitBucketDataCenterOrchestrator.__diagnostic_event:
             self.__isdiagnostic = True
             return
 
-        self.__clone_urls = {x.value['name']:x.value['href'] for x in BitBucketDataCenterOrchestrator.__push_route_urls_query.find(self.event_context.message) } | \
-            {x.value['name']:x.value['href'] for x in BitBucketDataCenterOrchestrator.__pr_route_urls_query.find(self.event_context.message) }
+        self.__clone_urls = {x['name']:x['href'] for x in BitBucketDataCenterOrchestrator.__push_route_urls_query.values(self.event_context.message) } | \
+            {x['name']:x['href'] for x in BitBucketDataCenterOrchestrator.__pr_route_urls_query.values(self.event_context.message) } | \
+            {x['name']:x['href'] for x in BitBucketDataCenterOrchestrator.__repo_modified_route_urls_query.values(self.event_context.message) }
 
         self.__route_urls = list(self.__clone_urls.values())
 
+    @property
+    def delivery_id(self) -> str:
+        return self.get_header_key_insensitive('X-Request-Id')
+
     @property
     def event_name(self) -> str:
         return self.__event
@@ -64,17 +72,24 @@ class BitBucketDataCenterOrchestrator(AbstractOrchestrator):
     def route_urls(self) -> list:
         return self.__route_urls
 
-    async def is_signature_valid(self, shared_secret : str) -> bool:
-        sig = self.get_header_key_safe('X-Hub-Signature')
+    @staticmethod
+    def signature_valid(headers : Dict, raw_event_payload : bytes, shared_secret : str) -> bool:
+        sig = headers.get('X-Hub-Signature', None)
         if sig is None:
             BitBucketDataCenterOrchestrator.log().warning("X-Hub-Signature header is missing, rejecting.")
             return False
         
         hashalg,hash = sig.split("=")
-        payload_hash = signature.hmac(hashalg, shared_secret, self.event_context.raw_event_payload)
+        payload_hash = signature.hmac(hashalg, shared_secret, raw_event_payload)
 
         return hash == payload_hash
 
+    @classmethod
+    def handles_event(clazz, headers : Dict) -> bool:
+        event = headers.get('X-Event-Key', None)
+        return event is None or event == BitBucketDataCenterOrchestrator.__diagnostic_event or \
+            event in BitBucketDataCenterOrchestrator.__workflow_map.keys()
+
     async def __delegated_dispatcher(self, dispatch_map : dict, services : CxOneFlowServices, scan_id : str):
         if self.__event not in dispatch_map.keys():
             BitBucketDataCenterOrchestrator.log().error(f"Unhandled delegated scan event type: {self.__event}")
@@ -97,18 +112,18 @@ class BitBucketDataCenterOrchestrator(AbstractOrchestrator):
         self.__source_branch = self.__target_branch = None
         self.__source_hash = self.__target_hash = None
 
-        if len([x.value for x in BitBucketDataCenterOrchestrator.__push_change_types_query.find(self.event_context.message) \
-                if x.value in BitBucketDataCenterOrchestrator.__push_scannable_change_types]) > 0:
+        if len([x for x in BitBucketDataCenterOrchestrator.__push_change_types_query.values(self.event_context.message) \
+                if x in BitBucketDataCenterOrchestrator.__push_scannable_change_types]) > 0:
             
-            first_change = BitBucketDataCenterOrchestrator.__push_changes_extract_query.find(self.event_context.message)[0].value
+            first_change = BitBucketDataCenterOrchestrator.__push_changes_extract_query.values(self.event_context.message)[0]
 
             self.__source_branch = self.__target_branch = first_change['ref']['displayId']
             self.__source_hash = self.__target_hash = first_change['toHash']
 
-        self.__repo_project_key = BitBucketDataCenterOrchestrator.__push_repo_project_key_query.find(self.event_context.message)[0].value
-        self.__repo_project_name = BitBucketDataCenterOrchestrator.__push_repo_project_name_query.find(self.event_context.message)[0].value
-        self.__repo_slug = BitBucketDataCenterOrchestrator.__push_repo_slug_query.find(self.event_context.message)[0].value
-        self.__repo_name = BitBucketDataCenterOrchestrator.__push_repo_name_query.find(self.event_context.message)[0].value
+        self.__repo_project_key = BitBucketDataCenterOrchestrator.__push_repo_project_key_query.values(self.event_context.message)[0]
+        self.__repo_project_name = BitBucketDataCenterOrchestrator.__push_repo_project_name_query.values(self.event_context.message)[0]
+        self.__repo_slug = BitBucketDataCenterOrchestrator.__push_repo_slug_query.values(self.event_context.message)[0]
+        self.__repo_name = BitBucketDataCenterOrchestrator.__push_repo_name_query.values(self.event_context.message)[0]
 
     async def _execute_delegated_push_scan_workflow(self, services : CxOneFlowServices, scan_id : str):
         self.__populate_common_push_data()
@@ -116,29 +131,35 @@ class BitBucketDataCenterOrchestrator(AbstractOrchestrator):
 
     async def _execute_push_scan_workflow(self, services : CxOneFlowServices):
         self.__populate_common_push_data()
+
+        # Creating or deleting a branch can change the branch model.
+        if len([x for x in BitBucketDataCenterOrchestrator.__push_changes_extract_query.values(self.event_context.message) \
+                if x['type'] in BitBucketDataCenterOrchestrator.__push_branch_model_change_types and x['ref']['type'] == 'BRANCH']) > 0:
+            services.scm.invalidate_protected_branches(self.__protected_branch_cache_key)
+
         return await AbstractOrchestrator._execute_push_scan_workflow(self, services)
 
     async def __is_pr_draft(self) -> bool:
-        return bool(BitBucketDataCenterOrchestrator.__pr_draft_query.find(self.event_context.message)[0].value)
+        return bool(BitBucketDataCenterOrchestrator.__pr_draft_query.values(self.event_context.message)[0])
     
     def __populate_common_pr_data(self):
-        toref = BitBucketDataCenterOrchestrator.__pr_toref_extract_query.find(self.event_context.message)[0].value
+        toref = BitBucketDataCenterOrchestrator.__pr_toref_extract_query.values(self.event_context.message)[0]
         self.__target_branch = toref['displayId']
         self.__target_hash = toref['latestCommit']
 
 
-        fromref = BitBucketDataCenterOrchestrator.__pr_fromref_extract_query.find(self.event_context.message)[0].value
+        fromref = BitBucketDataCenterOrchestrator.__pr_fromref_extract_query.values(self.event_context.message)[0]
         self.__source_branch = fromref['displayId']
         self.__source_hash = fromref['latestCommit']
 
-        self.__repo_project_key = BitBucketDataCenterOrchestrator.__pr_repo_project_key_query.find(self.event_context.message)[0].value
-        self.__repo_project_name = BitBucketDataCenterOrchestrator.__pr_repo_project_name_query.find(self.event_context.message)[0].value
-        self.__repo_slug = BitBucketDataCenterOrchestrator.__pr_repo_slug_query.find(self.event_context.message)[0].value
-        self.__repo_name = BitBucketDataCenterOrchestrator.__pr_repo_name_query.find(self.event_context.message)[0].value
-        self.__pr_id = str(BitBucketDataCenterOrchestrator.__pr_id_query.find(self.event_context.message)[0].value)
-        self.__pr_state = BitBucketDataCenterOrchestrator.__pr_state_query.find(self.event_context.message)[0].value
+        self.__repo_project_key = BitBucketDataCenterOrchestrator.__pr_repo_project_key_query.values(self.event_context.message)[0]
+        self.__repo_project_name = BitBucketDataCenterOrchestrator.__pr_repo_project_name_query.values(self.event_context.message)[0]
+        self.__repo_slug = BitBucketDataCenterOrchestrator.__pr_repo_slug_query.values(self.event_context.message)[0]
+        self.__repo_name = BitBucketDataCenterOrchestrator.__pr_repo_name_query.values(self.event_context.message)[0]
+        self.__pr_id = str(BitBucketDataCenterOrchestrator.__pr_id_query.values(self.event_context.message)[0])
+        self.__pr_state = BitBucketDataCenterOrchestrator.__pr_state_query.values(self.event_context.message)[0]
 
-        statuses = list(set([x.value for x in BitBucketDataCenterOrchestrator.__pr_reviewer_status_query.find(self.event_context.message)]))
+        statuses = list(set(BitBucketDataCenterOrchestrator.__pr_reviewer_status_query.values(self.event_context.message)))
 
         if not len(statuses) > 0:
             self.__pr_status = "NO_REVIEWERS"
@@ -151,14 +172,14 @@ class BitBucketDataCenterOrchestrator(AbstractOrchestrator):
 
     async def _execute_pr_scan_workflow(self, services : CxOneFlowServices) -> ScanInspector:
         if await self.__is_pr_draft():
-            BitBucketDataCenterOrchestrator.log().info(f"Skipping draft PR {BitBucketDataCenterOrchestrator.__pr_self_link_query.find(self.event_context.message)[0].value}")
+            BitBucketDataCenterOrchestrator.log().info(f"Skipping draft PR {BitBucketDataCenterOrchestrator.__pr_self_link_query.values(self.event_context.message)[0]}")
             return
         self.__populate_common_pr_data()
         return await AbstractOrchestrator._execute_pr_scan_workflow(self, services)
 
     async def _execute_pr_tag_update_workflow(self, services : CxOneFlowServices):
         if await self.__is_pr_draft():
-            BitBucketDataCenterOrchestrator.log().info(f"Skipping draft PR {BitBucketDataCenterOrchestrator.__pr_self_link_query.find(self.event_context.message)[0].value}")
+            BitBucketDataCenterOrchestrator.log().info(f"Skipping draft PR {BitBucketDataCenterOrchestrator.__pr_self_link_query.values(self.event_context.message)[0]}")
             return
 
         self.__populate_common_pr_data()
@@ -172,7 +193,20 @@ class BitBucketDataCenterOrchestrator(AbstractOrchestrator):
     async def _get_source_branch_and_hash(self) -> tuple:
         return self.__source_branch, self.__source_hash
 
+    async def __invalidate_protected_branches(self, services : CxOneFlowServices):
+        for repo in BitBucketDataCenterOrchestrator.__repo_modified_repos_query.values(self.event_context.message):
+            BitBucketDataCenterOrchestrator.log().debug(f"Event {self.__event} invalidates protected branches for {repo['project']['key']}/{repo['slug']}")
+            services.scm.invalidate_protected_branches((repo['project']['key'], repo['slug']))
+
+    @property
+    def __protected_branch_cache_key(self) -> tuple:
+        return (self._repo_project_key, self._repo_slug)
+
     async def _get_protected_branches(self, scm_service : SCMService) -> list:
+        return await scm_service.cached_protected_branches(self.__protected_branch_cache_key,
+                                                           lambda: self.__load_protected_branches(scm_service))
+
+    async def __load_protected_branches(self, scm_service : SCMService) -> list:
         retBranches = []
         model_resp = await scm_service.exec("GET", f"/rest/branch-utils/latest/projects/{self._repo_project_key}/repos/{self._repo_slug}/branchmodel")
 
@@ -239,6 +273,7 @@ class BitBucketDataCenterOrchestrator(AbstractOrchestrator):
         "pr:reviewer:updated" : _execute_pr_tag_update_workflow,
         "pr:reviewer:approved" : _execute_pr_tag_update_workflow,
         "pr:reviewer:needs_work" : _execute_pr_tag_update_workflow,
+        "repo:modified" : __invalidate_protected_branches,
     }
 
 
@@ -0,0 +1,188 @@
+"""
+Request handling shared by the WSGI and ASGI entrypoints.  The entrypoints only adapt their framework's
+request to headers and a raw payload, then convert the returned EndpointResponse to their framework's response.
+"""
+from orchestration import OrchestrationDispatch
+
+from orchestration.kickoff import KickoffOrchestrator
+from orchestration.kickoff.bbdc import BitBucketDataCenterKickoffOrchestrator
+from orchestration.kickoff.gh import GithubKickoffOrchestrator
+from orchestration.kickoff.adoe import AzureDevOpsKickoffOrchestrator
+from orchestration.kickoff.gl import GitlabKickoffOrchestrator
+
+from orchestration.bbdc import  BitBucketDataCenterOrchestrator
+from orchestration.adoe import AzureDevOpsEnterpriseOrchestrator
+from orchestration.gh import GithubOrchestrator
+from orchestration.gl import GitlabOrchestrator
+
+import logging, json
+from typing import Dict
+from config import RouteNotFoundException
+from config.server import CxOneFlowConfig
+from task_management import TaskManager
+from cxoneflow_metrics import MetricsRegistry
+from api_utils.auth_factories import EventContext, HeaderFilteredEventContext
+import cxoneflow_kickoff_api as ko
+import cxoneflow_kickoff_api.status as kostat
+
+
+class EndpointResponse:
+    def __init__(self, body=None, status : int=200, content_type : str=None, headers : Dict[str, str]=None):
+        self.body = body.encode("UTF-8") if isinstance(body, str) else (body if body is not None else b"")
+        self.status = status
+        self.headers = dict(headers) if headers is not None else {}
+        if content_type is not None:
+            self.headers["Content-Type"] = content_type
+
+
+class EndpointHandlers:
+
+    @staticmethod
+    def log():
+        return logging.getLogger("EndpointHandlers")
+
+    @staticmethod
+    async def __dispatch(orch, success_status : int) -> EndpointResponse:
+        dedup = CxOneFlowConfig.get_delivery_dedup()
+        if not dedup.first_delivery(orch.config_key, orch.delivery_id):
+            return EndpointResponse(status=success_status)
+
+        headers = None
+        try:
+            if not CxOneFlowConfig.ingestion_enabled():
+                TaskManager.in_background(OrchestrationDispatch.execute(orch), orch.task_priority)
+                return EndpointResponse(status=success_status)
+            elif await TaskManager.in_foreground(OrchestrationDispatch.ingest(orch)):
+                return EndpointResponse(status=success_status)
+            status = 503
+        except TaskManager.QueueFullException as ex:
+            EndpointHandlers.log().warning(f"Event for [{orch.config_key}] rejected: {ex}")
+            status = 503
+            headers = {"Retry-After" : str(ex.retry_after)}
+        except OrchestrationDispatch.NotAuthorizedException:
+            status = 401
+
+        # Allow the SCM's redelivery of an event that was not accepted.
+        dedup.forget(orch.config_key, orch.delivery_id)
+        return EndpointResponse(status=status, headers=headers)
+
+    @staticmethod
+    async def __kickoff_impl(orch : KickoffOrchestrator) -> EndpointResponse:
+        msg = None
+        code = kostat.KickoffStatusCodes.SERVER_ERROR
+
+        try:
+            if await OrchestrationDispatch.execute_kickoff(orch):
+                code = kostat.KickoffStatusCodes.SCAN_STARTED
+                msg = ko.KickoffResponseMsg(running_scans=orch.running_scans, started_scan=orch.started_scan)
+            else:
+                code = kostat.KickoffStatusCodes.BAD_REQUEST
+                msg = None
+        except KickoffOrchestrator.KickoffScanExistsException:
+            code = kostat.KickoffStatusCodes.SCAN_EXISTS
+            msg = ko.KickoffResponseMsg(running_scans=orch.running_scans)
+        except KickoffOrchestrator.TooManyRunningScansExeception:
+            code = kostat.KickoffStatusCodes.TOO_MANY_SCANS
+            msg = ko.KickoffResponseMsg(running_scans=orch.running_scans)
+        except RouteNotFoundException:
+            code = kostat.KickoffStatusCodes.NO_ROUTE
+            msg = None
+        except OrchestrationDispatch.NotAuthorizedException:
+            code = kostat.KickoffStatusCodes.NOT_AUTHORIZED
+            msg = None
+
+        # pylint: disable=E1101
+        return EndpointResponse(msg.to_json() if msg is not None else None, status=code.value, content_type="application/json")
+
+    @staticmethod
+    async def __kickoff(kickoff_class, msg_class, headers : Dict[str, str], raw_payload : bytes) -> EndpointResponse:
+        ec = EventContext(raw_payload, headers)
+        orch = kickoff_class(msg_class(**(ec.message)), ec)
+
+        try:
+            return await TaskManager.in_foreground(EndpointHandlers.__kickoff_impl(orch))
+        except TaskManager.QueueFullException as ex:
+            EndpointHandlers.log().warning(f"Kickoff for [{orch.config_key}] rejected: {ex}")
+            # pylint: disable=E1101
+            return EndpointResponse(ko.KickoffResponseMsg(running_scans=[]).to_json(),
+                                    status=kostat.KickoffStatusCodes.TOO_MANY_SCANS.value,
+                                    content_type="application/json", headers={"Retry-After" : str(ex.retry_after)})
+
+    @staticmethod
+    async def __webhook(orchestrator_class, context_factory, headers : Dict[str, str], raw_payload : bytes,
+                        success_status : int, diagnostic_status : int=200) -> EndpointResponse:
+        # The event type and signature are checked before the payload is parsed.
+        try:
+            if not OrchestrationDispatch.admit(orchestrator_class, headers, raw_payload):
+                return EndpointResponse(status=success_status)
+
+            orch = orchestrator_class(context_factory(raw_payload, headers))
+
+            if orch.is_diagnostic:
+                return EndpointResponse(status=diagnostic_status)
+
+            return await EndpointHandlers.__dispatch(orch, success_status)
+        except OrchestrationDispatch.NotAuthorizedException:
+            return EndpointResponse(status=401)
+        except Exception as ex:
+            EndpointHandlers.log().exception(ex)
+            return EndpointResponse(status=400)
+
+    @staticmethod
+    async def metrics() -> EndpointResponse:
+        return EndpointResponse(json.dumps(MetricsRegistry.snapshot(), sort_keys=True), status=200, content_type="application/json")
+
+    @staticmethod
+    async def bbdc_webhook(headers : Dict[str, str], raw_payload : bytes) -> EndpointResponse:
+        EndpointHandlers.log().info("Received hook for BitBucket Data Center")
+        EndpointHandlers.log().debug("bbdc webhook: headers: [%s] body: [%s]", headers, raw_payload)
+        return await EndpointHandlers.__webhook(BitBucketDataCenterOrchestrator, EventContext, headers, raw_payload, 204, 204)
+
+    @staticmethod
+    async def bbdc_kickoff(headers : Dict[str, str], raw_payload : bytes) -> EndpointResponse:
+        EndpointHandlers.log().info("Received kickoff request for BitBucket Data Center")
+        EndpointHandlers.log().debug("bbdc kickoff: headers: [%s] body: [%s]", headers, raw_payload)
+        return await EndpointHandlers.__kickoff(BitBucketDataCenterKickoffOrchestrator, ko.BitbucketKickoffMsg, headers, raw_payload)
+
+    @staticmethod
+    async def github_webhook(headers : Dict[str, str], raw_payload : bytes) -> EndpointResponse:
+        EndpointHandlers.log().info("Received hook for Github")
+        EndpointHandlers.log().debug("github webhook: headers: [%s] body: [%s]", headers, raw_payload)
+        # The ping has no route URL associated, so it is accepted if the signature matches any route.
+        return await EndpointHandlers.__webhook(GithubOrchestrator,
+                                                lambda payload, headers: HeaderFilteredEventContext(payload, headers, "User-Agent|X-(Git)?[H|h]ub"),
+                                                headers, raw_payload, 204)
+
+    @staticmethod
+    async def github_kickoff(headers : Dict[str, str], raw_payload : bytes) -> EndpointResponse:
+        EndpointHandlers.log().info("Received kickoff request for GitHub")
+        EndpointHandlers.log().debug("github kickoff: headers: [%s] body: [%s]", headers, raw_payload)
+        return await EndpointHandlers.__kickoff(GithubKickoffOrchestrator, ko.GithubKickoffMsg, headers, raw_payload)
+
+    @staticmethod
+    async def adoe_webhook(headers : Dict[str, str], raw_payload : bytes) -> EndpointResponse:
+        EndpointHandlers.log().info("Received hook for Azure DevOps Enterprise")
+        EndpointHandlers.log().debug("adoe webhook: headers: [%s] body: [%s]", headers, raw_payload)
+        # ADO's test payload can't be matched against a route since it is "fabrikammed", so it is
+        # accepted if the signature matches any route.
+        return await EndpointHandlers.__webhook(AzureDevOpsEnterpriseOrchestrator, EventContext, headers, raw_payload, 204)
+
+    @staticmethod
+    async def adoe_kickoff(headers : Dict[str, str], raw_payload : bytes) -> EndpointResponse:
+        EndpointHandlers.log().info("Received kickoff request for Azure DevOps")
+        EndpointHandlers.log().debug("adoe kickoff: headers: [%s] body: [%s]", headers, raw_payload)
+        return await EndpointHandlers.__kickoff(AzureDevOpsKickoffOrchestrator, ko.AdoKickoffMsg, headers, raw_payload)
+
+    @staticmethod
+    async def gitlab_webhook(headers : Dict[str, str], raw_payload : bytes) -> EndpointResponse:
+        EndpointHandlers.log().info("Received hook for Gitlab")
+        EndpointHandlers.log().debug("gitlab webhook: headers: [%s] body: [%s]", headers, raw_payload)
+        return await EndpointHandlers.__webhook(GitlabOrchestrator,
+                                                lambda payload, headers: HeaderFilteredEventContext(payload, headers, "User-Agent|X-Gitlab|Idempotency-Key"),
+                                                headers, raw_payload, 201)
+
+    @staticmethod
+    async def gitlab_kickoff(headers : Dict[str, str], raw_payload : bytes) -> EndpointResponse:
+        EndpointHandlers.log().info("Received kickoff request for Gitlab")
+        EndpointHandlers.log().debug("gitlab kickoff: headers: [%s] body: [%s]", headers, raw_payload)
+        return await EndpointHandlers.__kickoff(GitlabKickoffOrchestrator, ko.GitlabKickoffMsg, headers, raw_payload)
@@ -0,0 +1,172 @@
+import os, re, logging
+from typing import Dict, List
+from scm_services.sparse import SparseCheckout
+from cxoneflow_metrics import MetricsRegistry
+
+
+class FileSelection:
+    """The files selected for a scan payload keyed by absolute path with the archive name as the value."""
+
+    def __init__(self):
+        self.entries = {}
+        self.included_bytes = 0
+        self.excluded_files = 0
+        self.excluded_bytes = 0
+
+    @property
+    def included_files(self) -> int:
+        return len(self.entries)
+
+    def __repr__(self):
+        return f"included {self.included_files} files/{self.included_bytes} bytes, " + \
+            f"excluded {self.excluded_files} files/{self.excluded_bytes} bytes"
+
+
+class FileSelector:
+    """Selects the files in a working tree that are added to the scan payload.
+
+    Files are excluded if they are VCS metadata, match a filter exclusion common to all engines selected
+    for the scan, exceed the maximum file size, or have an extension of a file type no engine scans.
+    """
+
+    METRIC_EXCLUDED_FILES = "file_selection.excluded_files"
+    METRIC_EXCLUDED_BYTES = "file_selection.excluded_bytes"
+
+    VCS_METADATA = frozenset([".git", ".hg", ".svn", ".bzr", "CVS"])
+
+    DEFAULT_EXCLUDED_EXTENSIONS = [
+        ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".tif", ".tiff", ".webp", ".psd",
+        ".mp3", ".mp4", ".m4a", ".mov", ".avi", ".mkv", ".wav", ".flac", ".ogg", ".webm",
+        ".woff", ".woff2", ".ttf", ".otf", ".eot",
+        ".iso", ".dmg", ".img", ".vmdk", ".vhd", ".qcow2",
+    ]
+
+    @classmethod
+    def log(clazz) -> logging.Logger:
+        return logging.getLogger(clazz.__name__)
+
+    def __init__(self, exclude_globs : List[str]=None, max_file_size : int=None, excluded_extensions : List[str]=None):
+        self.__globs = list(exclude_globs) if exclude_globs is not None else []
+        self.__exclude_regex = re.compile("|".join([f"(?:{FileSelector.glob_to_regex(g)})" for g in self.__globs])) \
+            if len(self.__globs) > 0 else None
+        self.__max_file_size = max_file_size if max_file_size is not None and max_file_size > 0 else None
+        self.__extensions = tuple([x.lower() if x.startswith(".") else f".{x.lower()}" for x in
+                                   (excluded_extensions if excluded_extensions is not None else FileSelector.DEFAULT_EXCLUDED_EXTENSIONS)])
+
+    @property
+    def exclude_globs(self) -> List[str]:
+        return list(self.__globs)
+
+    @staticmethod
+    def from_filters(engine_filters : Dict[str, str], max_file_size : int=None, excluded_extensions : List[str]=None):
+        """Only exclusions that every engine applies are used since any engine may scan a file the others exclude."""
+        common_excludes = None
+        for filter_str in (engine_filters.values() if engine_filters is not None else []):
+            _, excludes = SparseCheckout.split_filter(filter_str)
+            common_excludes = set(excludes) if common_excludes is None else common_excludes & set(excludes)
+
+        return FileSelector(sorted(common_excludes) if common_excludes is not None else None, max_file_size, excluded_extensions)
+
+    @staticmethod
+    def glob_to_regex(glob : str) -> str:
+        """Translates a filter glob to a regex that matches paths relative to the root of the working tree."""
+        pattern = glob.strip("/")
+        regex = ""
+        i = 0
+        while i < len(pattern):
+            c = pattern[i]
+            if pattern.startswith("**/", i):
+                regex += "(?:.*/)?"
+                i += 3
+                continue
+            elif pattern.startswith("**", i):
+                regex += ".*"
+                i += 2
+                continue
+            elif c == "*":
+                regex += "[^/]*"
+            elif c == "?":
+                regex += "[^/]"
+            elif c == "[" and "]" in pattern[i + 2:]:
+                end = pattern.index("]", i + 2)
+                body = pattern[i + 1:end]
+                body = ("^" + body[1:] if body.startswith("!") else body).replace("\\", "\\\\")
+                regex += f"[{body}]"
+                i = end
+            else:
+                regex += re.escape(c)
+            i += 1
+
+        # A matching directory excludes everything below it.
+        return f"{regex}(?:/.*)?"
+
+    def __is_filtered(self, rel_path : str) -> bool:
+        return self.__exclude_regex is not None and self.__exclude_regex.fullmatch(rel_path) is not None
+
+    @staticmethod
+    def __tree_size(path : str) -> tuple:
+        files = total = 0
+        stack = [path]
+        while len(stack) > 0:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            files += 1
+                            total += entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                pass
+        return files, total
+
+    def __exclude(self, selection : FileSelection, entry : os.DirEntry, is_dir : bool, reason : str):
+        if is_dir:
+            files, size = FileSelector.__tree_size(entry.path)
+        else:
+            files, size = 1, entry.stat(follow_symlinks=False).st_size
+        selection.excluded_files += files
+        selection.excluded_bytes += size
+        FileSelector.log().debug(f"Excluded {entry.path} ({reason}): {files} files, {size} bytes")
+
+    def select(self, root : str, preserve : List[str]=None) -> FileSelection:
+        """Walks the tree at root.  Paths relative to root listed in preserve are always included."""
+        selection = FileSelection()
+        keep = set(preserve) if preserve is not None else set()
+        stack = [(str(root), "")]
+
+        while len(stack) > 0:
+            dir_path, rel_dir = stack.pop()
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    rel_path = f"{rel_dir}{entry.name}"
+                    is_dir = entry.is_dir(follow_symlinks=False)
+
+                    if rel_path not in keep:
+                        if entry.name in FileSelector.VCS_METADATA:
+                            self.__exclude(selection, entry, is_dir, "vcs metadata")
+                            continue
+                        elif self.__is_filtered(rel_path):
+                            self.__exclude(selection, entry, is_dir, "filter")
+                            continue
+
+                    if is_dir:
+                        stack.append((entry.path, f"{rel_path}/"))
+                    elif entry.is_file():
+                        size = entry.stat().st_size
+                        if rel_path not in keep:
+                            if self.__max_file_size is not None and size > self.__max_file_size:
+                                self.__exclude(selection, entry, False, "size")
+                                continue
+                            elif entry.name.lower().endswith(self.__extensions):
+                                self.__exclude(selection, entry, False, "extension")
+                                continue
+                        selection.entries[entry.path] = rel_path
+                        selection.included_bytes += size
+                    else:
+                        FileSelector.log().warning(f"File skipped: {entry.path} (Symlink: {entry.is_symlink()})")
+
+        MetricsRegistry.increment(FileSelector.METRIC_EXCLUDED_FILES, selection.excluded_files)
+        MetricsRegistry.increment(FileSelector.METRIC_EXCLUDED_BYTES, selection.excluded_bytes)
+
+        return selection
@@ -1,9 +1,9 @@
 from orchestration.base import AbstractOrchestrator
 from api_utils import signature
-from api_utils.pagers import async_api_page_generator
+from api_utils.pagers import async_api_page_generator, link_header_page_count
 from api_utils.auth_factories import EventContext
-from jsonpath_ng import parse
-from scm_services import SCMService
+from api_utils.json_paths import compile_path
+from scm_services import SCMService, GHService
 from scm_services.cloner import CloneWorker
 from requests import Response
 from cxone_api.high.scans import ScanInspector
@@ -15,43 +15,48 @@ class GithubOrchestrator(AbstractOrchestrator):
 
     __api_page_max = 100
 
-    __event_action_query = parse("$.action")
+    __event_action_query = compile_path("$.action")
 
-    __install_sender_query = parse("$.sender.login")
-    __install_target_query = parse("$.installation.account.login")
-    __install_target_type_query = parse("$.installation.account.type")
-    __install_repo_selection_query = parse("$.installation.repository_selection")
-    __install_events_query = parse("$.installation.events")
-    __install_permissions_query = parse("$.installation.permissions")
-    __install_route_url_query = parse("$.installation.account.html_url")
+    __install_sender_query = compile_path("$.sender.login")
+    __install_target_query = compile_path("$.installation.account.login")
+    __install_target_type_query = compile_path("$.installation.account.type")
+    __install_repo_selection_query = compile_path("$.installation.repository_selection")
+    __install_events_query = compile_path("$.installation.events")
+    __install_permissions_query = compile_path("$.installation.permissions")
+    __install_route_url_query = compile_path("$.installation.account.html_url")
 
        
-    __push_target_branch_query = parse("$.ref")
-    __push_target_hash_query = parse("$.after")
-    __push_project_key_query = parse("$.repository.name")
-    __push_org_key_query = parse("$.repository.owner.name")
-
-
-    __pull_target_branch_query = parse("$.pull_request.base.ref")
-    __pull_target_hash_query = parse("$.pull_request.base.sha")
-    __pull_source_branch_query = parse("$.pull_request.head.ref")
-    __pull_source_hash_query = parse("$.pull_request.head.sha")
-    __pull_id_query = parse("$.number")
-    __pull_state_query = parse("$.pull_request.state")
-    __pull_draft_query = parse("$.pull_request.draft")
-    __pull_html_url = parse("$.pull_request.html_url")
-    __pull_project_key_query = parse("$.repository.name")
-    __pull_org_key_query = parse("$.repository.owner.login")
-    __pull_assignee_query = parse("$.pull_request.assignee")
-    __pull_assignees_query = parse("$.pull_request.assignees")
-    __pull_requested_reviewers_query = parse("$.pull_request[requested_teams,requested_reviewers][*]")
-
-    __code_event_route_url_query = parse("$.repository[clone_url,ssh_url]")
-    __code_event_ssh_clone_url_query = parse("$.repository.ssh_url")
-    __code_event_http_clone_url_query = parse("$.repository.clone_url")
-    __code_event_default_branch_name_extract = parse("$.repository.default_branch")
+    __push_target_branch_query = compile_path("$.ref")
+    __push_target_hash_query = compile_path("$.after")
+    __push_project_key_query = compile_path("$.repository.name")
+    __push_org_key_query = compile_path("$.repository.owner.name")
+    __push_created_query = compile_path("$.created")
+    __push_deleted_query = compile_path("$.deleted")
+
+
+    __pull_target_branch_query = compile_path("$.pull_request.base.ref")
+    __pull_target_hash_query = compile_path("$.pull_request.base.sha")
+    __pull_source_branch_query = compile_path("$.pull_request.head.ref")
+    __pull_source_hash_query = compile_path("$.pull_request.head.sha")
+    __pull_id_query = compile_path("$.number")
+    __pull_state_query = compile_path("$.pull_request.state")
+    __pull_draft_query = compile_path("$.pull_request.draft")
+    __pull_html_url = compile_path("$.pull_request.html_url")
+    __pull_project_key_query = compile_path("$.repository.name")
+    __pull_org_key_query = compile_path("$.repository.owner.login")
+    __pull_assignee_query = compile_path("$.pull_request.assignee")
+    __pull_assignees_query = compile_path("$.pull_request.assignees")
+    __pull_requested_reviewers_query = compile_path("$.pull_request[requested_teams,requested_reviewers][*]")
+
+    __code_event_route_url_query = compile_path("$.repository[clone_url,ssh_url]")
+    __code_event_ssh_clone_url_query = compile_path("$.repository.ssh_url")
+    __code_event_http_clone_url_query = compile_path("$.repository.clone_url")
+    __code_event_default_branch_name_extract = compile_path("$.repository.default_branch")
+
+    __repo_event_project_key_query = compile_path("$.repository.name")
+    __repo_event_org_key_query = compile_path("$.repository.owner.login")
     
-    __branch_names_extract = parse("$.[*].name")
+    __branch_names_extract = compile_path("$.[*].name")
 
     __expected_events = ['pull_request', 'pull_request_review', 'push']
     __expected_permissions = {
@@ -66,18 +71,16 @@ class GithubOrchestrator(AbstractOrchestrator):
     }
 
 
-    @property
-    def config_key(self):
-        return "gh"
+    CONFIG_KEY = "gh"
 
     @property
     def is_diagnostic(self) -> bool:
         return self.__isdiagnostic
 
     async def __log_app_install(self, services : CxOneFlowServices):
-        sender = GithubOrchestrator.__install_sender_query.find(self.event_context.message)[0].value
-        target = GithubOrchestrator.__install_target_query.find(self.event_context.message)[0].value
-        target_type = GithubOrchestrator.__install_target_type_query.find(self.event_context.message)[0].value
+        sender = GithubOrchestrator.__install_sender_query.values(self.event_context.message)[0]
+        target = GithubOrchestrator.__install_target_query.values(self.event_context.message)[0]
+        target_type = GithubOrchestrator.__install_target_type_query.values(self.event_context.message)[0]
 
         GithubOrchestrator.log().info(f"Install event '{self.__action}': Initiated by [{sender}] on {target_type} [{target}]")
         if self.__action in ["created", "new_permissions_accepted", "added"]:
@@ -87,7 +90,7 @@ class GithubOrchestrator(AbstractOrchestrator):
                 GithubOrchestrator.log().warning(f"Install target '{target}' is type '{target_type}' but expected to be 'Organization'.")
                 warned = True
 
-            repo_selection = GithubOrchestrator.__install_repo_selection_query.find(self.event_context.message)[0].value
+            repo_selection = GithubOrchestrator.__install_repo_selection_query.values(self.event_context.message)[0]
             if not repo_selection == "all":
                 GithubOrchestrator.log().warning(f"Repository selection is '{repo_selection}' but expected to be 'all'.")
                 warned = True
@@ -125,21 +128,22 @@ class GithubOrchestrator(AbstractOrchestrator):
                 GithubOrchestrator.log().info("The GitHub app appears to be properly configured.")
 
     def __installation_route_urls(self):
-        return [GithubOrchestrator.__install_route_url_query.find(self.event_context.message)[0].value]
+        return [GithubOrchestrator.__install_route_url_query.values(self.event_context.message)[0]]
     
     def __code_event_route_urls(self):
-        return [GithubOrchestrator.__code_event_route_url_query.find(self.event_context.message)[0].value]
+        return [GithubOrchestrator.__code_event_route_url_query.values(self.event_context.message)[0]]
 
     def __code_event_clone_urls(self):
         return {
-            "ssh" : GithubOrchestrator.__code_event_ssh_clone_url_query.find(self.event_context.message)[0].value,
-            "http" : GithubOrchestrator.__code_event_http_clone_url_query.find(self.event_context.message)[0].value
+            "ssh" : GithubOrchestrator.__code_event_ssh_clone_url_query.values(self.event_context.message)[0],
+            "http" : GithubOrchestrator.__code_event_http_clone_url_query.values(self.event_context.message)[0]
         }
 
     def __init__(self, event_context : EventContext):
         AbstractOrchestrator.__init__(self, event_context)
 
         self.__isdiagnostic = False
+        self.__pr_data_populated = False
 
         self.__event = self.get_header_key_safe('X-Github-Event') 
 
@@ -161,6 +165,10 @@ class GithubOrchestrator(AbstractOrchestrator):
         self.__clone_urls = GithubOrchestrator.__clone_url_parser_dispatch_map[self.__event](self) \
             if self.__event in GithubOrchestrator.__clone_url_parser_dispatch_map.keys() else {}
 
+    @property
+    def delivery_id(self) -> str:
+        return self.get_header_key_insensitive('X-GitHub-Delivery')
+
     @property
     def event_name(self) -> str:
         return self.__dispatch_event
@@ -189,24 +197,30 @@ class GithubOrchestrator(AbstractOrchestrator):
     def route_urls(self) -> list:
         return self.__route_urls
 
-    async def is_signature_valid(self, shared_secret : str) -> bool:
-        sig = self.get_header_key_safe('X-Hub-Signature-256')
+    @staticmethod
+    def signature_valid(headers : Dict, raw_event_payload : bytes, shared_secret : str) -> bool:
+        sig = headers.get('X-Hub-Signature-256', None)
         if sig is None:
             GithubOrchestrator.log().warning("X-Hub-Signature-256 header is missing, rejecting.")
             return False
         
         hashalg,hash = sig.split("=")
-        payload_hash = signature.hmac(hashalg, shared_secret, self.event_context.raw_event_payload)
+        payload_hash = signature.hmac(hashalg, shared_secret, raw_event_payload)
 
         return hash == payload_hash
 
+    @classmethod
+    def handles_event(clazz, headers : Dict) -> bool:
+        event = headers.get('X-Github-Event', None)
+        return event is None or event in GithubOrchestrator.__handled_events
+
     def __init_state_on_push(self):
         self.__target_branch = self.__source_branch = AbstractOrchestrator.normalize_branch_name(
-            GithubOrchestrator.__push_target_branch_query.find(self.event_context.message)[0].value)
-        self.__target_hash = self.__source_hash = GithubOrchestrator.__push_target_hash_query.find(self.event_context.message)[0].value
+            GithubOrchestrator.__push_target_branch_query.values(self.event_context.message)[0])
+        self.__target_hash = self.__source_hash = GithubOrchestrator.__push_target_hash_query.values(self.event_context.message)[0]
 
-        self.__project_key = GithubOrchestrator.__push_project_key_query.find(self.event_context.message)[0].value
-        self.__org = GithubOrchestrator.__push_org_key_query.find(self.event_context.message)[0].value
+        self.__project_key = GithubOrchestrator.__push_project_key_query.values(self.event_context.message)[0]
+        self.__org = GithubOrchestrator.__push_org_key_query.values(self.event_context.message)[0]
 
     async def _execute_delegated_push_scan_workflow(self, services : CxOneFlowServices, scan_id : str): 
         self.__init_state_on_push()
@@ -214,40 +228,45 @@ class GithubOrchestrator(AbstractOrchestrator):
 
     async def _execute_push_scan_workflow(self, services : CxOneFlowServices):
         self.__init_state_on_push()
+
+        # A new branch may match a wildcard protection rule.
+        if GithubOrchestrator.__push_created_query.first(self.event_context.message, False) or \
+            GithubOrchestrator.__push_deleted_query.first(self.event_context.message, False):
+            services.scm.invalidate_protected_branches(self.__protected_branch_cache_key)
+
         return await AbstractOrchestrator._execute_push_scan_workflow(self, services)
 
 
     def __get_pr_assignees(self):
-        ret = []
-        assignee = GithubOrchestrator.__pull_assignee_query.find(self.event_context.message)
-        assignees = GithubOrchestrator.__pull_assignees_query.find(self.event_context.message)
+        assignee = GithubOrchestrator.__pull_assignee_query.first(self.event_context.message)
+        ret = list(GithubOrchestrator.__pull_assignees_query.first(self.event_context.message) or [])
 
-        if len(assignees) > 0 and assignees[0].value is not None and len(assignees[0].value) > 0:
-            ret = assignees[0].value
-
-        if len(assignee) > 0 and assignee[0].value is not None:
-            ret.append(assignee[0].value)
+        if assignee is not None:
+            ret.append(assignee)
 
         return ret
 
     def __get_pr_reviewers(self):
-        reviewers = GithubOrchestrator.__pull_requested_reviewers_query.find(self.event_context.message)
-        if len(reviewers) > 0 and reviewers[0].value is not None:
-            return reviewers[0].value
+        reviewers = GithubOrchestrator.__pull_requested_reviewers_query.first(self.event_context.message)
+        if reviewers is not None:
+            return reviewers
         
         return []
 
     def __populate_common_pr_data(self):
-        self.__pr_html_url = GithubOrchestrator.__pull_html_url.find(self.event_context.message)[0].value
-        self.__pr_id = GithubOrchestrator.__pull_id_query.find(self.event_context.message)[0].value
-        self.__project_key = GithubOrchestrator.__pull_project_key_query.find(self.event_context.message)[0].value
-        self.__org = GithubOrchestrator.__pull_org_key_query.find(self.event_context.message)[0].value
-        self.__target_branch = GithubOrchestrator.__pull_target_branch_query.find(self.event_context.message)[0].value
-        self.__source_branch = GithubOrchestrator.__pull_source_branch_query.find(self.event_context.message)[0].value
-        self.__target_hash = GithubOrchestrator.__pull_target_hash_query.find(self.event_context.message)[0].value
-        self.__source_hash = GithubOrchestrator.__pull_source_hash_query.find(self.event_context.message)[0].value
-        self.__is_draft = bool(GithubOrchestrator.__pull_draft_query.find(self.event_context.message)[0].value)
-        self.__pr_state = f"{GithubOrchestrator.__pull_state_query.find(self.event_context.message)[0].value}{"-draft" if self.__is_draft else ""}"
+        if self.__pr_data_populated:
+            return
+
+        self.__pr_html_url = GithubOrchestrator.__pull_html_url.values(self.event_context.message)[0]
+        self.__pr_id = GithubOrchestrator.__pull_id_query.values(self.event_context.message)[0]
+        self.__project_key = GithubOrchestrator.__pull_project_key_query.values(self.event_context.message)[0]
+        self.__org = GithubOrchestrator.__pull_org_key_query.values(self.event_context.message)[0]
+        self.__target_branch = GithubOrchestrator.__pull_target_branch_query.values(self.event_context.message)[0]
+        self.__source_branch = GithubOrchestrator.__pull_source_branch_query.values(self.event_context.message)[0]
+        self.__target_hash = GithubOrchestrator.__pull_target_hash_query.values(self.event_context.message)[0]
+        self.__source_hash = GithubOrchestrator.__pull_source_hash_query.values(self.event_context.message)[0]
+        self.__is_draft = bool(GithubOrchestrator.__pull_draft_query.values(self.event_context.message)[0])
+        self.__pr_state = f"{GithubOrchestrator.__pull_state_query.values(self.event_context.message)[0]}{"-draft" if self.__is_draft else ""}"
 
         if len(self.__get_pr_assignees()) > 0:
             self.__pr_status = "REVIEWERS_ASSIGNED"
@@ -256,6 +275,8 @@ class GithubOrchestrator(AbstractOrchestrator):
         else:
             self.__pr_status = "NO_REVIEWERS"
 
+        self.__pr_data_populated = True
+
     async def _execute_delegated_pr_scan_workflow(self, services : CxOneFlowServices, scan_id : str):
         self.__populate_common_pr_data()
         return await AbstractOrchestrator._execute_delegated_pr_scan_workflow(self, services, scan_id)
@@ -286,7 +307,23 @@ class GithubOrchestrator(AbstractOrchestrator):
         return self.__pr_status
 
 
-    async def _get_protected_branches(self, scm_service : SCMService) -> list:
+    async def __invalidate_protected_branches(self, services : CxOneFlowServices):
+        self.__project_key = GithubOrchestrator.__repo_event_project_key_query.values(self.event_context.message)[0]
+        self.__org = GithubOrchestrator.__repo_event_org_key_query.values(self.event_context.message)[0]
+
+        GithubOrchestrator.log().debug(f"Event {self.__dispatch_event} invalidates protected branches for {self.__org}/{self.__project_key}")
+        services.scm.invalidate_protected_branches(self.__protected_branch_cache_key)
+
+    @property
+    def __protected_branch_cache_key(self) -> tuple:
+        return (self._repo_organization, self._repo_project_key)
+
+    async def __load_protected_branches(self, scm_service : SCMService) -> list:
+        if isinstance(scm_service, GHService):
+            metadata = await scm_service.fetch_repo_metadata(self._repo_organization, self._repo_project_key, None, self.event_context)
+            if metadata is not None and metadata.protected_branches is not None:
+                return metadata.protected_branches
+
         ret_branches = []
         def data_extractor(resp : Response):
             if resp.ok:
@@ -304,11 +341,17 @@ class GithubOrchestrator(AbstractOrchestrator):
                 "event_context" : self.event_context
             }
 
-        async for branch in async_api_page_generator(scm_service.exec, data_extractor, args_gen):
+        async for branch in async_api_page_generator(scm_service.exec, data_extractor, args_gen, link_header_page_count):
             ret_branches.append(branch)
 
+        return ret_branches
+
+    async def _get_protected_branches(self, scm_service : SCMService) -> list:
+        ret_branches = await scm_service.cached_protected_branches(self.__protected_branch_cache_key,
+                                                                   lambda: self.__load_protected_branches(scm_service))
+
         if len(ret_branches) == 0:
-            ret_branches.append(GithubOrchestrator.__code_event_default_branch_name_extract.find(self.event_context.message)[0].value)
+            ret_branches.append(GithubOrchestrator.__code_event_default_branch_name_extract.values(self.event_context.message)[0])
 
         return ret_branches
 
@@ -353,9 +396,20 @@ class GithubOrchestrator(AbstractOrchestrator):
         "pull_request:review_request_removed" : _execute_pr_tag_update_workflow,
         "pull_request:review_requested" : _execute_pr_tag_update_workflow,
         "pull_request:closed" : _execute_pr_tag_update_workflow,
-        "pull_request:converted_to_draft" : _execute_pr_tag_update_workflow
+        "pull_request:converted_to_draft" : _execute_pr_tag_update_workflow,
+        "branch_protection_rule:created" : __invalidate_protected_branches,
+        "branch_protection_rule:edited" : __invalidate_protected_branches,
+        "branch_protection_rule:deleted" : __invalidate_protected_branches,
+        "branch_protection_configuration:enabled" : __invalidate_protected_branches,
+        "branch_protection_configuration:disabled" : __invalidate_protected_branches,
+        "repository:edited" : __invalidate_protected_branches,
+        "repository:renamed" : __invalidate_protected_branches,
+        "repository:transferred" : __invalidate_protected_branches,
+        "repository:deleted" : __invalidate_protected_branches
     }
 
+    __handled_events = set([k.split(":")[0] for k in __workflow_map.keys()] + ["ping"])
+
     __delegate_scan_handler_map = {
         "push" : _execute_delegated_push_scan_workflow,
         "pull_request:opened" : _execute_delegated_pr_scan_workflow,
@@ -368,8 +422,10 @@ class GithubOrchestrator(AbstractOrchestrator):
         "installation" : __installation_route_urls,
         "installation_repositories" : __installation_route_urls,
         "push" : __code_event_route_urls,
-        "pull_request" : __code_event_route_urls
-
+        "pull_request" : __code_event_route_urls,
+        "branch_protection_rule" : __code_event_route_urls,
+        "branch_protection_configuration" : __code_event_route_urls,
+        "repository" : __code_event_route_urls
     }
 
     __clone_url_parser_dispatch_map = {
@@ -1,7 +1,7 @@
 from orchestration.base import AbstractOrchestrator
 from orchestration.naming.gl import GitlabProjectNaming
 from api_utils.auth_factories import EventContext
-from jsonpath_ng import parse
+from api_utils.json_paths import compile_path
 from services import CxOneFlowServices
 from scm_services import SCMService
 from typing import Dict, List
@@ -23,31 +23,33 @@ class GitlabOrchestrator(AbstractOrchestrator):
 
     __pr_closed_states = ["closed"]
 
-    __event_git_ssh_url_query = parse("$.project.git_ssh_url")
-    __event_git_http_url_query = parse("$.project.git_http_url")
-    __event_type_query = parse("$.object_kind")
+    __handled_event_headers = ["Push Hook", "Merge Request Hook", "System Hook"]
 
-    __event_project_path_query = parse("$.project.path_with_namespace")
-    __event_project_id_query = parse("$.project.id")
+    __event_git_ssh_url_query = compile_path("$.project.git_ssh_url")
+    __event_git_http_url_query = compile_path("$.project.git_http_url")
+    __event_type_query = compile_path("$.object_kind")
 
+    __event_project_path_query = compile_path("$.project.path_with_namespace")
+    __event_project_id_query = compile_path("$.project.id")
 
-    __push_after_hash_query = parse("$.after")
-    __push_before_hash_query = parse("$.before")
-    __push_ref_query = parse("$.ref")
-    __push_ref_protected_query = parse("$.ref_protected")
-    __push_default_branch_query = parse("$.project.default_branch")
 
-    __pr_draft_query = parse("$.object_attributes.draft")
-    __pr_link_query = parse("$.object_attributes.url")
-    __pr_id_query = parse("$.object_attributes.iid")
-    __pr_state_query = parse("$.object_attributes.state")
-    __pr_status_query = parse("$.object_attributes.action")
-    __pr_source_branch_query = parse("$.object_attributes.source_branch")
-    __pr_target_branch_query = parse("$.object_attributes.target_branch")
-    __pr_commit_hash_query = parse("$.object_attributes.last_commit.id")
+    __push_after_hash_query = compile_path("$.after")
+    __push_before_hash_query = compile_path("$.before")
+    __push_ref_query = compile_path("$.ref")
+    __push_ref_protected_query = compile_path("$.ref_protected")
+    __push_default_branch_query = compile_path("$.project.default_branch")
 
-    __api_default_branch_query = parse("$.default_branch")
-    __api_protected_branch_query = parse("$[*].name")
+    __pr_draft_query = compile_path("$.object_attributes.draft")
+    __pr_link_query = compile_path("$.object_attributes.url")
+    __pr_id_query = compile_path("$.object_attributes.iid")
+    __pr_state_query = compile_path("$.object_attributes.state")
+    __pr_status_query = compile_path("$.object_attributes.action")
+    __pr_source_branch_query = compile_path("$.object_attributes.source_branch")
+    __pr_target_branch_query = compile_path("$.object_attributes.target_branch")
+    __pr_commit_hash_query = compile_path("$.object_attributes.last_commit.id")
+
+    __api_default_branch_query = compile_path("$.default_branch")
+    __api_protected_branch_query = compile_path("$[*].name")
 
     def __init__(self, event_context : EventContext):
         AbstractOrchestrator.__init__(self, event_context)
@@ -91,6 +93,11 @@ class GitlabOrchestrator(AbstractOrchestrator):
         
         self.__route_urls = list(self.__clone_urls.values())
 
+    @property
+    def delivery_id(self) -> str:
+        key = self.get_header_key_insensitive('Idempotency-Key')
+        return key if key is not None else self.get_header_key_insensitive('X-Gitlab-Event-UUID')
+
     @property
     def event_name(self) -> str:
         return self.__event
@@ -103,12 +110,16 @@ class GitlabOrchestrator(AbstractOrchestrator):
     def is_diagnostic(self) -> bool:
         return self.__isdiagnostic
 
-    @property
-    def config_key(self):
-        return "gl"
+    CONFIG_KEY = "gl"
+
+    @staticmethod
+    def signature_valid(headers : Dict, raw_event_payload : bytes, shared_secret : str) -> bool:
+        return shared_secret == headers.get('X-Gitlab-Token', None)
 
-    async def is_signature_valid(self, shared_secret : str) -> bool:
-        return shared_secret == self.get_header_key_safe('X-Gitlab-Token')
+    @classmethod
+    def handles_event(clazz, headers : Dict) -> bool:
+        event = headers.get('X-Gitlab-Event', None)
+        return event is None or event in GitlabOrchestrator.__handled_event_headers
 
     async def _get_target_branch_and_hash(self) -> tuple:
         return self.__target_branch, self.__target_hash
@@ -148,19 +159,19 @@ class GitlabOrchestrator(AbstractOrchestrator):
         return self.__pr_id
     
     def __populate_common_event_data(self):
-        self.__repo_project_key = GitlabOrchestrator.__event_project_path_query.find(self.event_context.message).pop().value
+        self.__repo_project_key = GitlabOrchestrator.__event_project_path_query.values(self.event_context.message).pop()
         self.__repo_name = self.__repo_project_key.split("/")[-1:].pop()
         self.__repo_organization = "/".join(self.__repo_project_key.split("/")[:-1])
 
     def __populate_common_push_event_data(self):
         self.__source_branch = self.__target_branch = AbstractOrchestrator.normalize_branch_name(
-            GitlabOrchestrator.__push_ref_query.find(self.event_context.message).pop().value)
-        self.__source_hash = self.__target_hash = GitlabOrchestrator.__push_after_hash_query.find(self.event_context.message).pop().value
+            GitlabOrchestrator.__push_ref_query.values(self.event_context.message).pop())
+        self.__source_hash = self.__target_hash = GitlabOrchestrator.__push_after_hash_query.values(self.event_context.message).pop()
 
         self.__populate_common_event_data()
 
         self.__protected_branches = []
-        if GitlabOrchestrator.__push_ref_protected_query.find(self.event_context.message).pop().value:
+        if GitlabOrchestrator.__push_ref_protected_query.values(self.event_context.message).pop():
             self.__protected_branches.append(AbstractOrchestrator.normalize_branch_name(self.__target_branch))
 
         found_default = GitlabOrchestrator.__push_default_branch_query.find(self.event_context.message)
@@ -195,32 +206,42 @@ class GitlabOrchestrator(AbstractOrchestrator):
         return GitlabProjectNaming.create_project_name(self._repo_project_key)
 
     async def __is_pr_draft(self) -> bool:
-        return bool(GitlabOrchestrator.__pr_draft_query.find(self.event_context.message).pop().value)
+        return bool(GitlabOrchestrator.__pr_draft_query.values(self.event_context.message).pop())
 
 
     def __populate_common_pr_data(self):
         self.__populate_common_event_data()
-        self.__source_branch = AbstractOrchestrator.normalize_branch_name(GitlabOrchestrator.__pr_source_branch_query.find(self.event_context.message).pop().value)
-        self.__target_branch = AbstractOrchestrator.normalize_branch_name(GitlabOrchestrator.__pr_target_branch_query.find(self.event_context.message).pop().value)
-        self.__source_hash = GitlabOrchestrator.__pr_commit_hash_query.find(self.event_context.message).pop().value
+        self.__source_branch = AbstractOrchestrator.normalize_branch_name(GitlabOrchestrator.__pr_source_branch_query.values(self.event_context.message).pop())
+        self.__target_branch = AbstractOrchestrator.normalize_branch_name(GitlabOrchestrator.__pr_target_branch_query.values(self.event_context.message).pop())
+        self.__source_hash = GitlabOrchestrator.__pr_commit_hash_query.values(self.event_context.message).pop()
         self.__target_hash = None
-        self.__pr_id = str(GitlabOrchestrator.__pr_id_query.find(self.event_context.message).pop().value)
-        self.__pr_state = GitlabOrchestrator.__pr_state_query.find(self.event_context.message).pop().value
-        self.__pr_status = GitlabOrchestrator.__pr_status_query.find(self.event_context.message).pop().value
+        self.__pr_id = str(GitlabOrchestrator.__pr_id_query.values(self.event_context.message).pop())
+        self.__pr_state = GitlabOrchestrator.__pr_state_query.values(self.event_context.message).pop()
+        self.__pr_status = GitlabOrchestrator.__pr_status_query.values(self.event_context.message).pop()
 
     async def _execute_delegated_pr_scan_workflow(self, services : CxOneFlowServices, scan_id : str):
         self.__populate_common_pr_data()
         return await AbstractOrchestrator._execute_delegated_pr_scan_workflow(self, services, scan_id)
 
 
+    async def __load_protected_branches(self, scm_service : SCMService, project_id : int) -> list:
+        default_branch_resp, protected_branch_resp = await asyncio.gather(
+            scm_service.exec("GET", f"/projects/{project_id}"),
+            scm_service.exec("GET", f"/projects/{project_id}/protected_branches"))
+
+        found_default = GitlabOrchestrator.__api_default_branch_query.values(json_on_ok(default_branch_resp))
+
+        return [AbstractOrchestrator.normalize_branch_name(found_default.pop()) if len(found_default) > 0 else None] + \
+            [AbstractOrchestrator.normalize_branch_name(x) for x in GitlabOrchestrator.__api_protected_branch_query.values(json_on_ok(protected_branch_resp))]
+
     async def _execute_pr_scan_workflow(self, services : CxOneFlowServices, scan_tags : Dict[str, str]=None) -> ScanInspector:
         if await self.__is_pr_draft():
-            GitlabOrchestrator.log().info(f"Skipping draft PR {GitlabOrchestrator.__pr_link_query.find(self.event_context.message).pop().value}")
+            GitlabOrchestrator.log().info(f"Skipping draft PR {GitlabOrchestrator.__pr_link_query.values(self.event_context.message).pop()}")
             return
 
         self.__populate_common_pr_data()
 
-        project_id = GitlabOrchestrator.__event_project_id_query.find(self.event_context.message).pop().value
+        project_id = GitlabOrchestrator.__event_project_id_query.values(self.event_context.message).pop()
 
         existing_scans = await services.cxone.find_pr_scans(await services.naming.get_project_name(
             await self.get_default_cxone_project_name(), self.event_context), self.__pr_id, self.__source_hash)
@@ -235,18 +256,14 @@ class GitlabOrchestrator(AbstractOrchestrator):
                 self.log().warning(f"PR {self.__pr_id} is closed, ignoring.")
                 return
             else:
-                default_branch_resp, protected_branch_resp = await asyncio.gather(
-                    services.scm.exec("GET", f"/projects/{project_id}"),
-                    services.scm.exec("GET", f"/projects/{project_id}/protected_branches"))
-                
-                found_default = GitlabOrchestrator.__api_default_branch_query.find(json_on_ok(default_branch_resp))
+                # The default branch is first, followed by the protected branch names and wildcards.
+                default_branch, *protected_branches = await services.scm.cached_protected_branches((project_id,),
+                    lambda: self.__load_protected_branches(services.scm, project_id))
 
-                if len(found_default) > 0:
-                    self.__protected_branches.append(AbstractOrchestrator.normalize_branch_name(found_default.pop().value))
+                if default_branch is not None:
+                    self.__protected_branches.append(default_branch)
                 
-                for pbranch in GitlabOrchestrator.__api_protected_branch_query.find(json_on_ok(protected_branch_resp)):
-                    branch_value = AbstractOrchestrator.normalize_branch_name(pbranch.value)
-
+                for branch_value in protected_branches:
                     # This can be a wildcard, so add it to the list of protected branches
                     # then add the target/source branches if they match
                     self.__protected_branches.append(branch_value)
@@ -0,0 +1,80 @@
+import os, tempfile, logging
+from typing import BinaryIO
+
+
+class PayloadSpool:
+    """Backing storage for a scan payload archive that can be referenced by path until discarded.
+
+    Payloads that are expected to fit within the memory limit are written to an anonymous in-memory
+    file (Linux memfd) and referenced through /proc so the archive never touches the disk.  Larger
+    payloads, or platforms without memfd support, use a temporary file.
+    """
+
+    __memfd_name = "cxoneflow-payload"
+
+    @classmethod
+    def log(clazz) -> logging.Logger:
+        return logging.getLogger(clazz.__name__)
+
+    def __init__(self, file : BinaryIO, path : str, in_memory : bool):
+        self.__file = file
+        self.__path = path
+        self.__in_memory = in_memory
+
+    @property
+    def file(self) -> BinaryIO:
+        return self.__file
+
+    @property
+    def path(self) -> str:
+        return self.__path
+
+    @property
+    def in_memory(self) -> bool:
+        return self.__in_memory
+
+    @staticmethod
+    def __memfd() -> "PayloadSpool":
+        if not hasattr(os, "memfd_create"):
+            return None
+
+        try:
+            fd = os.memfd_create(PayloadSpool.__memfd_name, os.MFD_CLOEXEC)
+        except OSError as ex:
+            PayloadSpool.log().debug(f"memfd_create failed, using a temporary file: {ex}")
+            return None
+
+        path = f"/proc/self/fd/{fd}"
+        if not os.path.exists(path):
+            os.close(fd)
+            return None
+
+        return PayloadSpool(os.fdopen(fd, "w+b"), path, True)
+
+    @staticmethod
+    def create(expected_size : int, memory_limit : int) -> "PayloadSpool":
+        """Returns an in-memory spool if expected_size does not exceed memory_limit, otherwise a temporary file spool."""
+        if memory_limit is not None and memory_limit > 0 and expected_size <= memory_limit:
+            spool = PayloadSpool.__memfd()
+            if spool is not None:
+                return spool
+
+        tmp = tempfile.NamedTemporaryFile(suffix='.zip', delete=False)
+        return PayloadSpool(tmp, tmp.name, False)
+
+    def seal(self):
+        """Called when the archive is complete so the path can be read by another reader."""
+        self.__file.flush()
+        if not self.__in_memory:
+            # The temporary file is referenced by name only; the in-memory file must stay open.
+            self.__file.close()
+
+    def discard(self):
+        try:
+            self.__file.close()
+        finally:
+            if not self.__in_memory:
+                try:
+                    os.unlink(self.__path)
+                except FileNotFoundError:
+                    pass
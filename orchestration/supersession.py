@@ -0,0 +1,63 @@
+import asyncio, logging, contextvars
+from contextlib import asynccontextmanager
+from typing import Hashable
+from cxoneflow_metrics import MetricsRegistry
+
+
+class SupersessionClaim:
+    def __init__(self, key : Hashable, task : asyncio.Task):
+        self.key = key
+        self.task = task
+        self.submitted = False
+        self.superseded = False
+
+
+class Supersession:
+    """Latest-wins tracking of scan orchestration for each repository branch or pull request.
+
+    When a newer event claims a key, the orchestration holding the older claim is cancelled if it
+    has not yet submitted a scan.  Scans already submitted are left to the polling workflow, which
+    stops when it finds a newer scan.  Claims are local to the event loop of the process.
+    """
+
+    METRIC_SUPERSEDED = "supersession.superseded"
+
+    __claims = {}
+    __current = contextvars.ContextVar("supersession_claim", default=None)
+
+    @classmethod
+    def log(clazz) -> logging.Logger:
+        return logging.getLogger(clazz.__name__)
+
+    @staticmethod
+    @asynccontextmanager
+    async def latest(key : Hashable):
+        claim = SupersessionClaim(key, asyncio.current_task())
+
+        previous = Supersession.__claims.get(key, None)
+        if previous is not None and not previous.task.done():
+            previous.superseded = True
+            MetricsRegistry.increment(Supersession.METRIC_SUPERSEDED)
+            if not previous.submitted:
+                Supersession.log().info(f"Cancelling orchestration superseded by a newer event for {key}")
+                previous.task.cancel()
+
+        Supersession.__claims[key] = claim
+        token = Supersession.__current.set(claim)
+        try:
+            yield claim
+        finally:
+            Supersession.__current.reset(token)
+            if Supersession.__claims.get(key, None) is claim:
+                del Supersession.__claims[key]
+
+    @staticmethod
+    def submitting() -> bool:
+        """Called before a scan is submitted.  Returns False if the current orchestration has been superseded."""
+        claim = Supersession.__current.get()
+        if claim is None:
+            return True
+        if claim.superseded:
+            return False
+        claim.submitted = True
+        return True
@@ -0,0 +1,297 @@
+import os, zlib, struct, time, logging, threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, List
+
+
+def _gf2_times(mat : List[int], vec : int) -> int:
+    total = 0
+    i = 0
+    while vec:
+        if vec & 1:
+            total ^= mat[i]
+        vec >>= 1
+        i += 1
+    return total
+
+
+def _gf2_square(mat : List[int]) -> List[int]:
+    return [_gf2_times(mat, mat[n]) for n in range(32)]
+
+
+def crc32_combine(crc1 : int, crc2 : int, len2 : int) -> int:
+    """The CRC32 of two concatenated byte sequences given the CRC32 of each and the length of the second."""
+    if len2 <= 0:
+        return crc1
+
+    # Operator for one zero bit, then two and four zero bits
+    odd = [0xEDB88320] + [1 << n for n in range(31)]
+    even = _gf2_square(odd)
+    odd = _gf2_square(even)
+
+    while True:
+        even = _gf2_square(odd)
+        if len2 & 1:
+            crc1 = _gf2_times(even, crc1)
+        len2 >>= 1
+        if len2 == 0:
+            break
+
+        odd = _gf2_square(even)
+        if len2 & 1:
+            crc1 = _gf2_times(odd, crc1)
+        len2 >>= 1
+        if len2 == 0:
+            break
+
+    return crc1 ^ crc2
+
+
+class _Chunk:
+    def __init__(self, data : bytes, crc : int, length : int, method : int):
+        self.data = data
+        self.crc = crc
+        self.length = length
+        self.method = method
+
+
+class _Entry:
+    def __init__(self, path : str, arcname : str, stat : os.stat_result, method : int):
+        self.path = path
+        self.arcname = arcname
+        self.stat = stat
+        self.method = method
+        self.crc = 0
+        self.compressed_size = 0
+        self.file_size = 0
+        self.header_offset = 0
+        self.zip64 = False
+
+
+class ParallelZipWriter:
+    """Writes a zip archive with file content compressed concurrently in a shared thread pool.
+
+    zlib releases the GIL while compressing, so entries are deflated in parallel while the archive
+    is assembled in order by the calling thread.  Large files are split into chunks that are deflated
+    independently, each primed with the preceding 32KB as a dictionary, and joined into one deflate
+    stream.  Files with extensions of already compressed formats, and files that deflate does not
+    shrink, are stored without compression.  The output must be seekable.
+    """
+
+    STORED_EXTENSIONS = (
+        ".zip", ".jar", ".war", ".ear", ".aar", ".apk", ".nupkg", ".whl", ".egg", ".gem",
+        ".gz", ".tgz", ".bz2", ".xz", ".zst", ".7z", ".rar", ".lz4",
+        ".png", ".jpg", ".jpeg", ".gif", ".webp", ".mp3", ".mp4", ".mov", ".woff", ".woff2", ".pdf",
+    )
+
+    __chunk_size = 4 * 1024 * 1024
+    __window_bytes = 128 * 1024 * 1024
+    __window_count = 4096
+    __dictionary_size = 32 * 1024
+
+    __STORED = 0
+    __DEFLATED = 8
+    __ZIP64_LIMIT = 0xFFFFFFFF
+    __ZIP64_COUNT_LIMIT = 0xFFFF
+    __UTF8_FLAG = 0x800
+
+    __executor = None
+    __executor_lock = threading.Lock()
+
+    @classmethod
+    def log(clazz) -> logging.Logger:
+        return logging.getLogger(clazz.__name__)
+
+    @staticmethod
+    def __get_executor() -> ThreadPoolExecutor:
+        with ParallelZipWriter.__executor_lock:
+            if ParallelZipWriter.__executor is None:
+                ParallelZipWriter.__executor = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="zip")
+            return ParallelZipWriter.__executor
+
+    def __init__(self, fileobj : BinaryIO, compress_level : int=9, stored_extensions : List[str]=None):
+        self.__fp = fileobj
+        self.__level = compress_level
+        self.__stored_extensions = tuple(stored_extensions) if stored_extensions is not None else ParallelZipWriter.STORED_EXTENSIONS
+        self.__written = []
+        self.__closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+
+    @staticmethod
+    def __compress_chunk(path : str, offset : int, length : int, last : bool, method : int, level : int) -> _Chunk:
+        with open(path, "rb") as f:
+            zdict = None
+            if method == ParallelZipWriter.__DEFLATED and offset > 0:
+                dict_offset = max(0, offset - ParallelZipWriter.__dictionary_size)
+                f.seek(dict_offset)
+                zdict = f.read(offset - dict_offset)
+
+            f.seek(offset)
+            raw = f.read(length)
+
+        crc = zlib.crc32(raw)
+
+        if method == ParallelZipWriter.__STORED:
+            return _Chunk(raw, crc, len(raw), method)
+
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=zdict) if zdict else zlib.compressobj(level, zlib.DEFLATED, -15)
+        data = compressor.compress(raw) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+        if last and offset == 0 and len(data) >= len(raw):
+            # Single chunk entries are stored if deflate does not reduce the size.
+            return _Chunk(raw, crc, len(raw), ParallelZipWriter.__STORED)
+
+        return _Chunk(data, crc, len(raw), method)
+
+    def __chunks(self, entries : Dict[str, str]):
+        for path, arcname in entries.items():
+            arcname = str(arcname)
+            stat = os.stat(path)
+            method = ParallelZipWriter.__STORED if self.__level == 0 or arcname.lower().endswith(self.__stored_extensions) \
+                else ParallelZipWriter.__DEFLATED
+            entry = _Entry(path, arcname, stat, method)
+
+            offset = 0
+            while True:
+                length = min(ParallelZipWriter.__chunk_size, stat.st_size - offset)
+                last = offset + length >= stat.st_size
+                yield entry, offset, length, last
+                offset += length
+                if last:
+                    break
+
+    @staticmethod
+    def __dos_time(mtime : float) -> tuple:
+        t = time.localtime(mtime)
+        if t.tm_year < 1980:
+            return (0, (1 << 5) | 1)
+        return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+                ((min(t.tm_year, 2107) - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+    @staticmethod
+    def __name_and_flags(arcname : str) -> tuple:
+        try:
+            return arcname.encode("ascii"), 0
+        except UnicodeEncodeError:
+            return arcname.encode("UTF-8"), ParallelZipWriter.__UTF8_FLAG
+
+    def __local_header(self, entry : _Entry, crc : int, compressed_size : int, file_size : int) -> bytes:
+        name, flags = ParallelZipWriter.__name_and_flags(entry.arcname)
+        dos_time, dos_date = ParallelZipWriter.__dos_time(entry.stat.st_mtime)
+
+        extra = b""
+        if entry.zip64:
+            extra = struct.pack("<HHQQ", 0x0001, 16, file_size, compressed_size)
+            compressed_size = file_size = ParallelZipWriter.__ZIP64_LIMIT
+
+        return struct.pack("<IHHHHHIIIHH", 0x04034b50, 45 if entry.zip64 else 20, flags, entry.method, dos_time, dos_date,
+                           crc, compressed_size, file_size, len(name), len(extra)) + name + extra
+
+    def __write_chunk(self, entry : _Entry, first : bool, last : bool, chunk : _Chunk):
+        if first and last:
+            entry.header_offset = self.__fp.tell()
+            entry.method = chunk.method
+            entry.crc, entry.compressed_size, entry.file_size = chunk.crc, len(chunk.data), chunk.length
+            entry.zip64 = entry.file_size >= ParallelZipWriter.__ZIP64_LIMIT or entry.compressed_size >= ParallelZipWriter.__ZIP64_LIMIT
+            self.__fp.write(self.__local_header(entry, entry.crc, entry.compressed_size, entry.file_size))
+            self.__fp.write(chunk.data)
+            self.__written.append(entry)
+            return
+
+        if first:
+            # The sizes are not known until all chunks are written; the header is rewritten afterward.
+            entry.header_offset = self.__fp.tell()
+            entry.zip64 = True
+            self.__fp.write(self.__local_header(entry, 0, 0, 0))
+
+        self.__fp.write(chunk.data)
+        entry.crc = crc32_combine(entry.crc, chunk.crc, chunk.length)
+        entry.compressed_size += len(chunk.data)
+        entry.file_size += chunk.length
+
+        if last:
+            end = self.__fp.tell()
+            self.__fp.seek(entry.header_offset)
+            self.__fp.write(self.__local_header(entry, entry.crc, entry.compressed_size, entry.file_size))
+            self.__fp.seek(end)
+            self.__written.append(entry)
+
+    def write_entries(self, entries : Dict[str, str]):
+        """Writes each file keyed by path using the value as the archive name."""
+        executor = ParallelZipWriter.__get_executor()
+        pending = deque()
+        pending_bytes = 0
+
+        def write_next():
+            nonlocal pending_bytes
+            entry, first, last, length, future = pending.popleft()
+            pending_bytes -= length
+            self.__write_chunk(entry, first, last, future.result())
+
+        try:
+            for entry, offset, length, last in self.__chunks(entries):
+                pending.append((entry, offset == 0, last, length, 
+                                executor.submit(ParallelZipWriter.__compress_chunk, entry.path, offset, length, last, entry.method, self.__level)))
+                pending_bytes += length
+
+                while len(pending) > 0 and (pending_bytes > ParallelZipWriter.__window_bytes or len(pending) > ParallelZipWriter.__window_count):
+                    write_next()
+
+            while len(pending) > 0:
+                write_next()
+        except BaseException:
+            for _, _, _, _, future in pending:
+                future.cancel()
+            raise
+
+    def __central_directory_record(self, entry : _Entry) -> bytes:
+        name, flags = ParallelZipWriter.__name_and_flags(entry.arcname)
+        dos_time, dos_date = ParallelZipWriter.__dos_time(entry.stat.st_mtime)
+
+        zip64_fields = []
+        file_size, compressed_size, header_offset = entry.file_size, entry.compressed_size, entry.header_offset
+        if file_size >= ParallelZipWriter.__ZIP64_LIMIT:
+            zip64_fields.append(file_size)
+            file_size = ParallelZipWriter.__ZIP64_LIMIT
+        if compressed_size >= ParallelZipWriter.__ZIP64_LIMIT:
+            zip64_fields.append(compressed_size)
+            compressed_size = ParallelZipWriter.__ZIP64_LIMIT
+        if header_offset >= ParallelZipWriter.__ZIP64_LIMIT:
+            zip64_fields.append(header_offset)
+            header_offset = ParallelZipWriter.__ZIP64_LIMIT
+
+        extra = struct.pack(f"<HH{len(zip64_fields)}Q", 0x0001, 8 * len(zip64_fields), *zip64_fields) if len(zip64_fields) > 0 else b""
+        version = 45 if entry.zip64 or len(zip64_fields) > 0 else 20
+
+        return struct.pack("<IHHHHHHIIIHHHHHII", 0x02014b50, (3 << 8) | version, version, flags, entry.method, dos_time, dos_date,
+                           entry.crc, compressed_size, file_size, len(name), len(extra), 0, 0, 0,
+                           (entry.stat.st_mode & 0xFFFF) << 16, header_offset) + name + extra
+
+    def close(self):
+        if self.__closed:
+            return
+        self.__closed = True
+
+        cd_offset = self.__fp.tell()
+        for entry in self.__written:
+            self.__fp.write(self.__central_directory_record(entry))
+        cd_size = self.__fp.tell() - cd_offset
+        count = len(self.__written)
+
+        if count >= ParallelZipWriter.__ZIP64_COUNT_LIMIT or cd_offset >= ParallelZipWriter.__ZIP64_LIMIT \
+                or cd_size >= ParallelZipWriter.__ZIP64_LIMIT:
+            zip64_eocd_offset = self.__fp.tell()
+            self.__fp.write(struct.pack("<IQHHIIQQQQ", 0x06064b50, 44, 45, 45, 0, 0, count, count, cd_size, cd_offset))
+            self.__fp.write(struct.pack("<IIQI", 0x07064b50, 0, zip64_eocd_offset, 1))
+            self.__fp.write(struct.pack("<IHHHHIIH", 0x06054b50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                                        min(cd_size, ParallelZipWriter.__ZIP64_LIMIT), min(cd_offset, ParallelZipWriter.__ZIP64_LIMIT), 0))
+        else:
+            self.__fp.write(struct.pack("<IHHHHIIH", 0x06054b50, 0, 0, count, count, cd_size, cd_offset, 0))
+
+        self.__fp.flush()
@@ -8,6 +8,7 @@ from workflows.pr_feedback_service import PRFeedbackService
 from workflows.push_feedback_service import PushFeedbackService
 from workflows.resolver_scan_service import ResolverScanService
 from workflows.scan_polling_service import ScanPollingService
+from workflows.ingestion_service import IngestionService
 from workflows.base_service import CxOneFlowAbstractWorkflowService
 
 
@@ -191,6 +192,44 @@ async def setup() -> None:
                 scan_annotate_exchange_pr, PRFeedbackService.ROUTEKEY_ANNOTATE_PR
             )
 
+        ingest_rmq = await services.ingest.mq_client()
+        async with ingest_rmq.channel() as channel:
+            # Webhook events queued for orchestration by the workflow agent.
+            ingest_exchange = await channel.declare_exchange(
+                IngestionService.EXCHANGE_INGEST,
+                aio_pika.ExchangeType.TOPIC,
+                durable=True,
+            )
+            ingest_dlx = await channel.declare_exchange(
+                IngestionService.EXCHANGE_INGEST_DLX,
+                aio_pika.ExchangeType.FANOUT,
+                internal=True,
+                durable=True,
+            )
+            ingest_failed_queue = await channel.declare_queue(
+                IngestionService.QUEUE_INGEST_FAILED,
+                durable=True,
+                arguments={"x-queue-type": "quorum"},
+            )
+            await ingest_failed_queue.bind(ingest_dlx)
+
+            # Events rejected by the workflow agent, or redelivered past the delivery limit, are kept in the
+            # failed queue for inspection.
+            ingest_queue = await channel.declare_queue(
+                IngestionService.QUEUE_INGEST,
+                durable=True,
+                arguments={
+                    "x-queue-type": "quorum",
+                    "x-dead-letter-strategy": "at-least-once",
+                    "x-overflow": "reject-publish",
+                    "x-dead-letter-exchange": IngestionService.EXCHANGE_INGEST_DLX,
+                    "x-delivery-limit": IngestionService.INGEST_DELIVERY_LIMIT,
+                },
+            )
+            await ingest_queue.bind(
+                ingest_exchange, IngestionService.ROUTEKEY_INGEST_BINDING
+            )
+
         resolver_rmq = await services.resolver.mq_client()
         async with resolver_rmq.channel() as channel:
             # Resolver scan queue configuration
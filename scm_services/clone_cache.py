@@ -0,0 +1,274 @@
+import os, asyncio, logging, hashlib, shutil, subprocess, urllib.parse, fcntl
+from pathlib import Path
+from typing import Dict, List
+from cxoneflow_metrics import MetricsRegistry
+from .git_process import GitProcess
+from .sparse import SparseCheckout
+
+
+class CloneCache:
+    """A disk cache of bare mirrors keyed by the credential-free clone URL.
+
+    Mirrors are updated with an incremental fetch only when the requested commit is
+    missing, then checked out into a disposable worktree for each scan.  Credentials
+    are only ever passed on the fetch command line and are never written to the mirror
+    configuration.
+    """
+
+    METRIC_HITS = "clone_cache.hits"
+    METRIC_MISSES = "clone_cache.misses"
+    METRIC_EVICTIONS = "clone_cache.evictions"
+
+    __lock_poll_seconds = 0.25
+    __mirror_dir = "mirror.git"
+    __fetch_lock_file = "fetch.lock"
+    __use_lock_file = "use.lock"
+    __size_file = "size"
+    __evict_lock_file = ".evict.lock"
+
+    @classmethod
+    def log(clazz) -> logging.Logger:
+        return logging.getLogger(clazz.__name__)
+
+    def __init__(self, cache_root : str, max_size_bytes : int):
+        self.__root = Path(cache_root)
+        self.__max_size = max_size_bytes
+        self.__root.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def root(self) -> Path:
+        return self.__root
+
+    @property
+    def max_size_bytes(self) -> int:
+        return self.__max_size
+
+    @staticmethod
+    def strip_creds_from_url(clone_url : str) -> str:
+        split = urllib.parse.urlsplit(clone_url)
+        return urllib.parse.urlunsplit((split.scheme, split.netloc.split("@")[-1], split.path, split.query, split.fragment))
+
+    @staticmethod
+    def key_for(clone_url : str) -> str:
+        return hashlib.sha256(CloneCache.strip_creds_from_url(clone_url).encode("UTF-8")).hexdigest()
+
+    def lease(self, clone_url : str):
+        return CloneCacheLease(self, clone_url)
+
+    def _entry_path(self, key : str) -> Path:
+        return self.__root / key
+
+    def _mirror_path(self, key : str) -> Path:
+        return self.__root / key / CloneCache.__mirror_dir
+
+    def _fetch_lock_path(self, key : str) -> Path:
+        return self.__root / key / CloneCache.__fetch_lock_file
+
+    def _use_lock_path(self, key : str) -> Path:
+        return self.__root / key / CloneCache.__use_lock_file
+
+    @staticmethod
+    async def _acquire(lock_path : Path, mode : int):
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o660)
+        try:
+            while True:
+                try:
+                    fcntl.flock(fd, mode | fcntl.LOCK_NB)
+                    return fd
+                except BlockingIOError:
+                    await asyncio.sleep(CloneCache.__lock_poll_seconds)
+        except BaseException:
+            os.close(fd)
+            raise
+
+    @staticmethod
+    def _release(fd : int):
+        if fd is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
+
+    @staticmethod
+    def __dir_size(path : Path) -> int:
+        total = 0
+        stack = [str(path)]
+        while len(stack) > 0:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
+        return total
+
+    def _record_use(self, entry_path : Path, mirror_path : Path, fetched : bool):
+        size_path = entry_path / CloneCache.__size_file
+
+        # The mirror only grows when it is fetched, otherwise the recorded size is still current.
+        if fetched or not size_path.exists():
+            tmp_path = entry_path / f"{CloneCache.__size_file}.{os.getpid()}"
+            tmp_path.write_text(str(CloneCache.__dir_size(mirror_path)))
+            os.replace(tmp_path, size_path)
+
+        os.utime(size_path)
+
+    def _evict(self, keep_key : str):
+        evict_fd = os.open(self.__root / CloneCache.__evict_lock_file, os.O_RDWR | os.O_CREAT, 0o660)
+        try:
+            try:
+                fcntl.flock(evict_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Someone else is already evicting.
+                return
+
+            entries = []
+            total = 0
+            with os.scandir(self.__root) as it:
+                for entry in it:
+                    size_path = Path(entry.path) / CloneCache.__size_file
+                    if entry.is_dir(follow_symlinks=False) and size_path.exists():
+                        stat = size_path.stat()
+                        size = int(size_path.read_text() or 0)
+                        total += size
+                        entries.append((stat.st_mtime, entry.name, size))
+
+            # Oldest use first
+            for _, key, size in sorted(entries):
+                if total <= self.__max_size:
+                    break
+                if key == keep_key:
+                    continue
+
+                entry_path = self.__root / key
+                use_fd = fetch_fd = None
+                try:
+                    use_fd = os.open(entry_path / CloneCache.__use_lock_file, os.O_RDWR | os.O_CREAT, 0o660)
+                    fcntl.flock(use_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    fetch_fd = os.open(entry_path / CloneCache.__fetch_lock_file, os.O_RDWR | os.O_CREAT, 0o660)
+                    fcntl.flock(fetch_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    CloneCache.log().debug(f"Mirror {key} is in use and can't be evicted.")
+                    continue
+                else:
+                    (entry_path / CloneCache.__size_file).unlink(missing_ok=True)
+                    shutil.rmtree(entry_path / CloneCache.__mirror_dir, ignore_errors=True)
+                    total -= size
+                    MetricsRegistry.increment(CloneCache.METRIC_EVICTIONS)
+                    CloneCache.log().info(f"Evicted mirror {key} freeing {size} bytes.")
+                finally:
+                    for fd in [fetch_fd, use_fd]:
+                        if fd is not None:
+                            os.close(fd)
+        finally:
+            os.close(evict_fd)
+
+
+class CloneCacheLease:
+    """Holds a shared claim on a mirror from checkout until release so it can't be evicted while in use."""
+
+    def __init__(self, cache, clone_url : str):
+        self.__cache = cache
+        self.__key = CloneCache.key_for(clone_url)
+        self.__clean_url = CloneCache.strip_creds_from_url(clone_url)
+        self.__entry_path = cache._entry_path(self.__key)
+        self.__mirror_path = cache._mirror_path(self.__key)
+        self.__use_fd = None
+        self.__worktree = None
+        self.__run_env = None
+        self.__git_cmd_stub = None
+        self.__timeout = None
+
+    @property
+    def key(self) -> str:
+        return self.__key
+
+    async def __git(self, args : List[str], cwd : str=None, auth : bool=False) -> subprocess.CompletedProcess:
+        return await GitProcess.run((self.__git_cmd_stub if auth else ["git"]) + args, self.__run_env, cwd, self.__timeout)
+
+    async def __has_commit(self, commit_hash : str) -> bool:
+        try:
+            await self.__git(["--git-dir", str(self.__mirror_path), "cat-file", "-e", f"{commit_hash}^{{commit}}"])
+            return True
+        except subprocess.CalledProcessError:
+            return False
+
+    async def __update_mirror(self, fetch_url : str, commit_hash : str) -> bool:
+        git_dir = ["--git-dir", str(self.__mirror_path)]
+
+        if not self.__mirror_path.exists():
+            await self.__git(["init", "--bare", str(self.__mirror_path)])
+            await self.__git(git_dir + ["config", "remote.origin.url", self.__clean_url])
+        elif await self.__has_commit(commit_hash):
+            return True
+
+        await self.__git(git_dir + ["worktree", "prune"])
+        await self.__git(git_dir + ["fetch", "--prune", "--no-tags", fetch_url,
+                                    "+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"], auth=True)
+
+        if not await self.__has_commit(commit_hash):
+            # Commits not reachable from a branch (e.g. from a PR ref) can still be requested directly.
+            await self.__git(git_dir + ["fetch", "--no-tags", fetch_url, commit_hash], auth=True)
+
+        return False
+
+    async def __checkout_worktree(self, dest_path : str, commit_hash : str, sparse : SparseCheckout):
+        await self.__git(["--git-dir", str(self.__mirror_path), "worktree", "add", "--detach", "--force"] + 
+                         (["--no-checkout"] if sparse is not None else []) + [dest_path, commit_hash])
+        self.__worktree = dest_path
+
+        if sparse is not None:
+            await sparse.apply(self.__run_env, dest_path, self.__timeout)
+            await self.__git(["checkout", "-q", "--detach", commit_hash], dest_path)
+
+        gm_path = Path(dest_path) / Path(".gitmodules")
+        if os.path.exists(gm_path) and os.path.isfile(gm_path):
+            try:
+                CloneCache.log().debug(f"{self.__clean_url}: submodules detected.")
+                await self.__git(["submodule", "update", "--init"], dest_path, auth=True)
+            except subprocess.CalledProcessError:
+                CloneCache.log().warning(f"Sub-modules were not initialized properly for repo {self.__clean_url}, scan will not include all git submodules.")
+
+    async def checkout(self, run_env : Dict, git_cmd_stub : List[str], fetch_url : str, commit_hash : str, dest_path : str, 
+                       timeout : float=None, sparse : SparseCheckout=None) -> bool:
+        self.__run_env = run_env
+        self.__git_cmd_stub = git_cmd_stub
+        self.__timeout = timeout
+        self.__entry_path.mkdir(parents=True, exist_ok=True)
+
+        self.__use_fd = await CloneCache._acquire(self.__cache._use_lock_path(self.__key), fcntl.LOCK_SH)
+
+        fetch_fd = await CloneCache._acquire(self.__cache._fetch_lock_path(self.__key), fcntl.LOCK_EX)
+        try:
+            hit = await self.__update_mirror(fetch_url, commit_hash)
+            if hit:
+                MetricsRegistry.increment(CloneCache.METRIC_HITS)
+                CloneCache.log().debug(f"Mirror cache hit for {self.__clean_url}@{commit_hash}")
+            else:
+                MetricsRegistry.increment(CloneCache.METRIC_MISSES)
+                CloneCache.log().debug(f"Mirror cache miss for {self.__clean_url}@{commit_hash}")
+
+            await self.__checkout_worktree(dest_path, commit_hash, sparse)
+        finally:
+            CloneCache._release(fetch_fd)
+
+        # The shared use lock is still held so the mirror can't be evicted while it is measured.
+        await asyncio.to_thread(self.__cache._record_use, self.__entry_path, self.__mirror_path, not hit)
+        await asyncio.to_thread(self.__cache._evict, self.__key)
+
+        return True
+
+    async def release(self):
+        try:
+            if self.__worktree is not None:
+                fetch_fd = await CloneCache._acquire(self.__cache._fetch_lock_path(self.__key), fcntl.LOCK_EX)
+                try:
+                    await self.__git(["--git-dir", str(self.__mirror_path), "worktree", "remove", "--force", self.__worktree])
+                except subprocess.CalledProcessError as ex:
+                    CloneCache.log().warning(f"Worktree {self.__worktree} could not be removed: {ex.stderr}")
+                finally:
+                    CloneCache._release(fetch_fd)
+                    self.__worktree = None
+        finally:
+            CloneCache._release(self.__use_fd)
+            self.__use_fd = None
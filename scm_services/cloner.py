@@ -1,9 +1,13 @@
 import os, tempfile, shutil, shlex, subprocess, asyncio, logging, urllib, base64, re
+from enum import Enum
 from cxoneflow_logging import SecretRegistry
 from pathlib import Path
-from typing import Dict, List, Coroutine
+from typing import Dict, List, Coroutine, Callable, Awaitable
 from api_utils.auth_factories import GithubAppAuthFactory
 from api_utils.auth_factories import EventContext
+from .clone_cache import CloneCache
+from .git_process import GitProcess, HostConcurrency
+from .sparse import SparseCheckout
 
 
 class CloneAuthException(BaseException):
@@ -12,16 +16,23 @@ class CloneAuthException(BaseException):
 class CloneException(BaseException):
     pass
 
+class CloneStrategy(Enum):
+    FULL = "full"
+    SHALLOW = "shallow"
+
+
 class CloneWorker:
 
     __stderr_auth_fail = re.compile(".*Invalid username or password.*")
     __auth_fail_exit_code = 128
 
-    def __init__(self, clone_thread : Coroutine, temp_dir_obj : tempfile.TemporaryDirectory, clone_dest_path : str):
+    def __init__(self, clone_thread : Coroutine, temp_dir_obj : tempfile.TemporaryDirectory, clone_dest_path : str, 
+                 on_exit : Callable[[], Awaitable]=None):
         self.__log = logging.getLogger(f"CloneWorker:{clone_dest_path}")
         self.__clone_out_tempdir = clone_dest_path
         self.__temp_dir_object = temp_dir_obj
         self.__clone_thread = clone_thread
+        self.__on_exit = on_exit
 
     async def loc(self) -> str:
         try:
@@ -44,6 +55,9 @@ class CloneWorker:
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
+        if self.__on_exit is not None:
+            await self.__on_exit()
+
         if self.__temp_dir_object is not None:
             self.__log.debug(f"Cleanup: {self.__clone_out_tempdir}")
             self.__temp_dir_object.cleanup()
@@ -61,6 +75,57 @@ class Cloner:
             "GIT_SSL_NO_VERIFY" : str(ssl_no_verify).lower(),
             "GIT_TERMINAL_PROMPT" : "0",
             "GIT_ASKPASS" : "false"}
+        self.__clone_cache = None
+        self.__clone_strategy = CloneStrategy.FULL
+        self.__git_timeout = None
+        self.__max_concurrent = None
+        self.__sparse_enabled = False
+
+    def __getstate__(self):
+        # The clone cache is local to the host that configured it.
+        state = dict(self.__dict__)
+        state['_Cloner__clone_cache'] = None
+        return state
+
+    @property
+    def clone_cache(self) -> CloneCache:
+        return self.__clone_cache
+
+    @clone_cache.setter
+    def clone_cache(self, value : CloneCache):
+        self.__clone_cache = value
+
+    @property
+    def clone_strategy(self) -> CloneStrategy:
+        return self.__clone_strategy
+
+    @clone_strategy.setter
+    def clone_strategy(self, value : CloneStrategy):
+        self.__clone_strategy = value
+
+    @property
+    def git_timeout_seconds(self) -> float:
+        return self.__git_timeout
+
+    @git_timeout_seconds.setter
+    def git_timeout_seconds(self, value : float):
+        self.__git_timeout = value
+
+    @property
+    def sparse_checkout_enabled(self) -> bool:
+        return self.__sparse_enabled
+
+    @sparse_checkout_enabled.setter
+    def sparse_checkout_enabled(self, value : bool):
+        self.__sparse_enabled = value
+
+    @property
+    def max_concurrent_per_host(self) -> int:
+        return self.__max_concurrent
+
+    @max_concurrent_per_host.setter
+    def max_concurrent_per_host(self, value : int):
+        self.__max_concurrent = value
 
     @property
     def __running_env(self):
@@ -158,52 +223,110 @@ class Cloner:
     
 
     @staticmethod
-    def do_clone(run_env : Dict, git_cmd_stub : List[str], clone_url : str, clone_output_loc : str) -> bool:
+    async def __run_git(run_env : Dict, cmd : List[str], cwd : str=None, timeout : float=None) -> subprocess.CompletedProcess:
+        return await GitProcess.run(cmd, run_env, cwd, timeout)
 
-        def run(cmd, cwd=None):
-            Cloner.log().debug(f"Executing: {cmd}")
-            result = subprocess.run(cmd, capture_output=True, env=run_env, check=True, cwd=cwd)
-            Cloner.log().debug(f"git task return code [{result.returncode}] stdout: [{result.stdout}] stderr: [{result.stderr}]")
-            return result
+    @staticmethod
+    async def __update_submodules(run_env : Dict, git_cmd_stub : List[str], clone_url : str, clone_output_loc : str, 
+                                  shallow : bool=False, timeout : float=None):
+        try:
+            gm_path = Path(clone_output_loc) / Path(".gitmodules")
+            if os.path.exists(gm_path) and os.path.isfile(gm_path):
+                Cloner.log().debug(f"{clone_url}: submodules detected.")
+                await Cloner.__run_git(run_env, git_cmd_stub + ["submodule", "init"], clone_output_loc, timeout)
+                await Cloner.__run_git(run_env, git_cmd_stub + ["submodule", "update"] + (["--depth", "1"] if shallow else []), 
+                                       clone_output_loc, timeout)
+        except subprocess.CalledProcessError:
+            Cloner.log().warning(f"Sub-modules were not initialized properly for repo {clone_url}, scan will not include all git submodules.")
+
+    @staticmethod
+    async def do_clone(run_env : Dict, git_cmd_stub : List[str], clone_url : str, clone_output_loc : str, 
+                       commit_hash : str=None, timeout : float=None, sparse : SparseCheckout=None) -> bool:
 
+        if commit_hash is None:
+            sparse = None
 
-        clone_result = run(git_cmd_stub + ["clone", clone_url, clone_output_loc])
+        clone_result = await Cloner.__run_git(run_env, git_cmd_stub + ["clone"] + (["--no-checkout"] if sparse is not None else []) + 
+                                              [clone_url, clone_output_loc], timeout=timeout)
 
         if clone_result.returncode == 0:
-            try:
-                gm_path = Path(clone_output_loc) / Path(".gitmodules")
-                if os.path.exists(gm_path) and os.path.isfile(gm_path):
-                    Cloner.log().debug(f"{clone_url}: submodules detected.")
-                    run(git_cmd_stub + ["submodule", "init"], clone_output_loc)
-                    run(git_cmd_stub + ["submodule", "update"], clone_output_loc)
-            except subprocess.CalledProcessError:
-                Cloner.log().warning(f"Sub-modules were not initialized properly for repo {clone_url}, scan will not include all git submodules.")
+            if sparse is not None:
+                await sparse.apply(run_env, clone_output_loc, timeout)
+                await Cloner.__run_git(run_env, ["git", "checkout", "-q", "--detach", commit_hash], clone_output_loc, timeout)
+            elif commit_hash is not None:
+                await Cloner.__run_git(run_env, ["git", "reset", "--hard", commit_hash], clone_output_loc, timeout)
+
+            await Cloner.__update_submodules(run_env, git_cmd_stub, clone_url, clone_output_loc, timeout=timeout)
 
         return True
 
+    @staticmethod
+    async def do_shallow_fetch(run_env : Dict, git_cmd_stub : List[str], clone_url : str, clone_output_loc : str, 
+                               commit_hash : str, timeout : float=None, sparse : SparseCheckout=None) -> bool:
+        """Fetches only the tree for a single commit, falling back to a full clone if the server can't serve it."""
+        try:
+            Path(clone_output_loc).mkdir(parents=True, exist_ok=True)
+            await Cloner.__run_git(run_env, ["git", "init", "-q", clone_output_loc])
+            await Cloner.__run_git(run_env, ["git", "remote", "add", "origin", clone_url], clone_output_loc)
+            try:
+                # Blobs are fetched on checkout from the promisor remote; servers without filter support ignore the filter.
+                await Cloner.__run_git(run_env, git_cmd_stub + ["fetch", "--depth", "1", "--no-tags", "--filter=blob:none", 
+                                                                "origin", commit_hash], clone_output_loc, timeout)
+                if sparse is not None:
+                    # With the blob filter, only blobs matching the sparse patterns are downloaded on checkout.
+                    await sparse.apply(run_env, clone_output_loc, timeout)
+                await Cloner.__run_git(run_env, git_cmd_stub + ["checkout", "-q", "--detach", "FETCH_HEAD"], clone_output_loc, timeout)
+                await Cloner.__update_submodules(run_env, git_cmd_stub, clone_url, clone_output_loc, True, timeout)
+            finally:
+                # Credentials may be part of the remote URL.
+                await Cloner.__run_git(run_env, ["git", "remote", "remove", "origin"], clone_output_loc)
+
+            return True
+        except subprocess.CalledProcessError as ex:
+            Cloner.log().warning(f"Single commit fetch of {commit_hash} failed, falling back to a full clone: " + 
+                                 f"{ex.stderr.decode('UTF-8') if ex.stderr is not None else ex}")
+            shutil.rmtree(clone_output_loc, ignore_errors=True)
+            return await Cloner.do_clone(run_env, git_cmd_stub, clone_url, clone_output_loc, commit_hash, timeout, sparse)
+
+    async def __host_limited(self, clone_url : str, coro : Coroutine) -> bool:
+        async with HostConcurrency.limit(clone_url, self.__max_concurrent):
+            return await coro
+
+    async def checkout(self, clone_url : str, commit_hash : str, event_context : EventContext=None, force_reauth : bool=False, 
+                       temp_root : str=None, make_temp : bool=True, clone_cache : CloneCache=None, 
+                       sparse : SparseCheckout=None) -> CloneWorker:
+        """Obtains the working tree for a single commit, using the mirror cache when one is available.
+        
+        The mirror cache takes precedence over the configured clone strategy.  If sparse checkout patterns
+        are provided, only the matching files are written to the working tree."""
+        cache = clone_cache if clone_cache is not None else self.__clone_cache
 
-    async def clone(self, clone_url, event_context : EventContext=None, force_reauth : bool=False, temp_root : str=None, make_temp : bool=True) -> CloneWorker:
-        Cloner.log().debug(f"Clone Execution for: {clone_url}")
+        Cloner.log().debug(f"Checkout Execution for: {clone_url}@{commit_hash} (cached: {cache is not None})")
 
         fixed_clone_url = await self._fix_clone_url(clone_url, event_context, force_reauth)
         temp_dir_object = tempfile.TemporaryDirectory(delete=False, prefix=temp_root) if make_temp else None
-        clone_output_loc = temp_dir_object.name if make_temp else temp_root
-        
-        thread = asyncio.to_thread(Cloner.do_clone, run_env=dict(self.__running_env), git_cmd_stub=list(self.__git_cmd_stub), 
-                                   clone_url=fixed_clone_url, clone_output_loc=clone_output_loc)
-        
-        return CloneWorker(thread, temp_dir_object, clone_output_loc)
+        checkout_loc = temp_dir_object.name if make_temp else temp_root
+
+        if cache is None:
+            checkout_coro = (Cloner.do_shallow_fetch if self.__clone_strategy == CloneStrategy.SHALLOW else Cloner.do_clone)(
+                                       run_env=dict(self.__running_env), git_cmd_stub=list(self.__git_cmd_stub), 
+                                       clone_url=fixed_clone_url, clone_output_loc=checkout_loc, commit_hash=commit_hash,
+                                       timeout=self.__git_timeout, sparse=sparse)
+            return CloneWorker(self.__host_limited(clone_url, checkout_coro), temp_dir_object, checkout_loc)
+        else:
+            lease = cache.lease(clone_url)
+            checkout_coro = lease.checkout(dict(self.__running_env), list(self.__git_cmd_stub), fixed_clone_url, commit_hash, 
+                                           checkout_loc, self.__git_timeout, sparse)
+            return CloneWorker(self.__host_limited(clone_url, checkout_coro), temp_dir_object, checkout_loc, lease.release)
 
-    async def reset_head(self, code_path, hash):
+    async def tree_hash(self, code_path : str) -> str:
+        """Returns the git tree hash of the checked out commit or None if it can't be determined."""
         try:
-            result = await (asyncio.to_thread(subprocess.run, ["git", "reset", "--hard", hash], \
-                                capture_output=True, env=self.__running_env, check=True, cwd=code_path))
-            
-            self.log().debug(f"Reset task: return code [{result.returncode}] stdout: [{result.stdout}] stderr: [{result.stderr}]")
-
+            result = await GitProcess.run(["git", "rev-parse", "HEAD^{tree}"], self.__running_env, code_path, self.__git_timeout)
+            return result.stdout.decode("UTF-8").strip()
         except subprocess.CalledProcessError as ex:
-            self.log().error(f"{ex} stdout: [{ex.stdout.decode('UTF-8')}] stderr: [{ex.stderr.decode('UTF-8')})]")
-            raise
+            self.log().warning(f"Tree hash could not be determined for {code_path}: {ex.stderr}")
+            return None
 
 class BasicAuthWithCredsInUrl(Cloner):
     def __init__(self, username : str, password : str, ssl_no_verify : bool):
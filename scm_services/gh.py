@@ -1,21 +1,132 @@
 from .scm import SCMService
 from api_utils.auth_factories import EventContext
-from api_utils.pagers import async_api_page_generator
+from api_utils.pagers import async_api_page_generator, link_header_page_count
 from api_utils import form_url
 from requests import Response
 from workflows.pr import PullRequestDecoration
 from cxone_api.util import json_on_ok
+from cxoneflow_metrics import MetricsRegistry
+from dataclasses import dataclass
+from contextlib import aclosing
+from typing import List
+from urllib.parse import urlparse
 import json
 
+
+@dataclass(frozen=True)
+class GithubRepoMetadata:
+    default_branch : str
+    # None when the protection rules could not be read completely in one query.
+    protected_branches : List[str]
+    # None when the PR was not requested or its comments could not be read completely in one query.
+    pr_comments_complete : bool
+    pr_comment_id : int
+
+
 class GHService(SCMService):
     __max_content_chars = 65535
     __api_page_max = 100
 
+    METRIC_GRAPHQL_QUERIES = "github_graphql.queries"
+    METRIC_GRAPHQL_FALLBACKS = "github_graphql.fallbacks"
+
+    __metadata_query = """
+query($owner : String!, $name : String!, $pr : Int!, $withPr : Boolean!, $withRules : Boolean!) {
+  repository(owner : $owner, name : $name) {
+    defaultBranchRef { name }
+    branchProtectionRules(first : 100) @include(if : $withRules) {
+      pageInfo { hasNextPage }
+      nodes { matchingRefs(first : 100) { pageInfo { hasNextPage } nodes { name } } }
+    }
+    pullRequest(number : $pr) @include(if : $withPr) {
+      comments(first : 100) { pageInfo { hasNextPage } nodes { databaseId body } }
+    }
+  }
+}"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.__graphql_enabled = False
+
+    @property
+    def graphql_enabled(self) -> bool:
+        return self.__graphql_enabled
+
+    @graphql_enabled.setter
+    def graphql_enabled(self, value : bool):
+        self.__graphql_enabled = value
+
+    @property
+    def __graphql_url(self) -> str:
+        # GitHub Enterprise Server serves GraphQL at /api/graphql rather than under the /api/v3 REST prefix.
+        endpoint = self._api_endpoint.rstrip("/")
+        if urlparse(endpoint).path.endswith("/api/v3"):
+            endpoint = endpoint[:-len("/v3")]
+        return f"{endpoint}/graphql"
+
+    @staticmethod
+    def __protected_branches(rules : dict) -> List[str]:
+        if rules is None or rules['pageInfo']['hasNextPage']:
+            return None
+
+        branches = []
+        for rule in rules['nodes']:
+            if rule['matchingRefs']['pageInfo']['hasNextPage']:
+                return None
+            branches += [ref['name'] for ref in rule['matchingRefs']['nodes'] if ref['name'] not in branches]
+
+        # Branches protected only by repository rulesets are not matched by protection rules, so an empty
+        # result is not trusted.
+        return branches if len(branches) > 0 else None
+
+    async def fetch_repo_metadata(self, organization : str, repo_slug : str, pr_number : str, 
+                                  event_context : EventContext, with_protected_branches : bool=True) -> GithubRepoMetadata:
+        """Reads the default branch, protected branches and, if a PR number is given, the PR comment 
+        left by a previous decoration with one GraphQL query.
+
+        Returns None if GraphQL is not enabled or the query fails, in which case the REST API should be used.
+        """
+        if not self.__graphql_enabled:
+            return None
+
+        variables = {"owner" : organization, "name" : repo_slug, "pr" : int(pr_number) if pr_number is not None else 0,
+                     "withPr" : pr_number is not None, "withRules" : with_protected_branches}
+
+        MetricsRegistry.increment(GHService.METRIC_GRAPHQL_QUERIES)
+        try:
+            resp = await self.exec("POST", self.__graphql_url, body=json.dumps({"query" : GHService.__metadata_query, "variables" : variables}),
+                                   event_context=event_context)
+            result = json_on_ok(resp)
+
+            if result.get('errors', None) is not None or result.get('data', {}).get('repository', None) is None:
+                raise ValueError(result.get('errors', None))
+
+            repo = result['data']['repository']
+
+            pr_comments_complete = False
+            pr_comment_id = None
+            pr = repo.get('pullRequest', None)
+            if pr is not None:
+                for comment in pr['comments']['nodes']:
+                    if comment.get('body', None) is not None and PullRequestDecoration.matches_identifier(comment['body']):
+                        pr_comment_id = comment['databaseId']
+                        break
+                pr_comments_complete = pr_comment_id is not None or not pr['comments']['pageInfo']['hasNextPage']
+
+            return GithubRepoMetadata(
+                repo['defaultBranchRef']['name'] if repo.get('defaultBranchRef', None) is not None else None,
+                GHService.__protected_branches(repo.get('branchProtectionRules', None)),
+                pr_comments_complete, pr_comment_id)
+        except Exception as ex:
+            MetricsRegistry.increment(GHService.METRIC_GRAPHQL_FALLBACKS)
+            GHService.log().warning(f"GraphQL query for {organization}/{repo_slug} failed, using the REST API: {ex}")
+            return None
+
 
     def __comment_data_extractor(self, resp : Response):
         if resp.ok:
             json = resp.json()
-            return json, len(json) >= GHService.__api_page_max
+            return json, len(json) < GHService.__api_page_max
         return None
 
     def __comment_list_args_gen(self, path : str, event_context : EventContext, offset : int):
@@ -33,13 +144,20 @@ class GHService(SCMService):
 
         target_id = None
 
-        async for comment in async_api_page_generator(self.exec, self.__comment_data_extractor,
-            lambda offset: self.__comment_list_args_gen(f"/repos/{organization}/{repo_slug}/issues/{pr_number}/comments", event_context, offset)):
-            if 'id' in comment.keys() and 'body' in comment.keys():
-                comment_id = comment['id']
-                if PullRequestDecoration.matches_identifier(comment['body']):
-                    target_id = comment_id
-                    break
+        metadata = await self.fetch_repo_metadata(organization, repo_slug, pr_number, event_context, False)
+        if metadata is not None and metadata.pr_comments_complete:
+            target_id = metadata.pr_comment_id
+        else:
+            # Closed when the comment is found so pages still being prefetched are cancelled.
+            async with aclosing(async_api_page_generator(self.exec, self.__comment_data_extractor,
+                lambda offset: self.__comment_list_args_gen(f"/repos/{organization}/{repo_slug}/issues/{pr_number}/comments", event_context, offset),
+                link_header_page_count)) as comments:
+                async for comment in comments:
+                    if 'id' in comment.keys() and 'body' in comment.keys():
+                        comment_id = comment['id']
+                        if PullRequestDecoration.matches_identifier(comment['body']):
+                            target_id = comment_id
+                            break
 
         if target_id is None:
             resp = json_on_ok(await self.exec("POST", f"/repos/{organization}/{repo_slug}/issues/{pr_number}/comments", 
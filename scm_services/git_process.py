@@ -0,0 +1,110 @@
+import asyncio, logging, subprocess, urllib.parse, weakref
+from threading import Lock
+from contextlib import asynccontextmanager
+from typing import Dict, List
+
+
+class GitProcess:
+    """Runs git as an asyncio subprocess so git work does not occupy threads in the default executor."""
+
+    __read_chunk_size = 64 * 1024
+
+    @classmethod
+    def log(clazz) -> logging.Logger:
+        return logging.getLogger(clazz.__name__)
+
+    @staticmethod
+    async def __drain(stream : asyncio.StreamReader, name : str, pid : int, sink : bytearray):
+        while True:
+            chunk = await stream.read(GitProcess.__read_chunk_size)
+            if not chunk:
+                break
+            sink.extend(chunk)
+            GitProcess.log().debug(f"[{pid}:{name}] {chunk}")
+
+    @staticmethod
+    async def __kill(proc : asyncio.subprocess.Process):
+        if proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+
+    @staticmethod
+    async def run(cmd : List[str], env : Dict=None, cwd : str=None, timeout : float=None, check : bool=True) -> subprocess.CompletedProcess:
+        """Executes the command while streaming output to the debug log.
+
+        Raises subprocess.CalledProcessError on a non-zero exit if check is True and subprocess.TimeoutExpired
+        if the timeout elapses.  The process is killed on timeout or cancellation."""
+        GitProcess.log().debug(f"Executing: {cmd}")
+
+        proc = await asyncio.create_subprocess_exec(*cmd, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE,
+                                                    stderr=asyncio.subprocess.PIPE, env=env, cwd=cwd)
+        stdout = bytearray()
+        stderr = bytearray()
+
+        try:
+            await asyncio.wait_for(asyncio.gather(GitProcess.__drain(proc.stdout, "stdout", proc.pid, stdout),
+                                                  GitProcess.__drain(proc.stderr, "stderr", proc.pid, stderr),
+                                                  proc.wait()), timeout)
+        except asyncio.TimeoutError:
+            await GitProcess.__kill(proc)
+            GitProcess.log().error(f"git process {proc.pid} killed after exceeding the timeout of {timeout} seconds.")
+            raise subprocess.TimeoutExpired(cmd, timeout, bytes(stdout), bytes(stderr))
+        except BaseException:
+            await GitProcess.__kill(proc)
+            raise
+
+        GitProcess.log().debug(f"git task return code [{proc.returncode}]")
+
+        if check and proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd, bytes(stdout), bytes(stderr))
+
+        return subprocess.CompletedProcess(cmd, proc.returncode, bytes(stdout), bytes(stderr))
+
+
+class HostConcurrency:
+    """Limits the number of concurrent git network operations per SCM host.
+
+    Operations share a limit when they target the same host with the same configured limit, so services
+    configured with different limits for a host are each held to their own limit.  Limits are tracked per
+    event loop and are discarded when the loop is garbage collected.
+    """
+
+    __semaphores = weakref.WeakKeyDictionary()
+    __lock = Lock()
+
+    @classmethod
+    def log(clazz) -> logging.Logger:
+        return logging.getLogger(clazz.__name__)
+
+    @staticmethod
+    def host_of(clone_url : str) -> str:
+        split = urllib.parse.urlsplit(clone_url)
+        if split.hostname is not None:
+            return split.hostname.lower()
+        # scp-like ssh syntax: user@host:path
+        return clone_url.split("@")[-1].split(":")[0].lower()
+
+    @staticmethod
+    def __semaphore_for(host : str, limit : int) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with HostConcurrency.__lock:
+            loop_semaphores = HostConcurrency.__semaphores.setdefault(loop, {})
+            if (host, limit) not in loop_semaphores.keys():
+                loop_semaphores[(host, limit)] = asyncio.Semaphore(limit)
+            return loop_semaphores[(host, limit)]
+
+    @staticmethod
+    @asynccontextmanager
+    async def limit(clone_url : str, limit : int):
+        if limit is None or limit <= 0:
+            yield
+        else:
+            host = HostConcurrency.host_of(clone_url)
+            sem = HostConcurrency.__semaphore_for(host, limit)
+            if sem.locked():
+                HostConcurrency.log().debug(f"Waiting for a git concurrency slot for {host}")
+            async with sem:
+                yield
@@ -0,0 +1,123 @@
+import asyncio, time, logging
+from collections import OrderedDict
+from threading import Lock
+from typing import Awaitable, Callable, Hashable, List
+from cxoneflow_metrics import MetricsRegistry
+
+
+class ProtectedBranchCache:
+    """A bounded, TTL-expiring cache of the protected branches of each repository.
+
+    Concurrent misses for the same key on the same event loop share a single load.  With background
+    refresh enabled, an expired entry is returned immediately while it is reloaded in the background;
+    entries older than twice the TTL are always reloaded before they are returned.  A load that is
+    in flight when its key is invalidated does not populate the cache.
+    """
+
+    METRIC_HITS = "protected_branch_cache.hits"
+    METRIC_MISSES = "protected_branch_cache.misses"
+    METRIC_STALE = "protected_branch_cache.stale"
+    METRIC_INVALIDATIONS = "protected_branch_cache.invalidations"
+
+    DEFAULT_TTL_SECONDS = 300
+    DEFAULT_MAX_ENTRIES = 5000
+
+    @classmethod
+    def log(clazz) -> logging.Logger:
+        return logging.getLogger(clazz.__name__)
+
+    def __init__(self, ttl_seconds : int=DEFAULT_TTL_SECONDS, max_entries : int=DEFAULT_MAX_ENTRIES, background_refresh : bool=False):
+        self.__ttl = ttl_seconds
+        self.__max_entries = max_entries
+        self.__background_refresh = background_refresh
+        self.__entries = OrderedDict()
+        self.__loads = {}
+        self.__lock = Lock()
+
+    @property
+    def ttl_seconds(self) -> int:
+        return self.__ttl
+
+    @property
+    def max_entries(self) -> int:
+        return self.__max_entries
+
+    @property
+    def background_refresh(self) -> bool:
+        return self.__background_refresh
+
+    def __lookup(self, key : Hashable):
+        with self.__lock:
+            entry = self.__entries.get(key, None)
+            if entry is not None:
+                self.__entries.move_to_end(key)
+            return entry
+
+    async def __load(self, key : Hashable, loader : Callable[[], Awaitable[List[str]]]) -> List[str]:
+        task = asyncio.current_task()
+        try:
+            branches = list(await loader())
+        except BaseException:
+            with self.__lock:
+                if self.__loads.get(key, None) is task:
+                    del self.__loads[key]
+            raise
+
+        with self.__lock:
+            if self.__loads.get(key, None) is task:
+                del self.__loads[key]
+                self.__entries[key] = (branches, time.monotonic())
+                self.__entries.move_to_end(key)
+                while len(self.__entries) > self.__max_entries:
+                    self.__entries.popitem(last=False)
+
+        return branches
+
+    def __start_load(self, key : Hashable, loader : Callable[[], Awaitable[List[str]]]) -> asyncio.Task:
+        loop = asyncio.get_running_loop()
+
+        with self.__lock:
+            task = self.__loads.get(key, None)
+            if task is not None and not task.done() and task.get_loop() is loop:
+                ProtectedBranchCache.log().debug(f"Joining in-flight protected branch load for {key}")
+                return task
+
+            task = loop.create_task(self.__load(key, loader))
+            self.__loads[key] = task
+            return task
+
+    @staticmethod
+    def __log_refresh_failure(key : Hashable, task : asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            ProtectedBranchCache.log().warning(f"Background refresh of protected branches for {key} failed: {task.exception()}")
+
+    async def get(self, key : Hashable, loader : Callable[[], Awaitable[List[str]]]) -> List[str]:
+        """Returns a copy of the cached branches for the key, calling the loader if the entry is missing or expired."""
+        entry = self.__lookup(key)
+
+        if entry is not None:
+            branches, loaded = entry
+            age = time.monotonic() - loaded
+
+            if age < self.__ttl:
+                MetricsRegistry.increment(ProtectedBranchCache.METRIC_HITS)
+                return list(branches)
+
+            if self.__background_refresh and age < self.__ttl * 2:
+                MetricsRegistry.increment(ProtectedBranchCache.METRIC_STALE)
+                self.__start_load(key, loader).add_done_callback(lambda t: ProtectedBranchCache.__log_refresh_failure(key, t))
+                return list(branches)
+
+        MetricsRegistry.increment(ProtectedBranchCache.METRIC_MISSES)
+
+        # Shielded so one requester's cancellation does not cancel a load other requesters are waiting on.
+        return list(await asyncio.shield(self.__start_load(key, loader)))
+
+    def invalidate(self, key : Hashable):
+        with self.__lock:
+            removed = self.__entries.pop(key, None) is not None
+            self.__loads.pop(key, None)
+
+        if removed:
+            MetricsRegistry.increment(ProtectedBranchCache.METRIC_INVALIDATIONS)
+            ProtectedBranchCache.log().debug(f"Invalidated protected branches for {key}")
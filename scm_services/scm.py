@@ -1,7 +1,8 @@
 import logging
 from api_utils.apisession import APISession
 from scm_services.cloner import Cloner
-from typing import Dict, Any, final
+from scm_services.protected_branch_cache import ProtectedBranchCache
+from typing import Dict, Any, List, Tuple, Callable, Awaitable, final
 from requests import Response
 from api_utils.auth_factories import EventContext
 
@@ -18,6 +19,10 @@ class BasicSCMService:
                    extra_headers : Dict=None, event_context : EventContext=None, url_vars : Dict = None) -> Response:
         return await self.__session.exec(event_context, method, path, query, body, extra_headers, url_vars)
 
+    @property
+    def _api_endpoint(self) -> str:
+        return self.__session.api_endpoint
+
     def _form_url(self, url_path, anchor=None, **kwargs):
         return self.__session._form_url(url_path, anchor, **kwargs)
 
@@ -29,6 +34,13 @@ class SCMService(BasicSCMService):
         self.__cloner = cloner
         self.__moniker = moniker
         self.__display_url = display_url
+        self.__protected_branch_cache = None
+
+    def __getstate__(self):
+        # The protected branch cache is local to the process that configured it.
+        state = dict(self.__dict__)
+        state['_SCMService__protected_branch_cache'] = None
+        return state
 
     @property
     def display_url(self) -> str:
@@ -46,6 +58,23 @@ class SCMService(BasicSCMService):
     def shared_secret(self) -> str:
         return self.__shared_secret
 
+    @property
+    def protected_branch_cache(self) -> ProtectedBranchCache:
+        return self.__protected_branch_cache
+
+    @protected_branch_cache.setter
+    def protected_branch_cache(self, value : ProtectedBranchCache):
+        self.__protected_branch_cache = value
+
+    async def cached_protected_branches(self, repo_key : Tuple, loader : Callable[[], Awaitable[List[str]]]) -> List[str]:
+        if self.__protected_branch_cache is None:
+            return list(await loader())
+        return await self.__protected_branch_cache.get((self.moniker,) + repo_key, loader)
+
+    def invalidate_protected_branches(self, repo_key : Tuple):
+        if self.__protected_branch_cache is not None:
+            self.__protected_branch_cache.invalidate((self.moniker,) + repo_key)
+
     async def exec_pr_decorate(self, organization : str, project : str, repo_slug : str, pr_number : str, scanid : str, full_markdown : str, 
         summary_markdown : str, event_context : EventContext):
         raise NotImplementedError("exec_pr_decorate")
@@ -0,0 +1,114 @@
+import re, logging, subprocess
+from typing import Dict, List, Union
+from .git_process import GitProcess
+
+
+class SparseCheckout:
+    """Git sparse-checkout patterns derived from CxOne per-engine file filters.
+
+    CxOne filters are comma separated globs where a leading "!" marks an exclusion.  A path
+    is only left out of the checkout when every engine would exclude it, so only exclusions
+    common to all engines are used.  Cone mode is used when every engine selects content
+    only by including whole directories.
+    """
+
+    __dir_include = re.compile("^[^*?\\[\\]!]+?(/\\*\\*)?/?$")
+
+    def __init__(self, cone : bool, patterns : List[str]):
+        self.__cone = cone
+        self.__patterns = patterns
+
+    @property
+    def cone(self) -> bool:
+        return self.__cone
+
+    @property
+    def patterns(self) -> List[str]:
+        return list(self.__patterns)
+
+    @property
+    def key(self) -> tuple:
+        return (self.__cone,) + tuple(self.__patterns)
+
+    @classmethod
+    def log(clazz) -> logging.Logger:
+        return logging.getLogger(clazz.__name__)
+
+    def set_args(self) -> List[str]:
+        return ["sparse-checkout", "set", "--cone" if self.__cone else "--no-cone", "--"] + self.__patterns
+
+    async def apply(self, run_env : Dict, worktree_path : str, timeout : float=None) -> bool:
+        """Configures the sparse patterns in a worktree that has not been checked out yet."""
+        try:
+            await GitProcess.run(["git"] + self.set_args(), run_env, worktree_path, timeout)
+            return True
+        except subprocess.CalledProcessError as ex:
+            SparseCheckout.log().warning(f"Sparse checkout could not be configured, checking out all files: {ex.stderr}")
+            try:
+                await GitProcess.run(["git", "sparse-checkout", "disable"], run_env, worktree_path, timeout)
+            except subprocess.CalledProcessError:
+                pass
+            return False
+
+    def __repr__(self):
+        return f"SparseCheckout(cone={self.__cone}, patterns={self.__patterns})"
+
+    @staticmethod
+    def split_filter(filter_str : str) -> tuple:
+        includes = []
+        excludes = []
+
+        if filter_str is not None:
+            for raw in filter_str.split(","):
+                entry = raw.strip()
+                if len(entry) == 0:
+                    continue
+                if entry.startswith("!"):
+                    entry = entry[1:].strip()
+                    if len(entry) > 0:
+                        excludes.append(SparseCheckout.__normalize(entry))
+                else:
+                    includes.append(SparseCheckout.__normalize(entry))
+
+        return includes, excludes
+
+    @staticmethod
+    def __normalize(pattern : str) -> str:
+        normalized = pattern.replace("\\", "/")
+        return normalized[2:] if normalized.startswith("./") else normalized
+
+    @staticmethod
+    def __as_sparse_exclude(pattern : str) -> str:
+        # Patterns without a path separator match at any depth in git but are anchored
+        # to the root here so that nothing is left out that the engines might scan.
+        return f"!{pattern}" if "/" in pattern.rstrip("/") else f"!/{pattern}"
+
+    @staticmethod
+    def __cone_dir(pattern : str) -> Union[str, None]:
+        if not SparseCheckout.__dir_include.match(pattern):
+            return None
+        stripped = pattern.removesuffix("/**").strip("/")
+        return stripped if len(stripped) > 0 else None
+
+    @staticmethod
+    def from_filters(engine_filters : Dict[str, str]):
+        """Returns None when the filters can't reduce the checkout."""
+        if engine_filters is None or len(engine_filters) == 0:
+            return None
+
+        split = {engine : SparseCheckout.split_filter(engine_filters[engine]) for engine in engine_filters.keys()}
+
+        # Cone mode: every engine only includes directories and excludes nothing.
+        if all([len(inc) > 0 and len(exc) == 0 for inc, exc in split.values()]):
+            cone_dirs = [SparseCheckout.__cone_dir(x) for inc, _ in split.values() for x in inc]
+            if None not in cone_dirs:
+                return SparseCheckout(True, sorted(set(cone_dirs)))
+
+        common_excludes = None
+        for _, exc in split.values():
+            common_excludes = set(exc) if common_excludes is None else common_excludes & set(exc)
+
+        if common_excludes is None or len(common_excludes) == 0:
+            return None
+
+        return SparseCheckout(False, ["/*"] + [SparseCheckout.__as_sparse_exclude(x) for x in sorted(common_excludes)])
@@ -6,6 +6,7 @@ from workflows.pr_feedback_service import PRFeedbackService
 from workflows.push_feedback_service import PushFeedbackService
 from workflows.scan_polling_service import ScanPollingService
 from workflows.resolver_scan_service import ResolverScanService
+from workflows.ingestion_service import IngestionService
 from kickoff_services import KickoffService
 from naming_services import ProjectNamingService
 
@@ -20,5 +21,6 @@ class CxOneFlowServices:
     resolver : ResolverScanService
     kickoff : KickoffService
     naming : ProjectNamingService
+    ingest : IngestionService
 
 
@@ -1,18 +1,58 @@
-import asyncio, logging, time
-from threading import Thread, Lock
+import asyncio, logging, time, heapq, itertools
+from concurrent.futures import Future, InvalidStateError
+from collections import OrderedDict
+from enum import IntEnum
+from threading import Thread, RLock
 from traceback import TracebackException
+from cxoneflow_metrics import MetricsRegistry
+
+
+class TaskPriority(IntEnum):
+    """Admission priority for queued tasks; lower values are started first."""
+    KICKOFF = 0
+    PULL_REQUEST = 1
+    PUSH = 2
 
 
 class TaskManager:
-    __monitor_lock = Lock()
-    __monitored = []
+    class QueueFullException(Exception):
+        def __init__(self, retry_after : int):
+            Exception.__init__(self, f"Task queue is full, retry after {retry_after} seconds.")
+            self.retry_after = retry_after
+
+    DEFAULT_MAX_IN_FLIGHT = 32
+    DEFAULT_MAX_QUEUED = 256
+
+    METRIC_IN_FLIGHT = "task_manager.in_flight"
+    METRIC_QUEUED = "task_manager.queued"
+    METRIC_OLDEST_IN_FLIGHT_AGE = "task_manager.oldest_in_flight_age_seconds"
+    METRIC_OLDEST_QUEUED_AGE = "task_manager.oldest_queued_age_seconds"
+    METRIC_REJECTED = "task_manager.rejected"
+
+    __min_retry_after = 1
+    __max_retry_after = 600
+    __default_retry_after = 30
+    __duration_weight = 0.2
+
+    __monitor_lock = RLock()
     __bgloop = None
     __thread = None
 
+    __max_in_flight = DEFAULT_MAX_IN_FLIGHT
+    __max_queued = DEFAULT_MAX_QUEUED
+
+    # Handles are kept in insertion order so the oldest entry is always first.
+    __running = OrderedDict()
+    __tasks = {}
+    __queued = OrderedDict()
+    __queue_order = []
+    __sequence = itertools.count()
+    __avg_duration = None
+
     @staticmethod
     def log():
         return logging.getLogger("TaskManager")
-    
+
     @staticmethod
     def __thread_proc():
         asyncio.set_event_loop(TaskManager.__bgloop)
@@ -23,7 +63,19 @@ class TaskManager:
         TaskManager.__bgloop = asyncio.new_event_loop()
         TaskManager.__thread = Thread(target=TaskManager.__thread_proc, daemon=True)
         TaskManager.__thread.start()
-   
+
+
+    @staticmethod
+    def attach():
+        """Runs background tasks on the running event loop rather than a dedicated thread."""
+        TaskManager.__bgloop = asyncio.get_running_loop()
+        TaskManager.__thread = None
+
+    @staticmethod
+    def configure(max_in_flight : int, max_queued : int):
+        with TaskManager.__monitor_lock:
+            TaskManager.__max_in_flight = max_in_flight
+            TaskManager.__max_queued = max_queued
 
     @staticmethod
     def loop():
@@ -34,45 +86,172 @@ class TaskManager:
         TaskManager.__bgloop.stop()
 
     @staticmethod
-    def __callback(future):
-        TaskManager.log().debug(f"Callback for finished future {future}.")
+    def __callback(handle : Future):
+        TaskManager.log().debug(f"Callback for finished future {handle}.")
+        TaskManager.__log_future_result(handle)
+
+        if handle.cancelled():
+            # A cancelled foreground caller cancels the task; the handle stays tracked until the task finishes.
+            with TaskManager.__monitor_lock:
+                task = TaskManager.__tasks.get(handle, None)
+            if task is not None:
+                TaskManager.__bgloop.call_soon_threadsafe(task.cancel)
+
+    @staticmethod
+    def __finished(handle : Future):
         with TaskManager.__monitor_lock:
-            TaskManager.__log_future_result(future)
-            TaskManager.__monitored.remove(future)
+            TaskManager.__tasks.pop(handle, None)
+            started = TaskManager.__running.pop(handle, None)
+            if started is not None:
+                duration = time.monotonic() - started
+                TaskManager.__avg_duration = duration if TaskManager.__avg_duration is None else \
+                    (TaskManager.__duration_weight * duration) + ((1 - TaskManager.__duration_weight) * TaskManager.__avg_duration)
+
+            TaskManager.__start_queued()
+            TaskManager.__update_gauges()
 
     @staticmethod
     def __log_future_result(future):
-        if future.exception() is not None:
+        if future.cancelled():
+            TaskManager.log().debug(f"Future {future} was cancelled.")
+        elif future.exception() is not None:
             TaskManager.log().exception(future.exception())
             TaskManager.log().error("".join(TracebackException.from_exception(future.exception()).format()))
         else:
             if future.result() is not None:
                 TaskManager.log().debug(future.result())
 
+    @staticmethod
+    async def __run(coro, handle : Future):
+        # The handle may have been cancelled by a foreground caller while the task was running.
+        try:
+            result = await coro
+            if not handle.done():
+                handle.set_result(result)
+        except asyncio.CancelledError:
+            handle.cancel()
+        except InvalidStateError:
+            pass
+        except BaseException as ex:
+            if not handle.done():
+                handle.set_exception(ex)
 
     @staticmethod
-    def in_background(coro):
+    def __create_task(coro, handle : Future):
+        # Runs on the background loop; the handle is untracked when the task is done, even if it never started.
         with TaskManager.__monitor_lock:
-            ts = asyncio.run_coroutine_threadsafe(coro, TaskManager.__bgloop)
-            ts.add_done_callback(TaskManager.__callback)
-            TaskManager.__monitored.append(ts)
+            if handle.cancelled():
+                coro.close()
+                task = None
+            else:
+                task = TaskManager.__bgloop.create_task(TaskManager.__run(coro, handle))
+                TaskManager.__tasks[handle] = task
+
+        if task is None:
+            TaskManager.__finished(handle)
+        else:
+            task.add_done_callback(lambda _: TaskManager.__finished(handle))
 
     @staticmethod
-    async def in_foreground(coro):
-        return asyncio.run_coroutine_threadsafe(coro, TaskManager.__bgloop).result()
+    def __start(coro, handle : Future):
+        TaskManager.__running[handle] = time.monotonic()
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is TaskManager.__bgloop:
+            TaskManager.__create_task(coro, handle)
+        else:
+            TaskManager.__bgloop.call_soon_threadsafe(TaskManager.__create_task, coro, handle)
+
+    @staticmethod
+    def __start_queued():
+        while len(TaskManager.__running) < TaskManager.__max_in_flight and len(TaskManager.__queue_order) > 0:
+            _, seq = heapq.heappop(TaskManager.__queue_order)
+            coro, handle, _ = TaskManager.__queued.pop(seq)
+
+            if handle.cancelled():
+                coro.close()
+            else:
+                TaskManager.__start(coro, handle)
+
+    @staticmethod
+    def __retry_after() -> int:
+        if TaskManager.__avg_duration is None:
+            return TaskManager.__default_retry_after
+
+        estimate = TaskManager.__avg_duration * (len(TaskManager.__queued) + 1) / max(1, TaskManager.__max_in_flight)
+        return int(min(TaskManager.__max_retry_after, max(TaskManager.__min_retry_after, estimate)))
+
+    @staticmethod
+    def __oldest_age(tracked : OrderedDict, started_at) -> float:
+        if len(tracked) == 0:
+            return 0
+        return time.monotonic() - started_at(next(iter(tracked.items())))
+
+    @staticmethod
+    def __update_gauges():
+        MetricsRegistry.set_gauge(TaskManager.METRIC_IN_FLIGHT, len(TaskManager.__running))
+        MetricsRegistry.set_gauge(TaskManager.METRIC_QUEUED, len(TaskManager.__queued))
+        MetricsRegistry.set_gauge(TaskManager.METRIC_OLDEST_IN_FLIGHT_AGE, TaskManager.__oldest_age(TaskManager.__running, lambda x: x[1]))
+        MetricsRegistry.set_gauge(TaskManager.METRIC_OLDEST_QUEUED_AGE, TaskManager.__oldest_age(TaskManager.__queued, lambda x: x[1][2]))
+
+    @staticmethod
+    def update_gauges():
+        with TaskManager.__monitor_lock:
+            TaskManager.__update_gauges()
+
+    @staticmethod
+    def __submit(coro, priority : TaskPriority) -> Future:
+        handle = Future()
+
+        with TaskManager.__monitor_lock:
+            if len(TaskManager.__running) < TaskManager.__max_in_flight:
+                TaskManager.__start(coro, handle)
+            elif len(TaskManager.__queued) < TaskManager.__max_queued:
+                seq = next(TaskManager.__sequence)
+                TaskManager.__queued[seq] = (coro, handle, time.monotonic())
+                heapq.heappush(TaskManager.__queue_order, (int(priority), seq))
+            else:
+                coro.close()
+                MetricsRegistry.increment(TaskManager.METRIC_REJECTED, priority=priority.name)
+                raise TaskManager.QueueFullException(TaskManager.__retry_after())
+
+            TaskManager.__update_gauges()
+
+        handle.add_done_callback(TaskManager.__callback)
+        return handle
+
+    @staticmethod
+    def in_background(coro, priority : TaskPriority=TaskPriority.PUSH):
+        """Schedules the coroutine, raising QueueFullException if it can be neither started nor queued."""
+        TaskManager.__submit(coro, priority)
+
+    @staticmethod
+    async def in_foreground(coro, priority : TaskPriority=TaskPriority.KICKOFF):
+        return await asyncio.wrap_future(TaskManager.__submit(coro, priority))
+
+    @staticmethod
+    def __pending() -> int:
+        with TaskManager.__monitor_lock:
+            pending = len(TaskManager.__running) + len(TaskManager.__queued)
+            TaskManager.log().debug(f"TaskManager pending: {pending}")
+            return pending
+
+    @staticmethod
+    async def drain():
+        TaskManager.log().info("Gracefully shutting down...")
+        while TaskManager.__pending() > 0:
+            await asyncio.sleep(1.0)
 
     @staticmethod
     def wait_for_exit():
         TaskManager.log().info("Gracefully shutting down...")
-        while True:
-            with TaskManager.__monitor_lock:
-                TaskManager.log().debug(f"TaskManager.__monitored: {len(TaskManager.__monitored)}")
-                
-                if len(TaskManager.__monitored) == 0:
-                    break
+        while TaskManager.__pending() > 0:
             time.sleep(1.0)
-            
-
 
-            
 
+# The task ages grow between queue changes, so the gauges are also computed when metrics are read.
+MetricsRegistry.add_collector(TaskManager.update_gauges)
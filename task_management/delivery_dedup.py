@@ -0,0 +1,167 @@
+import os, time, hashlib, logging
+from collections import OrderedDict
+from threading import Lock
+from cxoneflow_metrics import MetricsRegistry
+
+
+class SharedDeliveryBackend:
+    """Records delivery ids as marker files in a directory shared by all workers and replicas.
+
+    A marker is created atomically with O_EXCL so only one worker will accept a delivery.  Markers
+    older than the TTL are treated as absent and are removed periodically.
+    """
+
+    __sweep_interval = 256
+
+    @classmethod
+    def log(clazz) -> logging.Logger:
+        return logging.getLogger(clazz.__name__)
+
+    def __init__(self, path : str, ttl_seconds : int):
+        self.__path = path
+        self.__ttl = ttl_seconds
+        self.__lock = Lock()
+        self.__marks = 0
+        os.makedirs(path, exist_ok=True)
+
+    @property
+    def path(self) -> str:
+        return self.__path
+
+    def __marker(self, key : str) -> str:
+        return os.path.join(self.__path, hashlib.sha256(key.encode()).hexdigest())
+
+    def __expired(self, marker : str, now : float) -> bool:
+        try:
+            return now - os.stat(marker).st_mtime > self.__ttl
+        except FileNotFoundError:
+            return True
+
+    def __sweep(self, now : float):
+        with os.scandir(self.__path) as it:
+            for entry in it:
+                try:
+                    if entry.is_file() and now - entry.stat().st_mtime > self.__ttl:
+                        os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def mark(self, key : str) -> bool:
+        """Returns True if the key was not seen within the TTL and is now recorded."""
+        marker = self.__marker(key)
+        now = time.time()
+
+        with self.__lock:
+            self.__marks += 1
+            if self.__marks % SharedDeliveryBackend.__sweep_interval == 0:
+                self.__sweep(now)
+
+        for _ in range(2):
+            try:
+                os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600))
+                return True
+            except FileExistsError:
+                if not self.__expired(marker, now):
+                    return False
+                try:
+                    os.unlink(marker)
+                except FileNotFoundError:
+                    pass
+
+        return False
+
+    def unmark(self, key : str):
+        try:
+            os.unlink(self.__marker(key))
+        except FileNotFoundError:
+            pass
+
+
+class DeliveryDedup:
+    """A bounded, TTL-expiring record of webhook delivery ids used to drop redelivered events.
+
+    Ids are always recorded in memory.  If a shared backend is configured it is consulted after the
+    in-memory check so that redeliveries landing on a different worker are also detected.
+    """
+
+    METRIC_DUPLICATES = "delivery_dedup.duplicates"
+
+    DEFAULT_TTL_SECONDS = 3600
+    DEFAULT_MAX_ENTRIES = 10000
+
+    @classmethod
+    def log(clazz) -> logging.Logger:
+        return logging.getLogger(clazz.__name__)
+
+    def __init__(self, ttl_seconds : int=DEFAULT_TTL_SECONDS, max_entries : int=DEFAULT_MAX_ENTRIES, shared_path : str=None):
+        self.__ttl = ttl_seconds
+        self.__max_entries = max_entries
+        self.__seen = OrderedDict()
+        self.__lock = Lock()
+        self.__shared = SharedDeliveryBackend(shared_path, ttl_seconds) if shared_path is not None else None
+
+    @property
+    def ttl_seconds(self) -> int:
+        return self.__ttl
+
+    @property
+    def max_entries(self) -> int:
+        return self.__max_entries
+
+    @property
+    def shared_path(self) -> str:
+        return self.__shared.path if self.__shared is not None else None
+
+    def __expire(self, now : float):
+        # Entries share a TTL so insertion order is expiry order.
+        while len(self.__seen) > 0:
+            key, expires = next(iter(self.__seen.items()))
+            if expires > now and len(self.__seen) <= self.__max_entries:
+                break
+            del self.__seen[key]
+
+    def first_delivery(self, scope : str, delivery_id : str) -> bool:
+        """Returns True the first time a delivery id is seen for the scope, False for a redelivery.
+
+        Events without a delivery id are always treated as first deliveries.
+        """
+        if delivery_id is None or len(str(delivery_id)) == 0:
+            return True
+
+        key = f"{scope}:{delivery_id}"
+        now = time.monotonic()
+
+        with self.__lock:
+            self.__expire(now)
+            duplicate = key in self.__seen
+            if not duplicate:
+                self.__seen[key] = now + self.__ttl
+                self.__expire(now)
+
+        if not duplicate and self.__shared is not None:
+            try:
+                duplicate = not self.__shared.mark(key)
+            except OSError as ex:
+                DeliveryDedup.log().warning(f"Shared delivery id backend unavailable, using in-memory state only: {ex}")
+
+        if duplicate:
+            MetricsRegistry.increment(DeliveryDedup.METRIC_DUPLICATES)
+            DeliveryDedup.log().info(f"Ignoring redelivered event {key}")
+
+        return not duplicate
+
+    def forget(self, scope : str, delivery_id : str):
+        """Removes a recorded delivery id so a redelivery will be accepted, used when the event could not be accepted."""
+        if delivery_id is None or len(str(delivery_id)) == 0:
+            return
+
+        key = f"{scope}:{delivery_id}"
+
+        with self.__lock:
+            self.__seen.pop(key, None)
+
+        if self.__shared is not None:
+            try:
+                self.__shared.unmark(key)
+            except OSError as ex:
+                DeliveryDedup.log().warning(f"Unable to remove {key} from the shared delivery id backend: {ex}")
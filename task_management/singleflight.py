@@ -0,0 +1,81 @@
+import asyncio, logging
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """Coalesces concurrent requests for the same key onto a single execution.
+
+    The value produced for a key is shared by every requester that acquires the key
+    while any other requester still holds it.  The cleanup callback is invoked with the
+    value when the last holder releases it.  The registry must only be used from a
+    single event loop.
+    """
+
+    class __Flight:
+        def __init__(self, task : asyncio.Task):
+            self.task = task
+            self.refs = 0
+
+    @classmethod
+    def log(clazz) -> logging.Logger:
+        return logging.getLogger(clazz.__name__)
+
+    def __init__(self, name : str):
+        self.__name = name
+        self.__flights = {}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self.__flights)
+
+    def __release(self, key : Hashable, flight, cleanup : Callable[[Any], Awaitable]) -> Awaitable:
+        flight.refs -= 1
+
+        if flight.refs > 0:
+            return None
+
+        if self.__flights.get(key, None) is flight:
+            del self.__flights[key]
+
+        if not flight.task.done():
+            # Every requester gave up; the value is cleaned up when the operation finishes.
+            flight.task.add_done_callback(lambda t: SingleFlight.__cleanup_abandoned(t, cleanup))
+        elif cleanup is not None and not flight.task.cancelled() and flight.task.exception() is None:
+            return cleanup(flight.task.result())
+
+        return None
+
+    @staticmethod
+    def __cleanup_abandoned(task : asyncio.Task, cleanup : Callable[[Any], Awaitable]):
+        if task.cancelled() or task.exception() is not None:
+            return
+        if cleanup is not None:
+            asyncio.ensure_future(cleanup(task.result()))
+
+    @asynccontextmanager
+    async def acquire(self, key : Hashable, factory : Callable[[], Awaitable], cleanup : Callable[[Any], Awaitable]=None):
+        flight = self.__flights.get(key, None)
+
+        if flight is None:
+            flight = SingleFlight.__Flight(asyncio.create_task(factory()))
+            self.__flights[key] = flight
+        else:
+            SingleFlight.log().debug(f"{self.__name}: joining in-flight operation for {key}")
+
+        flight.refs += 1
+        try:
+            try:
+                # Shielded so one requester's cancellation does not cancel the shared operation.
+                value = await asyncio.shield(flight.task)
+            except BaseException:
+                if flight.task.done() and self.__flights.get(key, None) is flight:
+                    # Failures are not shared with requesters that arrive later.
+                    del self.__flights[key]
+                raise
+
+            yield value
+        finally:
+            pending_cleanup = self.__release(key, flight, cleanup)
+            if pending_cleanup is not None:
+                await pending_cleanup
@@ -0,0 +1,79 @@
+import unittest, asyncio, json
+from unittest.mock import patch
+
+with patch("config.server.CxOneFlowConfig.bootstrap"):
+    import asgi
+
+
+class TestAsgi(unittest.TestCase):
+
+    @staticmethod
+    def __request(method : str, path : str, body : bytes=b"", headers : list=None):
+        sent = []
+
+        async def receive():
+            return {"type" : "http.request", "body" : body, "more_body" : False}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type" : "http", "method" : method, "path" : path, "headers" : headers if headers is not None else []}
+
+        with patch("asgi.TaskManager"):
+            asyncio.run(asgi.app(scope, receive, send))
+
+        return sent[0]["status"], dict(sent[0]["headers"]), sent[1]["body"]
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_ping(self):
+        status, _, body = TestAsgi.__request("GET", "/ping")
+        self.assertEqual(200, status)
+        self.assertEqual(b"pong", body)
+
+    def test_metrics(self):
+        with patch("orchestration.endpoint.MetricsRegistry.snapshot", return_value={"counters" : {"a" : 1}, "gauges" : {}}):
+            status, headers, body = TestAsgi.__request("GET", "/metrics")
+
+        self.assertEqual(200, status)
+        self.assertEqual(b"application/json", headers[b"Content-Type"])
+        self.assertEqual({"counters" : {"a" : 1}, "gauges" : {}}, json.loads(body))
+
+    def test_unknown_route_not_found(self):
+        status, _, _ = TestAsgi.__request("POST", "/unknown")
+        self.assertEqual(404, status)
+
+    def test_wrong_method_not_allowed(self):
+        for method, path in [("GET", "/gh"), ("PUT", "/gl/kickoff"), ("POST", "/artifacts/checkmarx.png")]:
+            with self.subTest(method=method, path=path):
+                status, _, _ = TestAsgi.__request(method, path)
+                self.assertEqual(405, status)
+
+    def test_artifact_served(self):
+        status, headers, body = TestAsgi.__request("GET", "/artifacts/checkmarx.png")
+        self.assertEqual(200, status)
+        self.assertEqual(b"image/png", headers[b"Content-Type"])
+        self.assertGreater(len(body), 0)
+
+    def test_artifact_head_has_no_body(self):
+        status, _, body = TestAsgi.__request("HEAD", "/artifacts/checkmarx.png")
+        self.assertEqual(200, status)
+        self.assertEqual(b"", body)
+
+    def test_artifact_path_traversal_not_found(self):
+        for path in ["/artifacts/../asgi.py", "/artifacts/../../etc/passwd", "/artifacts//etc/passwd", "/artifacts/missing.png"]:
+            with self.subTest(path=path):
+                status, _, _ = TestAsgi.__request("GET", path)
+                self.assertEqual(404, status)
+
+    def test_webhook_uses_shared_handler(self):
+        with patch("orchestration.endpoint.OrchestrationDispatch.admit", return_value=False) as admit:
+            status, _, _ = TestAsgi.__request("POST", "/gh", b"{}", [(b"x-github-event", b"check_run")])
+
+        self.assertEqual(204, status)
+        self.assertEqual({"X-Github-Event" : "check_run"}, admit.call_args.args[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
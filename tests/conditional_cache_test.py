@@ -0,0 +1,105 @@
+import unittest, asyncio, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from cxoneflow_metrics import MetricsRegistry
+from api_utils.apisession import APISession
+from api_utils.auth_factories import StaticAuthFactory
+from api_utils.conditional_cache import ConditionalRequestCache
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    etag = '"v1"'
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match", None) == _Handler.etag:
+            self.send_response(304)
+            self.send_header("ETag", _Handler.etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = f"[{{\"path\" : \"{self.path}\", \"etag\" : {_Handler.etag}}}]".encode("UTF-8")
+        self.send_response(200)
+        self.send_header("ETag", _Handler.etag)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestConditionalRequestCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(clazz):
+        clazz.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=clazz.server.serve_forever, daemon=True).start()
+        clazz.url = f"http://127.0.0.1:{clazz.server.server_port}"
+
+    @classmethod
+    def tearDownClass(clazz):
+        clazz.server.shutdown()
+        clazz.server.server_close()
+
+    def setUp(self):
+        MetricsRegistry.reset()
+        _Handler.etag = '"v1"'
+
+    def __session(self, max_entries=10):
+        return APISession(TestConditionalRequestCache.url, StaticAuthFactory(None), retries=1,
+                          conditional_cache=ConditionalRequestCache("127.0.0.1", max_entries))
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_not_modified_returns_cached_body(self):
+        session = self.__session()
+
+        async def run():
+            first = await session.exec(None, "GET", "/branches", {"page" : 1})
+            second = await session.exec(None, "GET", "/branches", {"page" : 1})
+            return first, second
+
+        first, second = asyncio.run(run())
+        self.assertEqual(200, second.status_code)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(1, MetricsRegistry.counter(ConditionalRequestCache.METRIC_HITS, host="127.0.0.1"))
+        self.assertEqual(0.5, ConditionalRequestCache.hit_ratio("127.0.0.1"))
+
+    def test_changed_resource_is_fetched(self):
+        session = self.__session()
+
+        async def run():
+            await session.exec(None, "GET", "/branches")
+            _Handler.etag = '"v2"'
+            return await session.exec(None, "GET", "/branches")
+
+        self.assertEqual("v2", asyncio.run(run()).json()[0]["etag"])
+        self.assertEqual(0, MetricsRegistry.counter(ConditionalRequestCache.METRIC_HITS, host="127.0.0.1"))
+
+    def test_queries_are_cached_separately(self):
+        session = self.__session()
+
+        async def run():
+            await session.exec(None, "GET", "/branches", {"page" : 1})
+            return await session.exec(None, "GET", "/branches", {"page" : 2})
+
+        self.assertEqual(200, asyncio.run(run()).status_code)
+        self.assertEqual(0, MetricsRegistry.counter(ConditionalRequestCache.METRIC_HITS, host="127.0.0.1"))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        session = self.__session(max_entries=1)
+
+        async def run():
+            await session.exec(None, "GET", "/a")
+            await session.exec(None, "GET", "/b")
+            return await session.exec(None, "GET", "/a")
+
+        self.assertEqual("/a", asyncio.run(run()).json()[0]["path"])
+        self.assertEqual(0, MetricsRegistry.counter(ConditionalRequestCache.METRIC_HITS, host="127.0.0.1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
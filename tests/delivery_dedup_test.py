@@ -0,0 +1,39 @@
+import unittest, tempfile
+from task_management.delivery_dedup import DeliveryDedup
+
+class TestDeliveryDedup(unittest.TestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_redelivery_detected(self):
+        dedup = DeliveryDedup()
+        self.assertTrue(dedup.first_delivery("gh", "abc"))
+        self.assertFalse(dedup.first_delivery("gh", "abc"))
+        self.assertTrue(dedup.first_delivery("gl", "abc"))
+
+    def test_missing_id_always_delivered(self):
+        dedup = DeliveryDedup()
+        self.assertTrue(dedup.first_delivery("gh", None))
+        self.assertTrue(dedup.first_delivery("gh", None))
+
+    def test_bounded(self):
+        dedup = DeliveryDedup(max_entries=2)
+        for x in ["a", "b", "c"]:
+            self.assertTrue(dedup.first_delivery("gh", x))
+        self.assertTrue(dedup.first_delivery("gh", "a"))
+
+    def test_forget(self):
+        dedup = DeliveryDedup()
+        self.assertTrue(dedup.first_delivery("gh", "abc"))
+        dedup.forget("gh", "abc")
+        self.assertTrue(dedup.first_delivery("gh", "abc"))
+
+    def test_shared_backend(self):
+        with tempfile.TemporaryDirectory() as shared:
+            self.assertTrue(DeliveryDedup(shared_path=shared).first_delivery("gh", "abc"))
+            self.assertFalse(DeliveryDedup(shared_path=shared).first_delivery("gh", "abc"))
+
+
+if __name__ == '__main__':
+    unittest.main()
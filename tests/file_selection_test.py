@@ -0,0 +1,47 @@
+import unittest, tempfile
+from pathlib import Path
+from orchestration.file_selection import FileSelector
+
+class TestFileSelection(unittest.TestCase):
+
+    def setUp(self):
+        self.__work = tempfile.TemporaryDirectory()
+        self.__root = Path(self.__work.name)
+        for name, content in {".git/objects/pack" : "x" * 100, "src/main.py" : "print()", "src/test/a_test.py" : "pass",
+                              "docs/logo.png" : "png", "data/big.sql" : "x" * 2048, "README.md" : "readme"}.items():
+            (self.__root / name).parent.mkdir(parents=True, exist_ok=True)
+            (self.__root / name).write_text(content)
+
+    def tearDown(self):
+        self.__work.cleanup()
+
+    def __selected(self, selector, preserve=None):
+        return sorted(selector.select(self.__root, preserve).entries.values())
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_vcs_metadata_and_extensions_excluded(self):
+        selection = FileSelector().select(self.__root)
+        self.assertEqual(["README.md", "data/big.sql", "src/main.py", "src/test/a_test.py"], sorted(selection.entries.values()))
+        self.assertEqual(2, selection.excluded_files)
+        self.assertEqual(103, selection.excluded_bytes)
+
+    def test_max_file_size(self):
+        self.assertNotIn("data/big.sql", self.__selected(FileSelector(max_file_size=1024)))
+
+    def test_only_common_filter_exclusions(self):
+        selector = FileSelector.from_filters({"sast" : "!**/test,!*.md", "sca" : "!**/test"})
+        self.assertEqual(["**/test"], selector.exclude_globs)
+        self.assertEqual(["README.md", "data/big.sql", "src/main.py"], self.__selected(selector))
+
+    def test_preserve(self):
+        self.assertIn("docs/logo.png", self.__selected(FileSelector(), ["docs/logo.png"]))
+
+    def test_glob_translation(self):
+        selector = FileSelector(["*.sql", "src/[a-m]*.py"])
+        self.assertEqual(["README.md", "data/big.sql", "src/test/a_test.py"], self.__selected(selector))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest, asyncio, json, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from cxoneflow_metrics import MetricsRegistry
+from api_utils.apisession import APISession
+from api_utils.auth_factories import StaticAuthFactory
+from scm_services import GHService
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    graphql_response = {}
+    requests = []
+
+    def __respond(self, body):
+        content = json.dumps(body).encode("UTF-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def __record(self):
+        length = int(self.headers.get("Content-Length", 0))
+        _Handler.requests.append((self.command, self.path, json.loads(self.rfile.read(length)) if length > 0 else None))
+
+    def do_POST(self):
+        self.__record()
+        if self.path.endswith("/graphql"):
+            self.__respond(_Handler.graphql_response)
+        else:
+            self.__respond({"id" : 1})
+
+    def do_PATCH(self):
+        self.__record()
+        self.__respond({"id" : 1})
+
+    def do_GET(self):
+        self.__record()
+        self.__respond([{"id" : 7, "body" : "[//]:#cxoneflow\n# Results"}]
+                       if "page=1" in self.path else [])
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestGithubGraphQL(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(clazz):
+        clazz.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=clazz.server.serve_forever, daemon=True).start()
+        clazz.url = f"http://127.0.0.1:{clazz.server.server_port}"
+
+    @classmethod
+    def tearDownClass(clazz):
+        clazz.server.shutdown()
+        clazz.server.server_close()
+
+    def setUp(self):
+        MetricsRegistry.reset()
+        _Handler.requests = []
+        _Handler.graphql_response = {"data" : {"repository" : {
+            "defaultBranchRef" : {"name" : "main"},
+            "branchProtectionRules" : {"pageInfo" : {"hasNextPage" : False}, "nodes" : [
+                {"matchingRefs" : {"pageInfo" : {"hasNextPage" : False}, "nodes" : [{"name" : "main"}, {"name" : "release/1"}]}},
+                {"matchingRefs" : {"pageInfo" : {"hasNextPage" : False}, "nodes" : [{"name" : "main"}]}}]},
+            "pullRequest" : {"comments" : {"pageInfo" : {"hasNextPage" : False}, "nodes" : [
+                {"databaseId" : 41, "body" : "LGTM"},
+                {"databaseId" : 42, "body" : "[//]:#cxoneflow\n# Results"}]}}}}}
+
+    def __service(self, suffix="", graphql=True):
+        service = GHService("http://github.local", "gh", APISession(f"{TestGithubGraphQL.url}{suffix}", StaticAuthFactory(None), retries=1),
+                            "secret", None)
+        service.graphql_enabled = graphql
+        return service
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_metadata_in_one_query(self):
+        metadata = asyncio.run(self.__service().fetch_repo_metadata("org", "repo", "5", None))
+        self.assertEqual("main", metadata.default_branch)
+        self.assertEqual(["main", "release/1"], metadata.protected_branches)
+        self.assertTrue(metadata.pr_comments_complete)
+        self.assertEqual(42, metadata.pr_comment_id)
+        self.assertEqual(1, len(_Handler.requests))
+        self.assertEqual({"owner" : "org", "name" : "repo", "pr" : 5, "withPr" : True, "withRules" : True}, _Handler.requests[0][2]["variables"])
+
+    def test_enterprise_graphql_endpoint(self):
+        asyncio.run(self.__service("/api/v3").fetch_repo_metadata("org", "repo", None, None))
+        self.assertEqual("/api/graphql", _Handler.requests[0][1])
+
+    def test_disabled_does_not_query(self):
+        self.assertIsNone(asyncio.run(self.__service(graphql=False).fetch_repo_metadata("org", "repo", None, None)))
+        self.assertEqual(0, len(_Handler.requests))
+
+    def test_decorate_updates_comment_found_by_query(self):
+        asyncio.run(self.__service().exec_pr_decorate("org", "repo", "repo", "5", "scan", "full", "summary", None))
+        self.assertEqual([("POST", "/graphql"), ("PATCH", "/repos/org/repo/issues/comments/42")], [r[0:2] for r in _Handler.requests])
+
+    def test_decorate_falls_back_to_rest_on_error(self):
+        _Handler.graphql_response = {"errors" : [{"message" : "Resource not accessible by integration"}]}
+        asyncio.run(self.__service().exec_pr_decorate("org", "repo", "repo", "5", "scan", "full", "summary", None))
+        self.assertEqual("PATCH", _Handler.requests[-1][0])
+        self.assertEqual("/repos/org/repo/issues/comments/7", _Handler.requests[-1][1])
+        self.assertEqual(1, MetricsRegistry.counter(GHService.METRIC_GRAPHQL_FALLBACKS))
+
+    def test_empty_protection_rules_are_not_trusted(self):
+        _Handler.graphql_response["data"]["repository"]["branchProtectionRules"]["nodes"] = []
+        self.assertIsNone(asyncio.run(self.__service().fetch_repo_metadata("org", "repo", None, None)).protected_branches)
+
+
+if __name__ == '__main__':
+    unittest.main()
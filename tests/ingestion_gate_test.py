@@ -0,0 +1,42 @@
+import unittest
+from pathlib import Path
+from api_utils import signature
+from orchestration.gh import GithubOrchestrator
+from orchestration.gl import GitlabOrchestrator
+from orchestration.bbdc import BitBucketDataCenterOrchestrator
+
+
+class TestIngestionGate(unittest.TestCase):
+
+    __payload = (Path(__file__).parent.parent / "test_data" / "webhooks" / "gh-push.json").read_bytes()
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_github_events_checked_against_workflow_map(self):
+        self.assertTrue(GithubOrchestrator.handles_event({"X-Github-Event" : "push"}))
+        self.assertTrue(GithubOrchestrator.handles_event({"X-Github-Event" : "pull_request"}))
+        self.assertTrue(GithubOrchestrator.handles_event({"X-Github-Event" : "ping"}))
+        self.assertFalse(GithubOrchestrator.handles_event({"X-Github-Event" : "check_run"}))
+
+    def test_missing_event_header_is_not_rejected(self):
+        self.assertTrue(GithubOrchestrator.handles_event({}))
+        self.assertTrue(GitlabOrchestrator.handles_event({}))
+        self.assertTrue(BitBucketDataCenterOrchestrator.handles_event({}))
+
+    def test_gitlab_and_bbdc_events(self):
+        self.assertTrue(GitlabOrchestrator.handles_event({"X-Gitlab-Event" : "Merge Request Hook"}))
+        self.assertFalse(GitlabOrchestrator.handles_event({"X-Gitlab-Event" : "Pipeline Hook"}))
+        self.assertTrue(BitBucketDataCenterOrchestrator.handles_event({"X-Event-Key" : "diagnostics:ping"}))
+        self.assertTrue(BitBucketDataCenterOrchestrator.handles_event({"X-Event-Key" : "pr:opened"}))
+        self.assertFalse(BitBucketDataCenterOrchestrator.handles_event({"X-Event-Key" : "repo:comment:added"}))
+
+    def test_signature_checked_on_raw_payload(self):
+        headers = {"X-Hub-Signature-256" : f"sha256={signature.hmac("sha256", "secret", TestIngestionGate.__payload)}"}
+        self.assertTrue(GithubOrchestrator.signature_valid(headers, TestIngestionGate.__payload, "secret"))
+        self.assertFalse(GithubOrchestrator.signature_valid(headers, TestIngestionGate.__payload, "other"))
+        self.assertFalse(GithubOrchestrator.signature_valid({}, TestIngestionGate.__payload, "secret"))
+
+
+if __name__ == '__main__':
+    unittest.main()
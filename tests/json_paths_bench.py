@@ -0,0 +1,84 @@
+"""Measures orchestrator construction and payload field population with compiled paths versus jsonpath_ng.
+
+Run from the repository root:
+
+    python -m tests.json_paths_bench [iterations]
+"""
+import sys, timeit
+from pathlib import Path
+from jsonpath_ng import parse
+from api_utils.auth_factories import EventContext
+from api_utils.json_paths import CompiledJsonPath
+from orchestration.gh import GithubOrchestrator
+from orchestration.gl import GitlabOrchestrator
+from orchestration.adoe import AzureDevOpsEnterpriseOrchestrator
+from orchestration.bbdc import BitBucketDataCenterOrchestrator
+
+
+class JsonPathNgPath:
+    """The CompiledJsonPath interface evaluated with jsonpath_ng, used as the baseline."""
+    def __init__(self, path : str):
+        self.__expr = parse(path)
+
+    def find(self, data):
+        return self.__expr.find(data)
+
+    def values(self, data):
+        return [x.value for x in self.__expr.find(data)]
+
+    def first(self, data, default=None):
+        found = self.values(data)
+        return found[0] if len(found) > 0 else default
+
+
+__payload_dir = Path(__file__).parent.parent / "test_data" / "webhooks"
+
+__cases = [
+    (GithubOrchestrator, "gh-push.json", {"X-Github-Event" : "push"}, ["init_state_on_push"]),
+    (GithubOrchestrator, "gh-pull-request.json", {"X-Github-Event" : "pull_request"}, ["populate_common_pr_data"]),
+    (GitlabOrchestrator, "gl-push.json", {"X-Gitlab-Event" : "Push Hook"}, ["populate_common_push_event_data"]),
+    (GitlabOrchestrator, "gl-merge-request.json", {"X-Gitlab-Event" : "Merge Request Hook"}, ["populate_common_pr_data"]),
+    (AzureDevOpsEnterpriseOrchestrator, "adoe-push.json", {}, ["populate_common_push_data"]),
+    (AzureDevOpsEnterpriseOrchestrator, "adoe-pull-request.json", {}, ["populate_common_pr_data"]),
+    (BitBucketDataCenterOrchestrator, "bbdc-push.json", {"X-Event-Key" : "repo:refs_changed"}, ["populate_common_push_data"]),
+    (BitBucketDataCenterOrchestrator, "bbdc-pull-request.json", {"X-Event-Key" : "pr:opened"}, ["populate_common_pr_data"]),
+]
+
+
+def __compiled_paths(clazz):
+    return {k:v for k, v in vars(clazz).items() if isinstance(v, CompiledJsonPath)}
+
+
+def __run_case(clazz, event_context, populate):
+    orch = clazz(event_context)
+    for method in populate:
+        getattr(orch, f"_{clazz.__name__}__{method}")()
+
+
+def __time(clazz, event_context, populate, iterations) -> float:
+    timer = timeit.Timer(lambda: __run_case(clazz, event_context, populate))
+    return min(timer.repeat(repeat=5, number=iterations)) / iterations * 1e6
+
+
+def main(iterations : int):
+    print(f"{'payload':<26}{'paths':>6}{'jsonpath_ng (us)':>18}{'compiled (us)':>15}{'speedup':>9}")
+
+    for clazz, payload, headers, populate in __cases:
+        with open(__payload_dir / payload, "rb") as f:
+            event_context = EventContext(f.read(), headers)
+
+        compiled = __compiled_paths(clazz)
+        try:
+            for k, v in compiled.items():
+                setattr(clazz, k, JsonPathNgPath(v.path))
+            baseline = __time(clazz, event_context, populate, iterations)
+        finally:
+            for k, v in compiled.items():
+                setattr(clazz, k, v)
+
+        current = __time(clazz, event_context, populate, iterations)
+        print(f"{payload:<26}{len(compiled):>6}{baseline:>18.1f}{current:>15.1f}{baseline / current:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
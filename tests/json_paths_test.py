@@ -0,0 +1,74 @@
+import unittest, json
+from pathlib import Path
+from jsonpath_ng import parse
+from api_utils.json_paths import compile_path
+
+
+class TestJsonPaths(unittest.TestCase):
+
+    __payload_dir = Path(__file__).parent.parent / "test_data" / "webhooks"
+
+    __paths = [
+        "$.action",
+        "$.ref",
+        "$.repository.owner.login",
+        "$.repository[clone_url,ssh_url]",
+        "$.pull_request.assignees",
+        "$.pull_request[requested_teams,requested_reviewers][*]",
+        "$.object_attributes.last_commit.id",
+        "$.resource.refUpdates..name",
+        "$.resource.refUpdates..newObjectId",
+        "$.resource.lastMergeTargetCommit[commitId]",
+        "$.resource.reviewers[*].vote",
+        "$.resourceContainers.account.id",
+        "$.repository.links.clone[*]",
+        "$.changes[*].type",
+        "$.pullRequest.links['self'][*]['href']",
+        "$.pullRequest.reviewers[*].status",
+        "$.commits[*].author.*",
+        "$..displayId",
+        "$.not.present",
+    ]
+
+    def __payloads(self):
+        for payload in sorted(TestJsonPaths.__payload_dir.glob("*.json")):
+            with open(payload, "rt") as f:
+                yield payload.name, json.load(f)
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_matches_jsonpath_ng_on_recorded_payloads(self):
+        for name, payload in self.__payloads():
+            for path in TestJsonPaths.__paths:
+                with self.subTest(payload=name, path=path):
+                    self.assertEqual([x.value for x in parse(path).find(payload)], compile_path(path).values(payload))
+
+    def test_matches_jsonpath_ng_on_api_responses(self):
+        branches = [{"name" : "main"}, {"name" : "release"}, {"id" : 3}]
+        for path in ["$[*].name", "$.[*].name"]:
+            self.assertEqual([x.value for x in parse(path).find(branches)], compile_path(path).values(branches))
+
+        policies = {"value" : [{"settings" : {"scope" : [{"refName" : "refs/heads/main"}]}}, {"settings" : {}}]}
+        path = "$.value[*].settings.scope[*]"
+        self.assertEqual([x.value for x in parse(path).find(policies)], compile_path(path).values(policies))
+
+    def test_wildcard_on_dict_is_single_element(self):
+        self.assertEqual([{"a" : 1}], compile_path("$.x[*]").values({"x" : {"a" : 1}}))
+        self.assertEqual([], compile_path("$.x[*]").values({"x" : []}))
+
+    def test_find_returns_values(self):
+        found = compile_path("$.a.b").find({"a" : {"b" : 2}})
+        self.assertEqual(1, len(found))
+        self.assertEqual(2, found[0].value)
+
+    def test_first_default(self):
+        self.assertEqual("x", compile_path("$.a.b").first({"a" : {}}, "x"))
+
+    def test_unsupported_syntax_falls_back(self):
+        data = {"a" : [1, 2, 3]}
+        self.assertEqual([x.value for x in parse("$.a[1]").find(data)], compile_path("$.a[1]").values(data))
+
+
+if __name__ == '__main__':
+    unittest.main()
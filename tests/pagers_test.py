@@ -0,0 +1,102 @@
+import unittest, asyncio
+from contextlib import aclosing
+from requests import Response
+from api_utils.pagers import async_api_page_generator, link_header_page_count, total_pages_header_count
+
+
+class _PagedApi:
+    def __init__(self, pages : int, page_size : int=3, link : bool=True, delay : float=0.01):
+        self.pages = pages
+        self.page_size = page_size
+        self.link = link
+        self.delay = delay
+        self.requested = []
+        self.cancelled = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def exec(self, page : int):
+        self.requested.append(page)
+        self.in_flight = self.in_flight + 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            # Later pages respond sooner so out of order completion is exercised.
+            await asyncio.sleep(self.delay * (self.pages - page + 1))
+        except asyncio.CancelledError:
+            self.cancelled.append(page)
+            raise
+        finally:
+            self.in_flight = self.in_flight - 1
+
+        response = Response()
+        response.status_code = 200
+        if self.link:
+            response.headers["Link"] = f'<https://api.example.com/items?page={page + 1}>; rel="next", ' + \
+                f'<https://api.example.com/items?page={self.pages}>; rel="last"'
+        response.items = [f"{page}-{i}" for i in range(self.page_size)] if page <= self.pages else []
+        return response
+
+    def extract(self, response : Response):
+        return response.items, len(response.items) < self.page_size
+
+    def generator(self, **kwargs):
+        return async_api_page_generator(self.exec, self.extract, lambda offset: {"page" : offset + 1}, **kwargs)
+
+    def expected(self):
+        return [f"{p}-{i}" for p in range(1, self.pages + 1) for i in range(self.page_size)]
+
+
+class TestPagers(unittest.TestCase):
+
+    def __collect(self, generator):
+        async def run():
+            return [x async for x in generator]
+        return asyncio.run(run())
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_sequential_order_is_preserved(self):
+        api = _PagedApi(3)
+        self.assertEqual(api.expected(), self.__collect(api.generator()))
+        self.assertEqual(1, api.max_in_flight)
+
+    def test_prefetch_order_is_preserved(self):
+        api = _PagedApi(10)
+        self.assertEqual(api.expected(), self.__collect(api.generator(page_count_extractor=link_header_page_count, prefetch_window=3)))
+        self.assertEqual(list(range(1, 11)), sorted(api.requested))
+        self.assertEqual(3, api.max_in_flight)
+
+    def test_prefetch_without_page_count_is_sequential(self):
+        api = _PagedApi(3, link=False)
+        self.assertEqual(api.expected(), self.__collect(api.generator(page_count_extractor=link_header_page_count)))
+        self.assertEqual(1, api.max_in_flight)
+
+    def test_closing_cancels_prefetched_pages(self):
+        api = _PagedApi(10)
+
+        async def run():
+            async with aclosing(api.generator(page_count_extractor=link_header_page_count, prefetch_window=4)) as items:
+                async for item in items:
+                    # Lets the prefetched requests start before the consumer stops.
+                    await asyncio.sleep(0)
+                    if item == "1-1":
+                        break
+            await asyncio.sleep(0)
+
+        asyncio.run(run())
+        self.assertEqual([2, 3, 4, 5], sorted(api.cancelled))
+        self.assertEqual(5, len(api.requested))
+
+    def test_page_count_headers(self):
+        response = Response()
+        response.headers["Link"] = '<https://api.example.com/items?per_page=100&page=7>; rel="last"'
+        response.headers["X-Total-Pages"] = "4"
+        self.assertEqual(7, link_header_page_count(response))
+        self.assertEqual(4, total_pages_header_count(response))
+        self.assertIsNone(link_header_page_count(Response()))
+        self.assertIsNone(total_pages_header_count(Response()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest, asyncio, pickle
+from unittest.mock import patch
+from cxone_service import CxOneService
+from cxone_service.grouping import GroupingService
+from cxone_service.project_catalog import ProjectCatalog
+
+class TestProjectCatalog(unittest.TestCase):
+
+    @staticmethod
+    def __project(name : str) -> dict:
+        return {"id" : f"id-{name}", "name" : name, "tags" : {}, "groups" : []}
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_cached_copy_is_not_shared(self):
+        async def run():
+            catalog = ProjectCatalog()
+            catalog.put(TestProjectCatalog.__project("a"))
+            first = await catalog.get("a")
+            first['tags']['changed'] = "yes"
+            return await catalog.get("a")
+
+        self.assertEqual({}, asyncio.run(run())['tags'])
+
+    def test_expired_entry_is_missing(self):
+        async def run():
+            catalog = ProjectCatalog(ttl_seconds=10)
+            with patch("cxone_service.project_catalog.time", **{"monotonic.return_value" : 100}):
+                catalog.put(TestProjectCatalog.__project("a"))
+            with patch("cxone_service.project_catalog.time", **{"monotonic.return_value" : 109}):
+                hit = await catalog.get("a")
+            with patch("cxone_service.project_catalog.time", **{"monotonic.return_value" : 110}):
+                return hit, await catalog.get("a")
+
+        hit, expired = asyncio.run(run())
+        self.assertEqual("id-a", hit['id'])
+        self.assertIsNone(expired)
+
+    def test_preload_runs_once(self):
+        calls = []
+
+        async def source():
+            calls.append(1)
+            for name in ["a", "b"]:
+                yield TestProjectCatalog.__project(name)
+
+        async def run():
+            catalog = ProjectCatalog(preload=True)
+            found = await asyncio.gather(catalog.get("a", source), catalog.get("b", source))
+            return found, await catalog.get("c", source)
+
+        found, missing = asyncio.run(run())
+        self.assertEqual(["id-a", "id-b"], [x['id'] for x in found])
+        self.assertIsNone(missing)
+        self.assertEqual(1, len(calls))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        async def run():
+            catalog = ProjectCatalog(max_entries=2)
+            catalog.put_all([TestProjectCatalog.__project("a"), TestProjectCatalog.__project("b")])
+            await catalog.get("a")
+            catalog.put(TestProjectCatalog.__project("c"))
+            return [await catalog.get(x) is not None for x in ["a", "b", "c"]]
+
+        self.assertEqual([True, False, True], asyncio.run(run()))
+
+    def test_service_is_pickled_without_catalog(self):
+        service = CxOneService("moniker", None, {}, {}, {}, False, False, GroupingService(None), project_catalog=ProjectCatalog())
+        self.assertEqual("moniker", pickle.loads(pickle.dumps(service)).moniker)
+
+
+if __name__ == '__main__':
+    unittest.main()
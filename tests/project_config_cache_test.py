@@ -0,0 +1,62 @@
+import unittest, asyncio
+from unittest.mock import patch
+from cxoneflow_metrics import MetricsRegistry
+from cxone_service.project_config_cache import ProjectConfigCache
+
+class TestProjectConfigCache(unittest.TestCase):
+
+    def __loader(self, calls, delay=0, fail=False):
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(delay)
+            if fail:
+                raise ValueError()
+            return {"sast" : {"filter" : f"!filter-{len(calls)}"}}
+        return load
+
+    def setUp(self):
+        MetricsRegistry.reset()
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_concurrent_misses_share_one_load(self):
+        calls = []
+
+        async def run():
+            cache = ProjectConfigCache()
+            loader = self.__loader(calls, 0.05)
+            await asyncio.gather(*[cache.get(("engines", "project"), loader) for _ in range(3)])
+            return await cache.get(("engines", "project"), loader)
+
+        self.assertEqual({"sast" : {"filter" : "!filter-1"}}, asyncio.run(run()))
+        self.assertEqual(1, len(calls))
+        self.assertEqual(0.25, ProjectConfigCache.hit_ratio())
+
+    def test_expired_entry_is_reloaded(self):
+        calls = []
+
+        async def run():
+            cache = ProjectConfigCache(ttl_seconds=10)
+            loader = self.__loader(calls)
+            with patch("cxone_service.project_config_cache.time", **{"monotonic.return_value" : 100}):
+                await cache.get("project", loader)
+            with patch("cxone_service.project_config_cache.time", **{"monotonic.return_value" : 110}):
+                return await cache.get("project", loader)
+
+        self.assertEqual({"sast" : {"filter" : "!filter-2"}}, asyncio.run(run()))
+
+    def test_failure_is_not_cached(self):
+        calls = []
+
+        async def run():
+            cache = ProjectConfigCache()
+            with self.assertRaises(ValueError):
+                await cache.get("project", self.__loader(calls, fail=True))
+            return await cache.get("project", self.__loader(calls))
+
+        self.assertEqual({"sast" : {"filter" : "!filter-2"}}, asyncio.run(run()))
+
+
+if __name__ == '__main__':
+    unittest.main()
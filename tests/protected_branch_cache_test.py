@@ -0,0 +1,101 @@
+import unittest, asyncio
+from unittest.mock import patch
+from scm_services.protected_branch_cache import ProtectedBranchCache
+
+class TestProtectedBranchCache(unittest.TestCase):
+
+    def __loader(self, calls, delay=0, fail=False):
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(delay)
+            if fail:
+                raise ValueError()
+            return [f"branch-{len(calls)}"]
+        return load
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_concurrent_misses_share_one_load(self):
+        calls = []
+
+        async def run():
+            cache = ProtectedBranchCache()
+            loader = self.__loader(calls, 0.05)
+            first = await asyncio.gather(*[cache.get("repo", loader) for _ in range(3)])
+            return first, await cache.get("repo", loader)
+
+        first, second = asyncio.run(run())
+        self.assertEqual([["branch-1"]] * 3, first)
+        self.assertEqual(["branch-1"], second)
+        self.assertEqual(1, len(calls))
+
+    def test_expired_entry_is_reloaded(self):
+        calls = []
+
+        async def run():
+            cache = ProtectedBranchCache(ttl_seconds=10)
+            loader = self.__loader(calls)
+            with patch("scm_services.protected_branch_cache.time", **{"monotonic.return_value" : 100}):
+                await cache.get("repo", loader)
+            with patch("scm_services.protected_branch_cache.time", **{"monotonic.return_value" : 111}):
+                return await cache.get("repo", loader)
+
+        self.assertEqual(["branch-2"], asyncio.run(run()))
+
+    def test_background_refresh_returns_expired_entry(self):
+        calls = []
+
+        async def run():
+            cache = ProtectedBranchCache(ttl_seconds=10, background_refresh=True)
+            loader = self.__loader(calls)
+            with patch("scm_services.protected_branch_cache.time", **{"monotonic.return_value" : 100}):
+                await cache.get("repo", loader)
+            with patch("scm_services.protected_branch_cache.time", **{"monotonic.return_value" : 111}):
+                stale = await cache.get("repo", loader)
+                await asyncio.sleep(0.01)
+                refreshed = await cache.get("repo", loader)
+            return stale, refreshed
+
+        self.assertEqual((["branch-1"], ["branch-2"]), asyncio.run(run()))
+
+    def test_invalidation_discards_in_flight_load(self):
+        calls = []
+
+        async def run():
+            cache = ProtectedBranchCache()
+            loader = self.__loader(calls, 0.05)
+            pending = asyncio.ensure_future(cache.get("repo", loader))
+            await asyncio.sleep(0)
+            cache.invalidate("repo")
+            await pending
+            return await cache.get("repo", loader)
+
+        self.assertEqual(["branch-2"], asyncio.run(run()))
+
+    def test_failure_is_not_cached(self):
+        calls = []
+
+        async def run():
+            cache = ProtectedBranchCache()
+            with self.assertRaises(ValueError):
+                await cache.get("repo", self.__loader(calls, fail=True))
+            return await cache.get("repo", self.__loader(calls))
+
+        self.assertEqual(["branch-2"], asyncio.run(run()))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        calls = []
+
+        async def run():
+            cache = ProtectedBranchCache(max_entries=2)
+            loader = self.__loader(calls)
+            for key in ["a", "b", "a", "c", "a", "b"]:
+                await cache.get(key, loader)
+
+        asyncio.run(run())
+        self.assertEqual(4, len(calls))
+
+
+if __name__ == '__main__':
+    unittest.main()
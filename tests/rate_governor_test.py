@@ -0,0 +1,72 @@
+import unittest, asyncio, pickle
+from unittest.mock import patch
+from cxoneflow_metrics import MetricsRegistry
+from api_utils.rate_governor import RateGovernor
+
+class TestRateGovernor(unittest.TestCase):
+
+    def __at(self, monotonic, now=1_700_000_000):
+        return patch("api_utils.rate_governor.time", **{"monotonic.return_value" : monotonic, "time.return_value" : now})
+
+    def setUp(self):
+        MetricsRegistry.reset()
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_calls_beyond_burst_wait_for_tokens(self):
+        with self.__at(100):
+            governor = RateGovernor("scm.example.com", requests_per_second=1, burst=2)
+            self.assertEqual([0, 0, 1, 2], [governor._reserve() for _ in range(4)])
+
+    def test_unlimited_without_rate_or_headers(self):
+        with self.__at(100):
+            governor = RateGovernor("scm.example.com")
+            self.assertEqual([0] * 20, [governor._reserve() for _ in range(20)])
+
+    def test_retry_after_blocks_calls(self):
+        with self.__at(100):
+            governor = RateGovernor("scm.example.com")
+            governor.observe({"Retry-After" : "5"})
+            self.assertEqual(5, governor._reserve())
+
+    def test_exhausted_budget_blocks_until_epoch_reset(self):
+        with self.__at(100):
+            governor = RateGovernor("scm.example.com")
+            governor.observe({"X-RateLimit-Remaining" : "0", "X-RateLimit-Limit" : "5000", "X-RateLimit-Reset" : "1700000030"})
+            self.assertEqual(30, governor._reserve())
+
+    def test_low_budget_is_paced_until_reset(self):
+        with self.__at(100):
+            governor = RateGovernor("scm.example.com", burst=1)
+            governor.observe({"RateLimit-Remaining" : "10", "RateLimit-Limit" : "100", "RateLimit-Reset" : "20"})
+            self.assertEqual([0, 2, 4], [governor._reserve() for _ in range(3)])
+
+    def test_plentiful_budget_is_not_paced(self):
+        with self.__at(100):
+            governor = RateGovernor("scm.example.com", burst=1)
+            governor.observe({"X-RateLimit-Remaining" : "4000", "X-RateLimit-Limit" : "5000", "X-RateLimit-Reset" : "20"})
+            self.assertEqual([0, 0, 0], [governor._reserve() for _ in range(3)])
+
+    def test_is_rate_limited(self):
+        self.assertTrue(RateGovernor.is_rate_limited(429, {}))
+        self.assertTrue(RateGovernor.is_rate_limited(403, {"X-RateLimit-Remaining" : "0"}))
+        self.assertTrue(RateGovernor.is_rate_limited(403, {"Retry-After" : "60"}))
+        self.assertFalse(RateGovernor.is_rate_limited(403, {"X-RateLimit-Remaining" : "10"}))
+        self.assertFalse(RateGovernor.is_rate_limited(500, {}))
+
+    def test_acquire_records_throttling(self):
+        governor = RateGovernor("scm.example.com")
+        with self.__at(100):
+            governor.observe({"Retry-After" : "0.01"})
+            asyncio.run(governor.acquire())
+        self.assertEqual(1, MetricsRegistry.counter(RateGovernor.METRIC_THROTTLED, host="scm.example.com"))
+
+    def test_pickled_governor_can_be_used(self):
+        governor = pickle.loads(pickle.dumps(RateGovernor("scm.example.com", requests_per_second=2, burst=3)))
+        self.assertEqual(2, governor.requests_per_second)
+        self.assertEqual(0, governor._reserve())
+
+
+if __name__ == '__main__':
+    unittest.main()
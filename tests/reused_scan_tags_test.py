@@ -0,0 +1,46 @@
+import unittest, asyncio
+from unittest.mock import patch, MagicMock, AsyncMock
+from cxone_service import CxOneService
+
+
+class TestReusedScanTags(unittest.TestCase):
+
+    __original_tags = {CxOneService.COMMIT_TAG : "aaa", CxOneService.PR_ID_TAG : "1", CxOneService.PR_TARGET_TAG : "main",
+                       CxOneService.PR_STATE_TAG : "OPEN", CxOneService.PR_STATUS_TAG : "NONE", "workflow" : "pull-request"}
+
+    @staticmethod
+    def __tag(existing : dict, event : dict):
+        service = CxOneService.__new__(CxOneService)
+        service._CxOneService__client = None
+        inspector = MagicMock(json={"tags" : existing}, scan_id="scan")
+
+        with patch("cxone_service.update_scan_tags", AsyncMock(return_value=MagicMock(ok=True))) as update:
+            asyncio.run(service.tag_reused_scan(inspector, event))
+
+        return update
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_identity_tags_unchanged(self):
+        update = TestReusedScanTags.__tag(dict(TestReusedScanTags.__original_tags),
+                                          {CxOneService.COMMIT_TAG : "bbb", CxOneService.PR_ID_TAG : "2", CxOneService.PR_TARGET_TAG : "dev",
+                                           CxOneService.PR_STATE_TAG : "MERGED", "workflow" : "pull-request"})
+
+        tags = update.call_args.args[2]["tags"]
+        self.assertEqual(TestReusedScanTags.__original_tags | {"reused-by-bbb" : "pr-2"}, tags)
+
+    def test_push_reuse_removes_superseded_by(self):
+        update = TestReusedScanTags.__tag(dict(TestReusedScanTags.__original_tags) | {CxOneService.SUPERSEDED_BY_TAG : "other"},
+                                          {CxOneService.COMMIT_TAG : "ccc", "workflow" : "push"})
+
+        self.assertEqual(TestReusedScanTags.__original_tags | {"reused-by-ccc" : "push"}, update.call_args.args[2]["tags"])
+
+    def test_already_recorded(self):
+        update = TestReusedScanTags.__tag(dict(TestReusedScanTags.__original_tags) | {"reused-by-bbb" : "pr-2"},
+                                          {CxOneService.COMMIT_TAG : "bbb", CxOneService.PR_ID_TAG : "2"})
+        update.assert_not_awaited()
+
+
+if __name__ == '__main__':
+    unittest.main()
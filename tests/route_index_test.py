@@ -0,0 +1,53 @@
+import unittest, re
+from config.server.route_index import RouteIndex
+
+
+class TestRouteIndex(unittest.TestCase):
+
+    @staticmethod
+    def __routes(*patterns):
+        return [(re.compile(p, re.IGNORECASE), i) for i, p in enumerate(patterns)]
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_first_match_in_order(self):
+        index = RouteIndex(TestRouteIndex.__routes(r".*/org/special.*", r".*/org/.*", r".*github\.com.*"))
+        self.assertEqual(0, index.match("https://github.com/org/special-repo.git"))
+        self.assertEqual(1, index.match("https://github.com/org/other.git"))
+        self.assertEqual(2, index.match("https://GITHUB.com/elsewhere/repo.git"))
+        self.assertIsNone(index.match("https://gitlab.com/org2/repo.git"))
+
+    def test_patterns_without_literals_keep_order(self):
+        index = RouteIndex(TestRouteIndex.__routes(r".*/(a|b)/.*", r"x|.*/org/.*", r".*/org/.*", r"(?i).*"))
+        self.assertEqual(0, index.match("https://host/a/org/repo"))
+        self.assertEqual(1, index.match("https://host/org/repo"))
+        self.assertEqual(3, index.match("https://host/other/repo"))
+
+    def test_required_literals(self):
+        self.assertEqual(["https://github.com/org", "/"], RouteIndex.required_literals(re.compile(r"https://GitHub\.com/org\d*/.*", re.IGNORECASE)))
+        self.assertEqual(["/", "/"], RouteIndex.required_literals(re.compile(r".*/(org|team)s?/.*")))
+        self.assertEqual([], RouteIndex.required_literals(re.compile(r"a|b")))
+
+    def test_unhandled_escapes_have_no_literals(self):
+        for pattern in [r".*gh\x2ecom/org/.*", r".*gh\056com/org/.*", r".*gh\u002ecom/org/.*", r".*gh\N{FULL STOP}com/org/.*",
+                        r".*(o)rg/\1rg/.*"]:
+            with self.subTest(pattern=pattern):
+                self.assertEqual([], RouteIndex.required_literals(re.compile(pattern)))
+
+    def test_escapes_match_linear_scan(self):
+        routes = TestRouteIndex.__routes(r".*gh\x2ecom/org/.*", r".*gl\056com/org/.*", r".*bb\u002ecom/org/.*", r".*/org/.*")
+        index = RouteIndex(routes)
+        for url in ["https://gh.com/org/repo", "https://gl.com/org/repo", "https://bb.com/org/repo",
+                    "https://ghxcom/org/repo", "https://example.com/org/repo", "https://example.com/other/repo"]:
+            with self.subTest(url=url):
+                self.assertEqual(next((v for p, v in routes if p.match(url)), None), index.match(url))
+
+    def test_cached_lookup_is_bounded(self):
+        index = RouteIndex(TestRouteIndex.__routes(r".*/org/.*"), cache_size=2)
+        for repo in ["a", "b", "c", "a"]:
+            self.assertEqual(0, index.match(f"https://host/org/{repo}"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest, asyncio
+from unittest.mock import patch, AsyncMock, MagicMock
+from workflows import ScanWorkflow
+from workflows.scan_polling_service import ScanPollingService
+
+
+class TestScanPolling(unittest.TestCase):
+
+    @staticmethod
+    def __poll(executing : bool, cancel_superseded_scans : bool=True, newer_scan : str=None):
+        feedback = MagicMock()
+        feedback.handle_completed_scan = AsyncMock()
+        service = ScanPollingService([feedback], 60, 2, "amqp://localhost", None, None, True)
+
+        swm = MagicMock(scanid="scan", projectid="project", workflow=ScanWorkflow.PR, workflow_details={"pr_id" : "1"},
+                        timestamp="2026-01-01T00:00:00+00:00")
+        swm.is_expired.return_value = False
+
+        msg = AsyncMock(headers={"x-death" : [{"original-expiration" : "1000"}]}, routing_key="poll")
+
+        inspector = MagicMock(json={"tags" : {}}, executing=executing, successful=True)
+        cxone = MagicMock(cancel_superseded_scans=cancel_superseded_scans)
+        cxone.load_scan_inspector = AsyncMock(return_value=inspector)
+        cxone.find_newer_scan = AsyncMock(return_value=newer_scan)
+
+        with patch.object(service, "_safe_deserialize_body", AsyncMock(return_value=swm)), \
+            patch.object(service, "mq_client", AsyncMock()):
+            asyncio.run(service.execute_poll_scan_workflow(msg, cxone))
+
+        return cxone.find_newer_scan, feedback.handle_completed_scan
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_executing_scan_does_not_search(self):
+        find, completed = TestScanPolling.__poll(executing=True)
+        find.assert_not_awaited()
+        completed.assert_not_awaited()
+
+    def test_finished_scan_searched_once_before_feedback(self):
+        find, completed = TestScanPolling.__poll(executing=False)
+        find.assert_awaited_once()
+        completed.assert_awaited_once()
+
+    def test_superseded_scan_has_no_feedback(self):
+        find, completed = TestScanPolling.__poll(executing=False, newer_scan="newer")
+        find.assert_awaited_once()
+        completed.assert_not_awaited()
+
+    def test_search_disabled(self):
+        find, completed = TestScanPolling.__poll(executing=False, cancel_superseded_scans=False)
+        find.assert_not_awaited()
+        completed.assert_awaited_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
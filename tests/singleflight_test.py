@@ -0,0 +1,57 @@
+import unittest, asyncio
+from task_management.singleflight import SingleFlight
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_concurrent_requests_share_one_execution(self):
+        calls = []
+        cleaned = []
+
+        async def factory():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "artifact"
+
+        async def cleanup(value):
+            cleaned.append(value)
+
+        async def run():
+            flights = SingleFlight("test")
+
+            async def user(delay):
+                async with flights.acquire("key", factory, cleanup) as value:
+                    await asyncio.sleep(delay)
+                    self.assertEqual(0, len(cleaned))
+                    return value
+
+            return await asyncio.gather(user(0), user(0.05), user(0.1)), flights.in_flight
+
+        results, in_flight = asyncio.run(run())
+        self.assertEqual(["artifact"] * 3, results)
+        self.assertEqual(1, len(calls))
+        self.assertEqual(["artifact"], cleaned)
+        self.assertEqual(0, in_flight)
+
+    def test_failure_is_not_cached(self):
+        calls = []
+
+        async def factory():
+            calls.append(1)
+            raise ValueError()
+
+        async def run():
+            flights = SingleFlight("test")
+            for _ in range(2):
+                with self.assertRaises(ValueError):
+                    async with flights.acquire("key", factory):
+                        pass
+
+        asyncio.run(run())
+        self.assertEqual(2, len(calls))
+
+
+if __name__ == '__main__':
+    unittest.main()
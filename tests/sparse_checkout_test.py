@@ -0,0 +1,30 @@
+import unittest
+from scm_services.sparse import SparseCheckout
+
+class TestSparseCheckout(unittest.TestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_no_filters(self):
+        self.assertIsNone(SparseCheckout.from_filters({"sast" : None, "sca" : None}))
+
+    def test_exclusion_not_common_to_all_engines(self):
+        self.assertIsNone(SparseCheckout.from_filters({"sast" : "!**/test/**", "sca" : None}))
+
+    def test_common_exclusions(self):
+        sparse = SparseCheckout.from_filters({"sast" : "!docs/**,!*.md", "sca" : "!docs/**, !*.md, !vendor/**"})
+        self.assertFalse(sparse.cone)
+        self.assertEqual(["/*", "!/*.md", "!docs/**"], sparse.patterns)
+
+    def test_directory_includes_use_cone(self):
+        sparse = SparseCheckout.from_filters({"sast" : "src/**", "kics" : "./deploy/"})
+        self.assertTrue(sparse.cone)
+        self.assertEqual(["deploy", "src"], sparse.patterns)
+
+    def test_glob_include_is_not_cone(self):
+        self.assertIsNone(SparseCheckout.from_filters({"sast" : "src/**/*.java"}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest, asyncio
+from orchestration.supersession import Supersession
+
+class TestSupersession(unittest.TestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_newer_claim_cancels_unsubmitted(self):
+        async def older():
+            async with Supersession.latest("key"):
+                await asyncio.sleep(1)
+                return Supersession.submitting()
+
+        async def newer():
+            await asyncio.sleep(0.01)
+            async with Supersession.latest("key"):
+                return Supersession.submitting()
+
+        async def run():
+            return await asyncio.gather(older(), newer(), return_exceptions=True)
+
+        older_result, newer_result = asyncio.run(run())
+        self.assertIsInstance(older_result, asyncio.CancelledError)
+        self.assertTrue(newer_result)
+
+    def test_submitted_claim_is_not_cancelled(self):
+        async def older():
+            async with Supersession.latest("key"):
+                self.assertTrue(Supersession.submitting())
+                await asyncio.sleep(0.05)
+                return "done"
+
+        async def newer():
+            await asyncio.sleep(0.01)
+            async with Supersession.latest("key"):
+                return Supersession.submitting()
+
+        async def run():
+            return await asyncio.gather(older(), newer())
+
+        self.assertEqual(["done", True], asyncio.run(run()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest, asyncio, threading, time
+from unittest.mock import patch
+from task_management import TaskManager, TaskPriority
+from cxoneflow_metrics import MetricsRegistry
+
+class TestTaskManager(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(clazz):
+        TaskManager.bootstrap()
+
+    def tearDown(self):
+        TaskManager.configure(TaskManager.DEFAULT_MAX_IN_FLIGHT, TaskManager.DEFAULT_MAX_QUEUED)
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_queue_full_and_priority(self):
+        TaskManager.configure(1, 2)
+        gate = threading.Event()
+        order = []
+
+        async def blocker():
+            while not gate.is_set():
+                await asyncio.sleep(0.01)
+
+        async def record(name):
+            order.append(name)
+
+        TaskManager.in_background(blocker())
+        TaskManager.in_background(record("push"), TaskPriority.PUSH)
+        TaskManager.in_background(record("pr"), TaskPriority.PULL_REQUEST)
+
+        with self.assertRaises(TaskManager.QueueFullException) as ctx:
+            TaskManager.in_background(record("rejected"))
+        self.assertGreater(ctx.exception.retry_after, 0)
+
+        gate.set()
+        TaskManager.wait_for_exit()
+        self.assertEqual(["pr", "push"], order)
+
+    def test_in_foreground(self):
+        async def value():
+            return 42
+
+        self.assertEqual(42, asyncio.run(TaskManager.in_foreground(value())))
+
+    def test_cancelled_foreground_cancels_task(self):
+        TaskManager.configure(1, 2)
+        started = threading.Event()
+        cancelled = threading.Event()
+        gate = threading.Event()
+
+        async def long_running():
+            started.set()
+            try:
+                while not gate.is_set():
+                    await asyncio.sleep(0.01)
+            except asyncio.CancelledError:
+                cancelled.set()
+                # The task is still tracked while it finishes after cancellation.
+                while not gate.is_set():
+                    await asyncio.sleep(0.01)
+                raise
+
+        async def caller():
+            waiter = asyncio.ensure_future(TaskManager.in_foreground(long_running()))
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+
+        asyncio.run(caller())
+        self.assertTrue(cancelled.wait(5))
+
+        async def noop():
+            pass
+
+        # The slot is still held by the cancelled task, so the next task is queued rather than started.
+        TaskManager.in_background(noop())
+        TaskManager.in_background(noop())
+        with self.assertRaises(TaskManager.QueueFullException):
+            TaskManager.in_background(noop())
+
+        gate.set()
+        TaskManager.wait_for_exit()
+
+    def test_age_gauge_computed_when_read(self):
+        gate = threading.Event()
+        started = threading.Event()
+
+        async def blocker():
+            started.set()
+            while not gate.is_set():
+                await asyncio.sleep(0.01)
+
+        TaskManager.in_background(blocker())
+        self.assertTrue(started.wait(5))
+
+        try:
+            with patch("task_management.time", **{"monotonic.return_value" : time.monotonic() + 120}):
+                gauges = MetricsRegistry.snapshot()["gauges"]
+            self.assertGreaterEqual(gauges[TaskManager.METRIC_OLDEST_IN_FLIGHT_AGE], 120)
+            self.assertEqual(1, gauges[TaskManager.METRIC_IN_FLIGHT])
+        finally:
+            gate.set()
+            TaskManager.wait_for_exit()
+
+
+if __name__ == '__main__':
+    unittest.main()
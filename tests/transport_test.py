@@ -0,0 +1,74 @@
+import unittest, asyncio, pickle, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from cxoneflow_metrics import MetricsRegistry
+from api_utils.transport import PooledTransport
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = self.headers.get("Cookie", "none").encode("UTF-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Set-Cookie", "session=abc")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestPooledTransport(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(clazz):
+        clazz.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=clazz.server.serve_forever, daemon=True).start()
+        clazz.url = f"http://127.0.0.1:{clazz.server.server_port}/"
+
+    @classmethod
+    def tearDownClass(clazz):
+        clazz.server.shutdown()
+        clazz.server.server_close()
+
+    def setUp(self):
+        MetricsRegistry.reset()
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_connections_are_reused(self):
+        transport = PooledTransport("127.0.0.1", 2)
+
+        async def run():
+            for _ in range(4):
+                response = await transport.request(method="GET", url=TestPooledTransport.url, timeout=10)
+                self.assertEqual(200, response.status_code)
+
+        asyncio.run(run())
+        self.assertEqual(4, MetricsRegistry.counter(PooledTransport.METRIC_REQUESTS, host="127.0.0.1"))
+        self.assertEqual(1, MetricsRegistry.counter(PooledTransport.METRIC_CONNECTIONS_OPENED, host="127.0.0.1"))
+        self.assertEqual(0.75, PooledTransport.reuse_ratio("127.0.0.1"))
+
+    def test_cookies_are_not_retained(self):
+        transport = PooledTransport("127.0.0.1")
+
+        async def run():
+            await transport.request(method="GET", url=TestPooledTransport.url, timeout=10)
+            return (await transport.request(method="GET", url=TestPooledTransport.url, timeout=10)).text
+
+        self.assertEqual("none", asyncio.run(run()))
+
+    def test_pickled_transport_can_be_used(self):
+        transport = PooledTransport("127.0.0.1")
+
+        async def run(t):
+            return (await t.request(method="GET", url=TestPooledTransport.url, timeout=10)).status_code
+
+        self.assertEqual(200, asyncio.run(run(transport)))
+        self.assertEqual(200, asyncio.run(run(pickle.loads(pickle.dumps(transport)))))
+
+
+if __name__ == '__main__':
+    unittest.main()
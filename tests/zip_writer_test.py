@@ -0,0 +1,55 @@
+import unittest, tempfile, zipfile, zlib, os
+from pathlib import Path
+from orchestration.zip_writer import ParallelZipWriter, crc32_combine
+
+class TestParallelZipWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.__work = tempfile.TemporaryDirectory()
+        self.__root = Path(self.__work.name)
+
+    def tearDown(self):
+        self.__work.cleanup()
+
+    def __write(self, files : dict, level : int=9) -> zipfile.ZipFile:
+        entries = {}
+        for name, content in files.items():
+            (self.__root / name).write_bytes(content)
+            entries[str(self.__root / name)] = name
+
+        zip_path = self.__root / "out.zip"
+        with open(zip_path, "w+b") as f:
+            with ParallelZipWriter(f, level) as writer:
+                writer.write_entries(entries)
+
+        return zipfile.ZipFile(zip_path)
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_crc32_combine(self):
+        a, b = os.urandom(1000), os.urandom(3333)
+        self.assertEqual(zlib.crc32(a + b), crc32_combine(zlib.crc32(a), zlib.crc32(b), len(b)))
+
+    def test_round_trip(self):
+        files = {"a.py" : b"print('a')\n" * 1000, "empty.txt" : b"", "lib.jar" : b"jar" * 100, "rand.bin" : os.urandom(1024)}
+        with self.__write(files) as z:
+            self.assertIsNone(z.testzip())
+            for name, content in files.items():
+                self.assertEqual(content, z.read(name))
+
+    def test_stored_types(self):
+        with self.__write({"a.py" : b"a" * 1000, "lib.jar" : b"a" * 1000, "rand.bin" : os.urandom(1024)}) as z:
+            self.assertEqual(zipfile.ZIP_DEFLATED, z.getinfo("a.py").compress_type)
+            self.assertEqual(zipfile.ZIP_STORED, z.getinfo("lib.jar").compress_type)
+            self.assertEqual(zipfile.ZIP_STORED, z.getinfo("rand.bin").compress_type)
+
+    def test_chunked_file(self):
+        content = b"".join([f"line {x}\n".encode() for x in range(1500000)])
+        with self.__write({"big.txt" : content}) as z:
+            self.assertIsNone(z.testzip())
+            self.assertEqual(content, z.read("big.txt"))
+
+
+if __name__ == '__main__':
+    unittest.main()
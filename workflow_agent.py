@@ -6,13 +6,16 @@ from workflows.scan_polling_service import ScanPollingService
 from workflows.pr_feedback_service import PRFeedbackService
 from workflows.push_feedback_service import PushFeedbackService
 from workflows.resolver_scan_service import ResolverScanService
+from workflows.ingestion_service import IngestionService
 from workflows.messaging import (
     ScanAwaitMessage,
     ScanAnnotationMessage,
     ScanFeedbackMessage,
 )
 from agent.resolver import ResolverResultsAgent, ResolverTimeoutAgent
+from agent.ingestion import IngestionAgent
 from agent import mq_agent
+from cxoneflow_metrics import MetricsRegistry
 
 cof_logging.bootstrap()
 
@@ -77,8 +80,13 @@ async def process_pr_feedback(msg: aio_pika.abc.AbstractIncomingMessage) -> None
 
 
 async def spawn_agents():
+    # The ingestion queue holds events for all services, so each process consumes it once per AMQP endpoint.
+    ingest_endpoints = set()
 
     async with asyncio.TaskGroup() as g:
+        if CxOneFlowConfig.metrics_log_interval() is not None:
+            g.create_task(MetricsRegistry.log_periodically(CxOneFlowConfig.metrics_log_interval()))
+
         for moniker in CxOneFlowConfig.get_service_monikers():
             services = CxOneFlowConfig.retrieve_services_by_moniker(moniker)
 
@@ -140,6 +148,18 @@ async def spawn_agents():
                 )
             )
 
+            if services.ingest.enabled and services.ingest.amqp_url not in ingest_endpoints:
+                ingest_endpoints.add(services.ingest.amqp_url)
+                g.create_task(
+                    mq_agent(
+                        IngestionAgent(),
+                        await services.ingest.mq_client(),
+                        moniker,
+                        IngestionService.QUEUE_INGEST,
+                        services.ingest.max_concurrent,
+                    )
+                )
+
 
 if __name__ == "__main__":
     try:
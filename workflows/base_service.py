@@ -26,6 +26,10 @@ class AMQPClient:
     def log(clazz):
         return logging.getLogger(clazz.__name__)
 
+    @property
+    def amqp_url(self) -> str:
+        return self.__amqp_url
+
     @property
     def use_ssl(self):
         return urllib.parse.urlparse(self.__amqp_url).scheme == "amqps"
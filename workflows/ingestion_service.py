@@ -0,0 +1,64 @@
+import aio_pika, uuid, pamqp.commands
+from workflows.base_service import CxOneFlowAbstractWorkflowService
+from workflows.messaging import IngestedEventMessage
+from api_utils.auth_factories import EventContext
+
+
+class IngestionService(CxOneFlowAbstractWorkflowService):
+    """Queues received webhook events so orchestration can be performed by the workflow agent
+    rather than in the process that received the webhook."""
+
+    DEFAULT_MAX_CONCURRENT = 4
+
+    INGEST_ELEMENT_PREFIX = "ingest:"
+    INGEST_TOPIC_PREFIX = "ingest."
+
+    EXCHANGE_INGEST = f"{CxOneFlowAbstractWorkflowService.ELEMENT_PREFIX}{INGEST_ELEMENT_PREFIX}Webhook Events In"
+    QUEUE_INGEST = f"{CxOneFlowAbstractWorkflowService.ELEMENT_PREFIX}{INGEST_ELEMENT_PREFIX}Webhook Orchestration"
+    ROUTEKEY_INGEST_BINDING = f"{CxOneFlowAbstractWorkflowService.TOPIC_PREFIX}{INGEST_TOPIC_PREFIX}#"
+
+    # Events that fail orchestration are redelivered until the delivery limit, then dead-lettered.
+    INGEST_DELIVERY_LIMIT = 3
+    EXCHANGE_INGEST_DLX = f"{CxOneFlowAbstractWorkflowService.ELEMENT_PREFIX}{INGEST_ELEMENT_PREFIX}Webhook Events Failed"
+    QUEUE_INGEST_FAILED = f"{CxOneFlowAbstractWorkflowService.ELEMENT_PREFIX}{INGEST_ELEMENT_PREFIX}Failed Webhook Orchestration"
+
+    def __init__(self, moniker : str, enabled : bool, max_concurrent : int,
+                 amqp_url : str, amqp_user : str, amqp_password : str, ssl_verify : bool):
+        super().__init__(amqp_url, amqp_user, amqp_password, ssl_verify)
+        self.__service_moniker = moniker
+        self.__enabled = enabled
+        self.__max_concurrent = max_concurrent
+
+    @property
+    def enabled(self) -> bool:
+        return self.__enabled
+
+    @property
+    def max_concurrent(self) -> int:
+        return self.__max_concurrent
+
+    @staticmethod
+    def make_topic(config_key : str, moniker : str) -> str:
+        return f"{CxOneFlowAbstractWorkflowService.TOPIC_PREFIX}{IngestionService.INGEST_TOPIC_PREFIX}{config_key}.{moniker}"
+
+    async def publish(self, config_key : str, orchestrator : str, event_context : EventContext, delivery_id : str=None) -> bool:
+        msg = IngestedEventMessage.factory(correlation_id=delivery_id if delivery_id is not None else str(uuid.uuid4()),
+                                           moniker=self.__service_moniker,
+                                           orchestrator=orchestrator,
+                                           event_context=event_context,
+                                           delivery_id=delivery_id)
+
+        channel = await (await self.mq_client()).channel()
+        try:
+            exchange = await channel.get_exchange(IngestionService.EXCHANGE_INGEST)
+            result = await exchange.publish(aio_pika.Message(msg.to_binary(), delivery_mode=aio_pika.DeliveryMode.PERSISTENT),
+                                            routing_key=IngestionService.make_topic(config_key, self.__service_moniker))
+
+            if type(result) == pamqp.commands.Basic.Ack:
+                IngestionService.log().debug(f"Ingested event {msg.correlation_id} for {self.__service_moniker}")
+                return True
+            else:
+                IngestionService.log().error(f"Unable to ingest event {msg.correlation_id} for {self.__service_moniker}")
+                return False
+        finally:
+            await channel.close()
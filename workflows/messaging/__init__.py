@@ -2,4 +2,5 @@ from .v1.await_scan import ScanAwaitMessage
 from .v1.scan_feedback import ScanFeedbackMessage
 from .v1.scan_annotation import ScanAnnotationMessage
 from .v1.pr_details import PRDetails, PushDetails
-from .v1.delegated_scan import DelegatedScanMessage, DelegatedScanDetails, DelegatedScanResultMessage, DelegatedScanMessageBase
\ No newline at end of file
+from .v1.delegated_scan import DelegatedScanMessage, DelegatedScanDetails, DelegatedScanResultMessage, DelegatedScanMessageBase
+from .v1.ingested_event import IngestedEventMessage
\ No newline at end of file
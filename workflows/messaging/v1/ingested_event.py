@@ -0,0 +1,13 @@
+from ..base_message import StampedMessage
+from dataclasses import dataclass
+from api_utils.auth_factories import EventContext
+from typing import Optional
+from _version import __version__
+
+@dataclass(frozen=True)
+class IngestedEventMessage(StampedMessage):
+    moniker : str
+    orchestrator : str
+    event_context : EventContext
+    delivery_id : Optional[str] = None
+    cxoneflow_version : str = __version__
@@ -13,7 +13,6 @@ from .messaging import (
 import urllib, re, pickle, aio_pika
 from api_utils.auth_factories import EventContext
 from cxone_api.high.projects import ProjectRepoConfig
-from cxone_api.high.scans import ScanFilterConfig
 from cxone_api import CxOneClient
 
 
@@ -194,7 +193,7 @@ class ResolverScanService(CxOneFlowAbstractWorkflowService):
 
         # Bug workaround
         filters = (
-            await ScanFilterConfig.from_repo_config(self.__client, project_config)
+            await cxone_service.get_scan_filter_config(project_config)
         ).compute_filters("sca")
         if isinstance(filters, dict):
             filters = filters["filter"]
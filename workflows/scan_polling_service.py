@@ -1,8 +1,8 @@
 import aio_pika, logging, pamqp.commands, asyncio
-from datetime import timedelta
+from datetime import timedelta, datetime
 from workflows.messaging import ScanAwaitMessage
 from workflows.base_service import CxOneFlowAbstractWorkflowService
-from workflows import ScanStates
+from workflows import ScanStates, ScanWorkflow
 from cxone_service import CxOneService
 from cxone_api.exceptions import ResponseException
 from typing import List
@@ -25,6 +25,23 @@ class ScanPollingService(CxOneFlowAbstractWorkflowService):
         self.__backoff = backoff_scalar
         self.__services = services
 
+    @staticmethod
+    async def __find_superseding_scan(swm : ScanAwaitMessage, cxone_service : CxOneService) -> str:
+        # Only scans started after the feedback workflow for this scan started can supersede it.
+        started = datetime.fromisoformat(swm.timestamp)
+
+        try:
+            if swm.workflow == ScanWorkflow.PR and "pr_id" in swm.workflow_details.keys():
+                return await cxone_service.find_newer_scan(swm.projectid, swm.scanid, started, 
+                                                           CxOneService.PR_ID_TAG, swm.workflow_details["pr_id"])
+            elif swm.workflow == ScanWorkflow.PUSH and "source_branch" in swm.workflow_details.keys():
+                return await cxone_service.find_newer_scan(swm.projectid, swm.scanid, started, 
+                                                           "workflow", str(ScanWorkflow.PUSH), swm.workflow_details["source_branch"])
+        except ResponseException as ex:
+            ScanPollingService.log().warning(f"Unable to check if scan id {swm.scanid} was superseded: {ex}")
+
+        return None
+
     async def execute_poll_scan_workflow(self, msg : aio_pika.abc.AbstractIncomingMessage, cxone_service : CxOneService):
 
         requeue_on_finally = True
@@ -38,13 +55,28 @@ class ScanPollingService(CxOneFlowAbstractWorkflowService):
             write_channel = None
             try:
                 write_channel = await (await self.mq_client()).channel()
+
                 inspector = await cxone_service.load_scan_inspector(swm.scanid)
 
+                # Newer events mark the active scans they supersede.
+                superseding_scan = (inspector.json.get('tags', None) or {}).get(CxOneService.SUPERSEDED_BY_TAG, None)
+                if superseding_scan is not None and superseding_scan != swm.scanid:
+                    ScanPollingService.log().info(f"Scan id {swm.scanid} superseded by scan id {superseding_scan}. Polling for this scan has been stopped.")
+                    requeue_on_finally = False
+                    await msg.ack()
+                    return
+
                 if not inspector.executing:
                     try:
                         requeue_on_finally = False
-                        
-                        if inspector.successful:
+
+                        # A scan that finished before a newer event could mark it is found once, before posting feedback.
+                        newer_scan = await self.__find_superseding_scan(swm, cxone_service) \
+                            if cxone_service.cancel_superseded_scans else None
+
+                        if newer_scan is not None:
+                            ScanPollingService.log().info(f"Scan id {swm.scanid} superseded by scan id {newer_scan}, no feedback will be posted.")
+                        elif inspector.successful:
                             ScanPollingService.log().info(f"Scan success for scan id {swm.scanid}, enqueuing feedback workflow.")
                             await asyncio.gather(*[svc.handle_completed_scan(swm) for svc in self.__services])
                         else: